@@ -0,0 +1,14 @@
+-- migrate:up
+
+-- bumped whenever an api key is added, updated or deleted (i.e. by sturdy-cli) so that running validators know to
+-- drop their cached copies of the keys
+CREATE TABLE api_keys_version (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT INTO api_keys_version (id, version) VALUES (0, 0);
+
+-- migrate:down
+
+DROP TABLE api_keys_version;
@@ -0,0 +1,16 @@
+-- migrate:up
+
+-- rate limiting counts a key's requests over the last minute - this covers that query entirely
+CREATE INDEX logs_key_created_at ON logs (key, created_at);
+
+-- /get_allocation filters by miner and/or time range, /request_info by time range
+CREATE INDEX allocations_miner_uid_created_at ON allocations (miner_uid, created_at);
+CREATE INDEX allocations_created_at ON allocations (created_at);
+CREATE INDEX allocation_requests_created_at ON allocation_requests (created_at);
+
+-- migrate:down
+
+DROP INDEX logs_key_created_at;
+DROP INDEX allocations_miner_uid_created_at;
+DROP INDEX allocations_created_at;
+DROP INDEX allocation_requests_created_at;
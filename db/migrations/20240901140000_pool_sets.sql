@@ -0,0 +1,21 @@
+-- migrate:up
+
+-- organic requests tend to resend the same pools over and over, so each distinct assets_and_pools is only stored once,
+-- keyed by the sha256 of its canonical json. requests made before this migration keep their assets_and_pools inline
+-- until they're moved over with `sturdy dedupe-pool-sets`.
+CREATE TABLE pool_sets (
+    hash TEXT PRIMARY KEY,
+    assets_and_pools TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE allocation_requests ADD COLUMN pool_set_hash TEXT REFERENCES pool_sets (hash);
+
+-- migrate:down
+
+UPDATE allocation_requests
+SET assets_and_pools = (SELECT assets_and_pools FROM pool_sets WHERE hash = allocation_requests.pool_set_hash)
+WHERE pool_set_hash IS NOT NULL;
+
+ALTER TABLE allocation_requests DROP COLUMN pool_set_hash;
+DROP TABLE pool_sets;
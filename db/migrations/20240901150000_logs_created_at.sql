@@ -0,0 +1,8 @@
+-- migrate:up
+
+-- old request logs are archived by created_at, regardless of key
+CREATE INDEX logs_created_at ON logs (created_at);
+
+-- migrate:down
+
+DROP INDEX logs_created_at;
@@ -0,0 +1,49 @@
+-- migrate:up
+
+-- hourly totals of the logs and allocations tables, kept up to date as they're written to (see sql.log_requests and
+-- sql.insert_allocations) so that analytics don't have to scan every row. they aren't affected by rows being archived.
+CREATE TABLE logs_hourly (
+    hour TIMESTAMP NOT NULL,
+    key TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    num_requests INTEGER NOT NULL,
+    credits_used REAL NOT NULL,
+    last_request_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (hour, key, endpoint)
+) WITHOUT ROWID;
+
+CREATE TABLE allocations_hourly (
+    hour TIMESTAMP NOT NULL,
+    miner_uid TEXT NOT NULL,
+    num_allocations INTEGER NOT NULL,
+    -- compressed allocations from before this migration can't be read here, so aren't included in the apys
+    num_apys INTEGER NOT NULL,
+    sum_apy REAL NOT NULL,
+    max_apy REAL,
+    first_allocation_at TIMESTAMP NOT NULL,
+    last_allocation_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (hour, miner_uid)
+) WITHOUT ROWID;
+
+INSERT INTO logs_hourly
+SELECT strftime('%Y-%m-%d %H:00:00', created_at), key, endpoint, COUNT(*), TOTAL(cost), MAX(created_at)
+FROM logs
+WHERE key IS NOT NULL AND endpoint IS NOT NULL
+GROUP BY 1, 2, 3;
+
+INSERT INTO allocations_hourly
+SELECT hour, miner_uid, COUNT(*), COUNT(apy), TOTAL(apy), MAX(apy), MIN(created_at), MAX(created_at)
+FROM (
+    SELECT
+        strftime('%Y-%m-%d %H:00:00', created_at) AS hour,
+        miner_uid,
+        CASE WHEN typeof(allocation) = 'text' THEN json_extract(allocation, '$.apy') END AS apy,
+        created_at
+    FROM allocations
+)
+GROUP BY 1, 2;
+
+-- migrate:down
+
+DROP TABLE logs_hourly;
+DROP TABLE allocations_hourly;
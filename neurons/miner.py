@@ -16,6 +16,8 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import asyncio
+import contextlib
 import time
 import typing
 
@@ -29,6 +31,11 @@ from sturdy.algo import optimized_algorithm
 from sturdy.base.miner import BaseMinerNeuron
 
 
+def admission_key(synapse: sturdy.protocol.AllocateAssets) -> tuple:
+    """Identifies a request across blacklist() and forward(), which are handed different synapse objects for it."""
+    return synapse.dendrite.hotkey, synapse.dendrite.nonce  # type: ignore[]
+
+
 class Miner(BaseMinerNeuron):
     """
     Your miner neuron class. You should use this class to define your miner's behavior. In particular, you should replace the
@@ -63,17 +70,40 @@ class Miner(BaseMinerNeuron):
         """
         bt.logging.debug("forward()")
 
-        # try use default greedy alloaction algorithm to generate allocations
+        # try use default greedy alloaction algorithm to generate allocations - on the miner's worker threads, so that
+        # its calls to the chain don't hold up other requests
         try:
-            synapse.allocations = optimized_algorithm(self, synapse)
+            allocations = await asyncio.get_running_loop().run_in_executor(self.executor, self.allocate, synapse)
         except Exception as e:
             bt.logging.error(f"Error: {e}")
             # just return the auto vali generated allocations
-            synapse.allocations = synapse.allocations
+        else:
+            if allocations is None:
+                # too late to work on it - just return the auto vali generated allocations
+                bt.logging.warning("Request can't be worked on before it times out, sending the allocations it came with")
+            else:
+                synapse.allocations = allocations
 
         bt.logging.info(f"sending allocations: {synapse.allocations}")
         return synapse
 
+    def allocate(self, synapse: sturdy.protocol.AllocateAssets) -> dict | None:
+        """
+        Works out the allocations for a request, on whichever of the miner's worker threads picks it up. Returns None
+        instead if, by then, the request has waited too long to be worked on before it times out - see
+        AdmissionController. Deciding that here, rather than before the request is queued for a worker, means the time
+        spent waiting for one counts.
+        """
+        serving = (
+            self.admission_controller.serve(admission_key(synapse))
+            if self.admission_controller is not None
+            else contextlib.nullcontext(enter_result=False)
+        )
+        with serving as fast_path:
+            if fast_path:
+                return None
+            return optimized_algorithm(self, synapse)
+
     async def blacklist(self, synapse: sturdy.protocol.AllocateAssets) -> typing.Tuple[bool, str]:  # noqa: UP006
         """
         Determines whether an incoming request should be blacklisted and thus ignored. Your implementation should
@@ -125,6 +155,12 @@ class Miner(BaseMinerNeuron):
         if not validator_permit:
             return True, "Requesting UID has no validator permit"
 
+        if self.admission_controller is not None and not self.admission_controller.admit(
+            admission_key(synapse), synapse.timeout
+        ):
+            bt.logging.info(f"Shedding request from UID: {requesting_uid} - it can't be answered before it times out")
+            return True, "Request can't be answered before it times out"
+
         bt.logging.trace(f"Allowing request from UID: {requesting_uid}")
         return False, "Allowed"
 
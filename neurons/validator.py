@@ -18,24 +18,31 @@
 
 
 import asyncio
-import time
+import json
+import os
+import sqlite3
+import sys
 import uuid
+from collections.abc import Callable, Iterator
 from typing import Any
 
 # Bittensor
 import bittensor as bt
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, Response
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from starlette.status import (
     HTTP_400_BAD_REQUEST,
     HTTP_401_UNAUTHORIZED,
     HTTP_429_TOO_MANY_REQUESTS,
+    HTTP_503_SERVICE_UNAVAILABLE,
 )
 from web3.constants import ADDRESS_ZERO
 
 # import base validator class which takes care of most of the boilerplate
 from sturdy.base.validator import BaseValidatorNeuron
+from sturdy.constants import ARCHIVE_INTERVAL, IPC_SOCKET_ENV
 
 # Bittensor Validator Template:
 from sturdy.pools import PoolFactory
@@ -50,7 +57,14 @@ from sturdy.protocol import (
 from sturdy.utils.misc import get_synapse_from_body
 
 # api key db
-from sturdy.validator import forward, query_and_score_miners, sql
+from sturdy.validator import query_and_score_miners, sql
+from sturdy.validator.allocation_cache import AllocationCache, request_key
+from sturdy.validator.api_cache import ApiKeyCache
+from sturdy.validator.archive import Archive
+from sturdy.validator.db import AsyncDatabase
+from sturdy.validator.ipc import InProcessCore, IpcClient, IpcError, IpcServer
+from sturdy.validator.persistence import WriteBehindQueue
+from sturdy.validator.scenarios import ScenarioPrefetcher
 from sturdy.validator.simulator import Simulator
 
 
@@ -73,11 +87,21 @@ class Validator(BaseValidatorNeuron):
         bt.logging.info("load_state()")
         self.load_state()
         self.uid_to_response = {}
-        self.simulator = Simulator()
+        self.simulator = Simulator(pool_gen_version=self.config.neuron.pool_gen_version)
+        # synthetic rounds start from scenarios generated ahead of time in the background
+        self.scenario_prefetcher = None
+        if self.config.neuron.num_prefetched_scenarios > 0:
+            self.scenario_prefetcher = ScenarioPrefetcher(
+                num_scenarios=self.config.neuron.num_prefetched_scenarios,
+                reversion_speed=self.simulator.reversion_speed,
+                seed=self.simulator.seed,
+                pool_gen_version=self.simulator.pool_gen_version,
+            )
 
     async def forward(self) -> Any:
         """
-        Validator forward pass. Consists of:
+        Validator forward pass - a single synthetic round, run through the validator's `RoundPipeline` like the rounds
+        its main loop starts. Consists of:
         - Generating the query.
         - Querying the miners
         - Getting the responses
@@ -85,11 +109,63 @@ class Validator(BaseValidatorNeuron):
         - Updating the scores
         """
         bt.logging.debug("forward()")
-        return await forward(self)
+        return await (await self.pipeline.start_round())
 
 
 # API
 app = FastAPI(debug=False)
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# the db is only ever touched from its own threads, never from the event loop - see AsyncDatabase
+db = AsyncDatabase()
+# api keys are checked in memory - see ApiKeyCache. The validator core's cache also keeps every key's rate limit
+api_key_cache = ApiKeyCache(db_connection=db.connection)
+# request logs and allocations are written to the db in the background - see WriteBehindQueue
+write_behind = WriteBehindQueue(db_connection=db.connection)
+# old allocations and request logs are moved out of the db, if enabled with --archive_retention_days - see Archive
+archive: Archive | None = None
+# allocation requests are handled by the validator core - in this process, or over --ipc_socket with --api_workers > 1
+core: InProcessCore | IpcClient | None = None
+
+
+def configure_api(settings: dict) -> None:
+    global archive  # noqa: PLW0603
+    write_behind.compress_allocations = settings["compress_allocations"]
+    if settings["archive_retention_days"] > 0:
+        archive = Archive(settings["archive_dir"], settings["archive_retention_days"], db_connection=db.connection)
+
+
+@app.on_event("startup")
+async def connect_to_core() -> None:
+    # api workers are started by the validator core with the path to its socket, and take their settings from it
+    global core  # noqa: PLW0603
+    socket_path = os.environ.get(IPC_SOCKET_ENV)
+    if socket_path is not None:
+        core = IpcClient(socket_path)
+        configure_api(await core.call("api_settings"))
+
+
+@app.on_event("startup")
+async def start_write_behind() -> None:
+    write_behind.start()
+
+
+@app.on_event("shutdown")
+async def flush_write_behind() -> None:
+    await write_behind.stop()
+    if isinstance(core, IpcClient):
+        await core.close()
+    db.close()
+
+
+async def archive_periodically() -> None:
+    while True:
+        try:
+            await asyncio.to_thread(archive.archive)  # type: ignore[]
+        except Exception as e:
+            bt.logging.error(f"Failed to archive old allocations and request logs: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
 
 
 def _get_api_key(request: Request) -> Any:
@@ -114,8 +190,9 @@ async def api_key_validator(request, call_next) -> Response:
             content={"detail": "API key is missing"},
         )
 
-    with sql.get_db_connection() as conn:
-        api_key_info = sql.get_api_key_info(conn, api_key)
+    api_key_info = api_key_cache.get_cached(api_key)
+    if api_key_info is None:
+        api_key_info = await db.run(api_key_cache.get, api_key)
 
     if api_key_info is None:
         return JSONResponse(status_code=HTTP_401_UNAUTHORIZED, content={"detail": "Invalid API key"})
@@ -129,23 +206,45 @@ async def api_key_validator(request, call_next) -> Response:
             content={"detail": "Insufficient credits - sorry!"},
         )
 
-    # Now check rate limiting
-    with sql.get_db_connection() as conn:
-        rate_limit_exceeded = sql.rate_limit_exceeded(conn, api_key_info)
-        if rate_limit_exceeded:
+    # Now check rate limiting - with the validator core, so that a key's rate limit applies across every api worker
+    try:
+        admitted = await core.call("acquire_request", {"api_key": api_key})  # type: ignore[]
+    except (ConnectionError, TimeoutError, IpcError) as e:
+        bt.logging.error(f"Failed to check the rate limit with the validator core: {e}")
+        return JSONResponse(status_code=HTTP_503_SERVICE_UNAVAILABLE, content={"detail": "Validator unavailable"})
+    if not admitted:
+        return JSONResponse(
+            status_code=HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Rate limit exceeded - sorry!"},
+        )
+
+    success = False
+    debited = None
+    try:
+        # credits are debited in the db before the request is served, in a single statement, so that concurrent
+        # requests can't spend more than the key's balance between them
+        debited = await db.run_query(sql.debit_api_key, api_key, credits_required)
+        if debited is None:
             return JSONResponse(
                 status_code=HTTP_429_TOO_MANY_REQUESTS,
-                content={"detail": "Rate limit exceeded - sorry!"},
+                content={"detail": "Insufficient credits - sorry!"},
             )
-
-    response: Response = await call_next(request)
+        response: Response = await call_next(request)
+        success = response.status_code == 200
+    finally:
+        try:
+            await core.call("release_request", {"api_key": api_key, "success": success})  # type: ignore[]
+        except (ConnectionError, TimeoutError, IpcError) as e:
+            # the core stops counting it towards the rate limit after a window
+            bt.logging.error(f"Failed to release a request with the validator core: {e}")
+        if debited is not None and not success:
+            # the request wasn't served after all
+            await db.run_query(sql.refund_api_key, api_key, credits_required)
 
     bt.logging.debug(f"response: {response}")
-    if response.status_code == 200:
-        with sql.get_db_connection() as conn:
-            sql.update_requests_and_credits(conn, api_key_info, credits_required)
-            sql.log_request(conn, api_key_info, request.url.path, credits_required)
-            conn.commit()
+    if success:
+        api_key_cache.update_balance(api_key, debited[sql.BALANCE])
+        await write_behind.log_request(api_key, request.url.path, credits_required, debited[sql.BALANCE])
     return response
 
 
@@ -155,7 +254,7 @@ core_validator = None  # type: ignore[]
 
 @app.get("/vali")
 async def vali() -> dict:
-    return {"step": core_validator.step, "config": core_validator.config}  # type: ignore[]
+    return await _call_core("vali")
 
 
 @app.get("/status")
@@ -210,14 +309,134 @@ async def allocate(body: AllocateAssetsRequest) -> AllocateAssetsResponse | None
             }
         }
     """
+    result = await _call_core("allocate", jsonable_encoder(body))
+    request_uuid = str(uuid.uuid4()).replace("-", "")
+
+    ret = AllocateAssetsResponse(allocations=result["allocations"], request_uuid=request_uuid)
+    await write_behind.log_allocations(ret.request_uuid, result["assets_and_pools"], ret.allocations)
+
+    return ret
+
+
+async def _call_core(method: str, params: dict | None = None) -> Any:
+    try:
+        return await core.call(method, params)  # type: ignore[]
+    except (ConnectionError, TimeoutError) as e:
+        bt.logging.error(f"Failed to reach the validator core: {e}")
+        raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE, detail="Validator unavailable") from e
+
+
+def _decode_cursor(cursor: str | None) -> tuple[str, int] | None:
+    if cursor is None:
+        return None
+    try:
+        return sql.decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Invalid cursor") from e
+
+
+def _stream_ndjson(iter_rows: Callable[[sqlite3.Connection], Iterator[dict]]) -> StreamingResponse:
+    """Streams rows as newline delimited json, straight from a db cursor - so memory use doesn't grow with the results."""
+
+    def generate() -> Iterator[str]:
+        # starlette pulls from this generator from a threadpool, not necessarily from the same thread every time - which
+        # is fine for pooled connections
+        with db.connection() as conn:
+            for row in iter_rows(conn):
+                yield json.dumps(row) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@app.get("/get_allocation/", response_model=list[GetAllocationResponse])
+async def get_allocations(
+    response: Response,
+    request_uid: str | None = None,
+    miner_uid: str | None = None,
+    from_ts: int | None = None,
+    to_ts: int | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    stream: bool = False,
+) -> list[dict] | StreamingResponse:
+    """
+    Returns the allocations matching the given filters, oldest first, a page of at most `limit` at a time. If there are
+    more, the cursor for the next page is returned in the `X-Next-Cursor` header. With `stream=true`, every allocation
+    after `cursor` is streamed back as newline delimited json instead.
+    """
+    after = _decode_cursor(cursor)
+    if stream:
+        return _stream_ndjson(
+            lambda conn: sql.iter_filtered_allocations(
+                conn, request_uid, miner_uid, from_ts, to_ts, after=after, archive=archive
+            )
+        )
+
+    allocations, next_after = await db.run_query(
+        sql.get_filtered_allocations_page, request_uid, miner_uid, from_ts, to_ts, limit=limit, after=after, archive=archive
+    )
+    if not allocations:
+        raise HTTPException(status_code=404, detail="No allocations found")
+    if next_after is not None:
+        response.headers[NEXT_CURSOR_HEADER] = sql.encode_cursor(next_after)
+    return allocations
+
+
+@app.get("/request_info/", response_model=list[RequestInfoResponse])
+async def request_info(
+    response: Response,
+    request_uid: str | None = None,
+    from_ts: int | None = None,
+    to_ts: int | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    stream: bool = False,
+) -> list[dict] | StreamingResponse:
+    """
+    Returns the requests matching the given filters, oldest first, a page of at most `limit` at a time. If there are
+    more, the cursor for the next page is returned in the `X-Next-Cursor` header. With `stream=true`, every request
+    after `cursor` is streamed back as newline delimited json instead.
+    """
+    after = _decode_cursor(cursor)
+    if stream:
+        return _stream_ndjson(lambda conn: sql.iter_request_info(conn, request_uid, from_ts, to_ts, after=after))
+
+    info, next_after = await db.run_query(sql.get_request_info_page, request_uid, from_ts, to_ts, limit=limit, after=after)
+    if not info:
+        raise HTTPException(status_code=404, detail="No request info found")
+    if next_after is not None:
+        response.headers[NEXT_CURSOR_HEADER] = sql.encode_cursor(next_after)
+    return info
+
+
+# Validator core - handles the calls the api server makes to it through `core`
+allocation_cache: AllocationCache | None = None
+
+
+async def allocate_assets(params: dict) -> dict:
+    """
+    Returns the top `num_allocs` allocations for the request, along with the assets and pools the miners were queried
+    with - so the api server can log them. Identical requests share their allocations - see `AllocationCache`.
+    """
+    body = AllocateAssetsRequest(**params)
+    key = request_key(jsonable_encoder(body, exclude={"num_allocs"}))
+    result = await allocation_cache.get(key, lambda: query_and_score_request(body))  # type: ignore[]
+    return {
+        "allocations": dict(list(result["allocations"].items())[: body.num_allocs]),
+        "assets_and_pools": result["assets_and_pools"],
+    }
+
+
+async def query_and_score_request(body: AllocateAssetsRequest) -> dict:
+    """Creates the requested pools, then queries and scores miners with them."""
     synapse: Any = get_synapse_from_body(body=body, synapse_model=AllocateAssets)
     bt.logging.debug(f"Synapse:\n{synapse}")
     pools: Any = synapse.assets_and_pools["pools"]
 
-    new_pools = {}
-    for uid, pool in pools.items():
-        match synapse.request_type:
-            case REQUEST_TYPES.SYNTHETIC:
+    match synapse.request_type:
+        case REQUEST_TYPES.SYNTHETIC:
+            new_pools = {}
+            for uid, pool in pools.items():
                 new_pool = PoolFactory.create_pool(
                     pool_type=pool.pool_type,
                     contract_address=pool.contract_address,
@@ -229,16 +448,9 @@ async def allocate(body: AllocateAssetsRequest) -> AllocateAssetsResponse | None
                     reserve_size=pool.reserve_size,
                 )
                 new_pools[uid] = new_pool
-            case _:  # TODO: We assume this is an "organic request"
-                new_pool = PoolFactory.create_pool(
-                    pool_type=pool.pool_type,
-                    web3_provider=core_validator.w3,  # type: ignore[]
-                    user_address=(
-                        pool.user_address if pool.user_address != ADDRESS_ZERO else synapse.user_address
-                    ),  # TODO: is there a cleaner way to do this?
-                    contract_address=pool.contract_address,
-                )
-                new_pools[uid] = new_pool
+        case _:  # TODO: We assume this is an "organic request"
+            # syncing pools makes blocking rpc calls, so is done off of the event loop
+            new_pools = await asyncio.to_thread(get_chain_pools, pools, synapse.user_address)
 
     synapse.assets_and_pools["pools"] = new_pools
 
@@ -248,41 +460,58 @@ async def allocate(body: AllocateAssetsRequest) -> AllocateAssetsResponse | None
         request_type=synapse.request_type,
         user_address=synapse.user_address,
     )
-    request_uuid = uid = str(uuid.uuid4()).replace("-", "")
 
-    to_ret = dict(list(result.items())[:body.num_allocs])
-    ret = AllocateAssetsResponse(allocations=to_ret, request_uuid=request_uuid)
-    with sql.get_db_connection() as conn:
-        sql.log_allocations(conn, ret.request_uuid, synapse.assets_and_pools, ret.allocations)
+    return {"allocations": jsonable_encoder(result), "assets_and_pools": jsonable_encoder(synapse.assets_and_pools)}
 
-    return ret
 
+def get_chain_pools(pools: dict, user_address: str) -> dict:
+    """Returns the validator's initialized pools for the requested ones, synced at the current block - see PoolRegistry."""
+    return {
+        uid: core_validator.pool_registry.get_pool(  # type: ignore[]
+            pool.pool_type,
+            pool.contract_address,
+            pool.user_address if pool.user_address != ADDRESS_ZERO else user_address,
+        )
+        for uid, pool in pools.items()
+    }
 
-@app.get("/get_allocation/", response_model=list[GetAllocationResponse])
-async def get_allocations(
-    request_uid: str | None = None,
-    miner_uid: str | None = None,
-    from_ts: int | None = None,
-    to_ts: int | None = None,
-) -> list[dict]:
-    with sql.get_db_connection() as conn:
-        allocations = sql.get_filtered_allocations(conn, request_uid, miner_uid, from_ts, to_ts)
-    if not allocations:
-        raise HTTPException(status_code=404, detail="No allocations found")
-    return allocations
 
+async def acquire_request(params: dict) -> bool:
+    """
+    Admits a request for `api_key` if it's within the key's rate limit. Rate limits are only kept here, in the validator
+    core, so that they apply across every api worker. Admitted requests must be released with `release_request`.
+    """
+    api_key_info = api_key_cache.get_cached(params["api_key"])
+    if api_key_info is None:
+        api_key_info = await db.run(api_key_cache.get, params["api_key"])
+    return api_key_info is not None and api_key_cache.acquire(api_key_info)
+
+
+async def release_request(params: dict) -> None:
+    """Marks a request admitted by `acquire_request` as done - only if it was a `success` does it count to the limit."""
+    api_key_cache.release(params["api_key"], params["success"])
 
-@app.get("/request_info/", response_model=list[RequestInfoResponse])
-async def request_info(
-    request_uid: str | None = None,
-    from_ts: int | None = None,
-    to_ts: int | None = None,
-) -> list[dict]:
-    with sql.get_db_connection() as conn:
-        info = sql.get_request_info(conn, request_uid, from_ts, to_ts)
-    if not info:
-        raise HTTPException(status_code=404, detail="No request info found")
-    return info
+
+async def vali_info(params: dict) -> dict:  # noqa: ARG001
+    return jsonable_encoder({"step": core_validator.step, "config": core_validator.config})  # type: ignore[]
+
+
+async def api_settings(params: dict) -> dict:  # noqa: ARG001
+    config = core_validator.config  # type: ignore[]
+    return {
+        "compress_allocations": config.compress_allocations,
+        "archive_dir": config.archive_dir,
+        "archive_retention_days": config.archive_retention_days,
+    }
+
+
+CORE_HANDLERS = {
+    "allocate": allocate_assets,
+    "acquire_request": acquire_request,
+    "release_request": release_request,
+    "vali": vali_info,
+    "api_settings": api_settings,
+}
 
 
 # Function to run the main loop
@@ -300,8 +529,41 @@ async def run_uvicorn_server() -> None:
     await server.serve()
 
 
+async def run_api_workers() -> None:
+    """
+    Serves the api from `--api_workers` separate uvicorn worker processes, which forward the calls they need the
+    validator for to this process over `--ipc_socket`.
+    """
+    config = core_validator.config  # type: ignore[]
+    server = IpcServer(config.ipc_socket, CORE_HANDLERS)
+    await server.start()
+    workers = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "neurons.validator:app",
+        "--app-dir",
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),  # noqa: PTH100, PTH120
+        "--host",
+        "0.0.0.0",  # noqa: S104
+        "--port",
+        str(config.api_port),
+        "--workers",
+        str(config.api_workers),
+        env={**os.environ, IPC_SOCKET_ENV: os.path.abspath(config.ipc_socket)},  # noqa: PTH100
+    )
+    try:
+        await workers.wait()
+        bt.logging.error(f"Api workers exited with code {workers.returncode}")
+    finally:
+        if workers.returncode is None:
+            workers.terminate()
+            await workers.wait()
+        await server.stop()
+
+
 async def main() -> None:
-    global core_validator  # noqa: PLW0603
+    global core_validator, core, allocation_cache  # noqa: PLW0603
     core_validator = Validator()
     if not (core_validator.config.synthetic or core_validator.config.organic):
         bt.logging.error(
@@ -313,12 +575,24 @@ async def main() -> None:
     bt.logging.info(f"organic: {core_validator.config.organic}")
 
     if core_validator.config.organic:
-        await asyncio.gather(run_uvicorn_server(), run_main_loop())
+        allocation_cache = AllocationCache(
+            get_block=lambda: core_validator.last_block,  # type: ignore[]
+            ttl_blocks=core_validator.config.allocation_cache_blocks,
+        )
+        configure_api(await api_settings({}))
+        if archive is not None:
+            asyncio.create_task(archive_periodically())  # noqa: RUF006
+        if core_validator.config.api_workers > 1:
+            await asyncio.gather(run_api_workers(), run_main_loop())
+        else:
+            core = InProcessCore(CORE_HANDLERS)
+            await asyncio.gather(run_uvicorn_server(), run_main_loop())
     else:
+        # forwards are scheduled onto this event loop from the validator's background thread, so we must not block it
         with core_validator:
             while True:
                 bt.logging.debug("Running synthetic vali...")
-                time.sleep(10)  # noqa: ASYNC251
+                await asyncio.sleep(10)
 
 
 def start() -> None:
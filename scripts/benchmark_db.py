@@ -0,0 +1,123 @@
+"""
+Benchmarks the validator database queries on a large, synthetic database.
+
+Builds a database with `--rows` logs and allocations, then times the api server's queries on it - first with the
+original schema and connection settings, then with the indexes and pragmas from the latest migrations.
+
+Usage:
+    python scripts/benchmark_db.py --rows 1000000
+"""
+
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sturdy.validator import sql
+
+MIGRATIONS_DIR = Path(__file__).parent.parent / "db" / "migrations"
+INDEX_MIGRATION = "20240901130000_indexes.sql"
+NUM_KEYS = 100
+NUM_MINERS = 256
+
+
+def run_migrations(conn: sqlite3.Connection, with_indexes: bool) -> None:
+    for migration in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        if migration.name == INDEX_MIGRATION and not with_indexes:
+            continue
+        conn.executescript(migration.read_text().split("-- migrate:down")[0])
+    conn.commit()
+
+
+def populate(conn: sqlite3.Connection, num_rows: int) -> None:
+    start = datetime.now() - timedelta(days=30)  # noqa: DTZ005
+    step = timedelta(days=30) / num_rows
+
+    conn.executemany(
+        f"INSERT INTO {sql.API_KEYS_TABLE} VALUES (?, ?, ?, ?, ?)",
+        [(f"key_{idx}", f"name_{idx}", 1e9, 1000, start) for idx in range(NUM_KEYS)],
+    )
+    conn.executemany(
+        f"INSERT INTO {sql.LOGS_TABLE} VALUES (?, ?, ?, ?, ?)",
+        ((f"key_{idx % NUM_KEYS}", "/allocate", 1, 1e9 - idx, start + idx * step) for idx in range(num_rows)),
+    )
+
+    num_requests = num_rows // NUM_MINERS + 1
+    conn.executemany(
+        f"INSERT INTO {sql.ALLOCATION_REQUESTS_TABLE} (request_uid, assets_and_pools, created_at) VALUES (?, ?, ?)",
+        ((f"request_{idx}", "{}", start + idx * NUM_MINERS * step) for idx in range(num_requests)),
+    )
+    allocation = '{"apy": 1000000000000000000, "allocations": {"0x0000000000000000000000000000000000000000": 1}}'
+    conn.executemany(
+        f"INSERT INTO {sql.ALLOCATIONS_TABLE} VALUES (?, ?, ?, ?)",
+        ((f"request_{idx // NUM_MINERS}", str(idx % NUM_MINERS), allocation, start + idx * step) for idx in range(num_rows)),
+    )
+    conn.commit()
+
+
+def time_query(conn: sqlite3.Connection, fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(conn)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def benchmark(path: str, tuned: bool, repeats: int) -> dict[str, float]:
+    if tuned:
+        conn = sqlite3.connect(path, cached_statements=sql.CACHED_STATEMENTS)
+        sql.configure_connection(conn)
+    else:
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+
+    now = datetime.now()  # noqa: DTZ005
+    an_hour_ago_ms = int((now - timedelta(hours=1)).timestamp() * 1000)
+    api_key_info = {sql.KEY: "key_0", sql.RATE_LIMIT_PER_MINUTE: 1000}
+
+    queries = {
+        "rate_limit_exceeded": lambda conn: sql.rate_limit_exceeded(conn, api_key_info),
+        "get_api_key_info": lambda conn: sql.get_api_key_info(conn, "key_0"),
+        "allocations by request": lambda conn: sql.get_filtered_allocations(conn, "request_42", None, None, None),
+        "allocations by miner, last hour": lambda conn: sql.get_filtered_allocations(conn, None, "42", an_hour_ago_ms, None),
+        "allocations, last hour": lambda conn: sql.get_filtered_allocations(conn, None, None, an_hour_ago_ms, None),
+        "request info, last hour": lambda conn: sql.get_request_info(conn, None, an_hour_ago_ms, None),
+    }
+    try:
+        return {name: time_query(conn, fn, repeats) for name, fn in queries.items()}
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="number of log and allocation rows to generate")
+    parser.add_argument("--repeats", type=int, default=5, help="number of times to run each query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = str(Path(tmp_dir) / "validator_database.db")
+        conn = sqlite3.connect(path)
+        run_migrations(conn, with_indexes=False)
+        print(f"populating database with {args.rows} logs and allocations...")
+        populate(conn, args.rows)
+
+        before = benchmark(path, tuned=False, repeats=args.repeats)
+
+        print("adding indexes...")
+        conn.executescript((MIGRATIONS_DIR / INDEX_MIGRATION).read_text().split("-- migrate:down")[0])
+        conn.close()
+
+        after = benchmark(path, tuned=True, repeats=args.repeats)
+
+    print(f"\n{'query':<36}{'before (ms)':>14}{'after (ms)':>14}")
+    for name in before:
+        print(f"{name:<36}{before[name]:>14.2f}{after[name]:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmarks scoring a round of synthetic miner responses, i.e. `get_rewards`.
+
+Generates a synthetic scenario and `--miners` random (valid) allocations for it, then times scoring them and measures
+the peak memory allocated while doing so.
+
+Usage:
+    python scripts/benchmark_scoring.py --miners 256 --rounds 5
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import bittensor as bt
+import numpy as np
+
+from sturdy.pools import get_minimum_allocation
+from sturdy.protocol import REQUEST_TYPES, AllocateAssets
+from sturdy.validator.reward import get_rewards
+from sturdy.validator.simulator import Simulator
+
+
+def make_responses(assets_and_pools: dict, num_miners: int, rng: np.random.RandomState) -> list[AllocateAssets]:
+    pools = assets_and_pools["pools"]
+    # every pool gets at least its minimum allocation, the rest is split at random
+    minimums = {uid: get_minimum_allocation(pool) for uid, pool in pools.items()}
+    remaining = assets_and_pools["total_assets"] - sum(minimums.values())
+    responses = []
+    for _ in range(num_miners):
+        weights = (rng.dirichlet(np.ones(len(pools))) * 1e6).astype(int)
+        allocations = {
+            uid: minimums[uid] + remaining * int(weight) // 10**6 for uid, weight in zip(pools, weights, strict=True)
+        }
+        response = AllocateAssets(
+            request_type=REQUEST_TYPES.SYNTHETIC,
+            assets_and_pools=assets_and_pools,
+            allocations=allocations,
+        )
+        response.dendrite.process_time = float(rng.uniform(0.1, 10))
+        responses.append(response)
+    return responses
+
+
+def score_round(seed: int, num_miners: int) -> tuple[float, int]:
+    """
+    Scores a round, returning how long it took (seconds) and the peak memory allocated while scoring (bytes).
+    The round is scored twice, as tracing memory allocations slows scoring down considerably.
+    """
+    simulator = Simulator(seed=seed)
+    simulator.initialize()
+    simulator.init_data()
+    assets_and_pools = simulator.assets_and_pools
+    responses = make_responses(assets_and_pools, num_miners, np.random.RandomState(seed))
+    uids = [str(uid) for uid in range(num_miners)]
+    ctx = SimpleNamespace(simulator=simulator, device="cpu", w3=None)
+
+    start = time.perf_counter()
+    get_rewards(ctx, query=0, uids=uids, responses=responses, assets_and_pools=assets_and_pools)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    get_rewards(ctx, query=0, uids=uids, responses=responses, assets_and_pools=assets_and_pools)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--miners", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    bt.logging.off()
+
+    times, peaks = [], []
+    for idx in range(args.rounds):
+        elapsed, peak = score_round(args.seed + idx, args.miners)
+        times.append(elapsed)
+        peaks.append(peak)
+
+    print(f"scoring {args.miners} miners over {args.rounds} rounds")
+    print(f"  time: median {statistics.median(times) * 1000:.0f}ms, max {max(times) * 1000:.0f}ms")
+    print(f"  peak memory: median {statistics.median(peaks) / 2**20:.1f}MiB, max {max(peaks) / 2**20:.1f}MiB")
+
+
+if __name__ == "__main__":
+    main()
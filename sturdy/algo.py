@@ -1,110 +1,165 @@
-import math
 import random  # For randomness to avoid similarity penalties
-import gmpy2  # To ensure precision in arithmetic operations
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from typing import cast
 
 import bittensor as bt
+import numpy as np
+import numpy.typing as npt
 from web3.constants import ADDRESS_ZERO
 
 from sturdy.base.miner import BaseMinerNeuron
+from sturdy.constants import MINER_SUPPLY_RATE_SAMPLES, SUPPLY_RATE_WORKERS
+from sturdy.pool_registry import PoolRegistry
 from sturdy.pools import (
-    POOL_TYPES,
     BasePool,
+    ChainBasedPoolModel,
     PoolFactory,
     get_minimum_allocation,
+    sync_pool,
 )
 from sturdy.protocol import REQUEST_TYPES, AllocateAssets
 
-RANDOMNESS_FACTOR = gmpy2.mpfr('0.009')  # Randomness factor to avoid similarity penalties
-THRESHOLD = gmpy2.mpfr('0.99')  # Threshold to avoid over-allocation
+RANDOMNESS_FACTOR = 0.009  # Randomness factor to avoid similarity penalties
+WATER_FILL_STEPS = 1000  # Number of steps the assets left after the minimum allocations are allocated in
+
+# supply rates (scaled by 1e18) of a pool, given the amounts allocated to it in total
+SupplyRates = Callable[[npt.NDArray[np.float64]], npt.NDArray[np.float64]]
+
+
+def get_supply_rates(
+    pools: list[BasePool | ChainBasedPoolModel], max_amount: int, max_samples: int = MINER_SUPPLY_RATE_SAMPLES
+) -> list[SupplyRates]:
+    """
+    Returns the supply rates of each pool as a function of the amounts allocated to it. Synthetic pools work out their
+    supply rates directly. Chain based pools (which must have been synced) have theirs sampled into a `SupplyRateCurve`
+    of at most `max_samples` calls to the chain each - made concurrently - which keeps requests well within the
+    validator's timeout, at the cost of a coarser curve.
+    """
+
+    def pool_supply_rates(pool: BasePool | ChainBasedPoolModel) -> SupplyRates:
+        if isinstance(pool, BasePool):
+            return pool.supply_rates
+        curve = pool.supply_rate_curve(max_amount, max_samples=max_samples)
+        return lambda amounts: np.array([curve(int(amount)) for amount in amounts], dtype=np.float64)
+
+    with ThreadPoolExecutor(max_workers=SUPPLY_RATE_WORKERS, thread_name_prefix="supply_rate_curve") as executor:
+        return list(executor.map(pool_supply_rates, pools))
+
+
+def water_fill(
+    supply_rates: list[SupplyRates], minimums: list[int], total_assets: int, steps: int = WATER_FILL_STEPS
+) -> list[int]:
+    """
+    Allocates `total_assets` to pools so as to maximize the total yield - i.e. the sum of each allocation times the
+    pool's supply rate given that allocation - while allocating at least the minimum to each pool.
+
+    The assets left after the minimum allocations are handed out in `steps` equal steps. Each pool's yield is evaluated
+    for every step it could be given, which gives the marginal supply rate of each of those steps. Supply rates fall as
+    more is supplied, so the optimum fills every pool up to a common marginal rate (the "water level"), which is the
+    `steps`-th highest marginal rate across all pools. Where a pool's yield isn't concave, a step is only counted as
+    being worth as much as the worst step before it, so that pools are always filled from their minimum up.
+
+    Returns the allocations, which add up to `total_assets` - or the minimum allocations, if those already add up to
+    more than it.
+    """
+
+    remaining = total_assets - sum(minimums)
+    if remaining <= 0 or len(minimums) == 0:
+        return list(minimums)
+
+    extra = np.arange(steps + 1) * (remaining / steps)
+    marginal_rates = np.empty((len(minimums), steps))
+    for pool_idx, (pool_supply_rates, minimum) in enumerate(zip(supply_rates, minimums, strict=True)):
+        amounts = minimum + extra
+        yields = amounts * pool_supply_rates(amounts)
+        marginal_rates[pool_idx] = np.minimum.accumulate(np.diff(yields))
+
+    # the steps with the highest marginal rates, which are always the first steps of each pool
+    filled = np.argpartition(-marginal_rates.ravel(), steps - 1)[:steps]
+    pool_steps = np.bincount(filled // steps, minlength=len(minimums))
+
+    step = remaining // steps
+    allocations = [minimum + int(num_steps) * step for minimum, num_steps in zip(minimums, pool_steps, strict=True)]
+    # what's left from rounding the steps down goes to the pool which was given the most
+    allocations[int(np.argmax(pool_steps))] += remaining - steps * step
+    return allocations
+
+
+def randomize_allocations(allocations: list[int], minimums: list[int]) -> list[int]:
+    """
+    Adds some randomness to what's allocated on top of the minimum allocations to avoid similarity penalties, without
+    changing the total allocated.
+    """
+
+    extras = [allocation - minimum for allocation, minimum in zip(allocations, minimums, strict=True)]
+    remaining = sum(extras)
+    if remaining <= 0:
+        return list(allocations)
+
+    randomized = [int(extra * (1 + random.uniform(-RANDOMNESS_FACTOR, RANDOMNESS_FACTOR))) for extra in extras]  # noqa: S311
+    if sum(randomized) <= 0:
+        return list(allocations)
+    scale = remaining / sum(randomized)
+    randomized = [int(extra * scale) for extra in randomized]
+    # maintain the total allocation
+    randomized[randomized.index(max(randomized))] += remaining - sum(randomized)
+    return [minimum + extra for minimum, extra in zip(minimums, randomized, strict=True)]
+
 
 def optimized_algorithm(self: BaseMinerNeuron, synapse: AllocateAssets) -> dict:
     bt.logging.debug(f"Received request type: {synapse.request_type}")
 
     pools = cast(dict, synapse.assets_and_pools["pools"])
+    pool_registry: PoolRegistry | None = getattr(self, "pool_registry", None)
+    water_fill_cache = getattr(self, "water_fill_cache", None)
 
     # Initialize pools based on request type
     match synapse.request_type:
         case REQUEST_TYPES.ORGANIC:
             for uid, pool in pools.items():
-                pools[uid] = PoolFactory.create_pool(
-                    pool_type=pool.pool_type,
-                    web3_provider=self.w3,
-                    user_address=(pool.user_address if pool.user_address != ADDRESS_ZERO else synapse.user_address),
-                    contract_address=pool.contract_address,
-                )
+                user_address = pool.user_address if pool.user_address != ADDRESS_ZERO else synapse.user_address
+                if pool_registry is not None:
+                    pools[uid] = pool_registry.get_pool(pool.pool_type, pool.contract_address, user_address)
+                else:
+                    pools[uid] = PoolFactory.create_pool(
+                        pool_type=pool.pool_type,
+                        web3_provider=self.w3,
+                        user_address=user_address,
+                        contract_address=pool.contract_address,
+                    )
         case _:
             for uid in pools:
                 pools[uid] = BasePool(**pools[uid].dict())
 
-    total_assets_available = gmpy2.mpz(synapse.assets_and_pools["total_assets"]) * THRESHOLD
+    total_assets = int(synapse.assets_and_pools["total_assets"])
 
-    # Sync pool parameters using on-chain calls
+    # Sync pool parameters using on-chain calls - pools from a PoolRegistry have been synced at the current block already
     for pool in pools.values():
-        match pool.pool_type:
-            case POOL_TYPES.AAVE:
-                pool.sync(synapse.user_address, self.w3)
-            case POOL_TYPES.STURDY_SILO:
-                pool.sync(synapse.user_address, self.w3)
-            case T if T in (POOL_TYPES.DAI_SAVINGS, POOL_TYPES.COMPOUND_V3, POOL_TYPES.MORPHO, POOL_TYPES.YEARN_V3):
-                pool.sync(self.w3)
+        if not isinstance(pool, ChainBasedPoolModel) or pool.synced_block is None:
+            sync_pool(pool, self.w3, synapse.user_address)
 
     # Calculate minimum allocations for each pool
-    minimums = {pool_uid: gmpy2.mpz(get_minimum_allocation(pool)) for pool_uid, pool in pools.items()}
-
-    total_assets_available -= sum(minimums.values())
-    remaining_balance = total_assets_available
-
-    # Calculate APY for each pool
-    supply_rates = {}
-    for pool in pools.values():
-        match pool.pool_type:
-            case POOL_TYPES.AAVE:
-                apy = pool.supply_rate(synapse.user_address, remaining_balance // len(pools))
-            case T if T in (POOL_TYPES.STURDY_SILO, POOL_TYPES.COMPOUND_V3, POOL_TYPES.MORPHO, POOL_TYPES.YEARN_V3):
-                apy = pool.supply_rate(remaining_balance // len(pools))
-            case POOL_TYPES.DAI_SAVINGS:
-                apy = pool.supply_rate()
-            case POOL_TYPES.SYNTHETIC:
-                apy = pool.supply_rate
-            case _:
-                apy = gmpy2.mpz(0)
-        supply_rates[pool.contract_address] = apy
-
-
-    # Identify the pool with the highest APY
-    max_apy_pool = max(supply_rates, key=supply_rates.get)
-
-    # Initialize allocations with minimums
-    allocations = {pool_uid: minimums[pool_uid] for pool_uid in pools}
-
-    # Assign the remaining assets to the pool with the highest APY
-    allocations[max_apy_pool] += remaining_balance
-
-    total_allocation = gmpy2.mpz(0)
+    minimums = [int(get_minimum_allocation(pool)) for pool in pools.values()]
+    if sum(minimums) > total_assets:
+        bt.logging.warning("Minimum allocations exceed the total assets - allocations will be rejected")
+
+    # Equalize the marginal supply rates of the pools - allocating all of the total assets, so that at least
+    # TOTAL_ALLOC_THRESHOLD of them are allocated
+    def allocate() -> list[int]:
+        supply_rates = get_supply_rates(list(pools.values()), total_assets)
+        return water_fill(supply_rates, minimums, total_assets)
+
+    if synapse.request_type == REQUEST_TYPES.ORGANIC and water_fill_cache is not None:
+        pools_key = tuple(
+            PoolRegistry.key(pool.pool_type, pool.contract_address, pool.user_address) for pool in pools.values()
+        )
+        allocations = water_fill_cache.get(pools_key, minimums, total_assets, allocate)
+    else:
+        allocations = allocate()
 
     # Add randomness to allocations to avoid similarity penalties
-    for pool_uid in allocations:
-        random_factor = 1 + gmpy2.mpfr(random.uniform(-RANDOMNESS_FACTOR, RANDOMNESS_FACTOR))
-        randomised_allocation = gmpy2.ceil(allocations[pool_uid] * random_factor)
-        allocations[pool_uid] = gmpy2.mpz(max(randomised_allocation, minimums[pool_uid]))
-        # maintain the total allocation
-        total_allocation += allocations[pool_uid]
-
-    # if the total_allocation is less than the threeshold * total_assets, add the difference to the pool with the highest APY
-    if total_allocation < total_assets_available:
-        allocations[max_apy_pool] += total_assets_available - total_allocation
+    allocations = randomize_allocations(allocations, minimums)
 
     # Convert allocations to integers for compatibility
-    final_allocations = {uid: int(alloc) for uid, alloc in allocations.items()}
-
-    # Validate allocations using the check_allocations function
-    # is_valid = check_allocations(synapse.assets_and_pools, final_allocations)
-    # if is_valid:
-    #     bt.logging.info("Allocations are valid according to validator rules.")
-    # else:
-    #     bt.logging.error("Allocations failed validation check! Please investigate.")
-
-    # bt.logging.info(f"Final Allocations: {final_allocations}")
-
-    return final_allocations
+    return {uid: int(alloc) for uid, alloc in zip(pools, allocations, strict=True)}
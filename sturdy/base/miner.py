@@ -21,13 +21,17 @@ import asyncio
 import threading
 import argparse
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import bittensor as bt
 from web3 import Web3
 
 from sturdy.base.neuron import BaseNeuron
+from sturdy.pool_registry import PoolRegistry
+from sturdy.utils.admission import AdmissionController
 from sturdy.utils.config import add_miner_args
 from sturdy.utils.wandb import init_wandb_miner
+from sturdy.water_fill_cache import WaterFillCache
 from dotenv import load_dotenv
 
 
@@ -59,6 +63,24 @@ class BaseMinerNeuron(BaseNeuron):
             )
 
         self.w3 = Web3(Web3.HTTPProvider(w3_provider_url))
+        # organic requests reuse pools which have already been initialized - see PoolRegistry - and, unless disabled,
+        # allocations already worked out for the same pools in the same block - see WaterFillCache
+        self.pool_registry = PoolRegistry(self.w3, get_block=lambda: self.block)
+        self.water_fill_cache = (
+            None if self.config.neuron.disable_water_fill_cache else WaterFillCache(get_block=lambda: self.block)
+        )
+
+        # Requests are worked on off of the axon's event loop - they make blocking calls to the chain - on at most
+        # neuron.max_concurrent_forwards threads, so that requests from different validators are answered in parallel.
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.neuron.max_concurrent_forwards, thread_name_prefix="forward"
+        )
+        # Requests which can't be answered before they time out are shed - see AdmissionController.
+        self.admission_controller = (
+            None
+            if self.config.neuron.disable_admission_control
+            else AdmissionController(workers=self.config.neuron.max_concurrent_forwards)
+        )
 
         # Warn if allowing incoming requests from anyone.
         if not self.config.blacklist.force_validator_permit:
@@ -147,6 +169,9 @@ class BaseMinerNeuron(BaseNeuron):
                 self.sync()
                 self.step += 1
 
+                if self.admission_controller is not None:
+                    bt.logging.info(f"Request admission: {self.admission_controller.stats()}")
+
         # If someone intentionally stops the miner, it'll safely terminate operations.
         except KeyboardInterrupt:
             self.axon.stop()
@@ -202,6 +227,7 @@ class BaseMinerNeuron(BaseNeuron):
                        None if the context was exited without an exception.
         """
         self.stop_run_thread()
+        self.executor.shutdown(wait=False, cancel_futures=True)
         if self.wandb is not None:
             bt.logging.debug("closing wandb connection")
             self.wandb.finish()
@@ -27,13 +27,23 @@ from web3 import Web3
 import bittensor as bt
 
 from typing import List
+from concurrent.futures import Future
 from traceback import print_exception
 
 from sturdy.base.neuron import BaseNeuron
 from sturdy.mock import MockDendrite
+from sturdy.pool_registry import PoolRegistry
 from sturdy.utils.config import add_validator_args
+from sturdy.utils.scheduler import BlockScheduler
+from sturdy.validator.pipeline import RoundPipeline
 from sturdy.utils.wandb import init_wandb_validator, should_reinit_wandb, reinit_wandb
-from sturdy.constants import QUERY_RATE
+from sturdy.constants import (
+    CHECKPOINT_RATE,
+    METAGRAPH_SYNC_RATE,
+    QUERY_RATE,
+    SET_WEIGHTS_RATE,
+    WANDB_LOG_RATE,
+)
 
 from dotenv import load_dotenv
 
@@ -69,6 +79,8 @@ class BaseValidatorNeuron(BaseNeuron):
                 raise ValueError("You must provide a valid web3 provider url as an organic validator!")
 
             self.w3 = Web3(Web3.HTTPProvider(w3_provider_url))
+            # organic requests reuse pools which have already been initialized - see PoolRegistry
+            self.pool_registry = PoolRegistry(self.w3, get_block=lambda: self.block)
 
         # Dendrite lets us send messages to other nodes (axons) in the network.
         if self.config.mock:
@@ -87,6 +99,8 @@ class BaseValidatorNeuron(BaseNeuron):
 
         # Init sync with the network. Updates the metagraph.
         self.sync()
+        # the last block the scheduler saw - for code which mustn't wait on the chain, e.g. the api's event loop
+        self.last_block = self.block
 
         # Serve axon to enable external connections.
         if not self.config.neuron.axon_off:
@@ -103,6 +117,9 @@ class BaseValidatorNeuron(BaseNeuron):
         self.thread: threading.Thread = None
         self.lock = asyncio.Lock()
 
+        # Overlaps the querying and scoring of consecutive synthetic rounds.
+        self.pipeline = RoundPipeline(self, max_in_flight_rounds=self.config.neuron.max_in_flight_rounds)
+
     def serve_axon(self):
         """Serve axon to enable external connections."""
 
@@ -127,10 +144,6 @@ class BaseValidatorNeuron(BaseNeuron):
             bt.logging.error(f"Failed to create Axon initialize with exception: {e}")
             pass
 
-    async def concurrent_forward(self):
-        coroutines = [self.forward() for _ in range(self.config.neuron.num_concurrent_forwards)]
-        await asyncio.gather(*coroutines)
-
     def run(self):
         """
         Initiates and manages the main loop for the miner on the Bittensor network. The main loop handles graceful shutdown on
@@ -143,8 +156,11 @@ class BaseValidatorNeuron(BaseNeuron):
         3. Periodically resynchronizes with the chain; updating the metagraph with the latest network state and setting
         weights.
 
-        The essence of the validator's operations is in the forward function, which is called every step. The forward function
-        is responsible for querying the network and scoring the responses.
+        The essence of the validator's operations is in the forward function, which is started once more than QUERY_RATE
+        blocks have passed since it was last started. The forward function is responsible for querying the network and
+        scoring the responses, and consecutive rounds are pipelined so that one round can be scored while the next one is
+        querying miners - see `RoundPipeline`. Syncing the metagraph, setting weights, logging to wandb and checkpointing
+        are scheduled as separate periodic jobs - see `BlockScheduler`.
 
         Note:
             - The function leverages the global configurations set during the initialization of the miner.
@@ -158,74 +174,21 @@ class BaseValidatorNeuron(BaseNeuron):
         # Check that validator is registered on the network.
         self.sync()
 
-        bt.logging.info(f"Validator starting at block: {self.block}")
-        last_query_block = self.block
+        start_block = self.block
+        bt.logging.info(f"Validator starting at block: {start_block}")
+
+        scheduler = BlockScheduler(get_block=self.poll_block, should_exit=lambda: self.should_exit)
+        # Run multiple forwards concurrently - runs once more than QUERY_RATE blocks have passed since the last run
+        scheduler.add_job("forward", QUERY_RATE + 1, self.run_forward_step, start_block=start_block)
+        scheduler.add_job("sync_metagraph", METAGRAPH_SYNC_RATE, self.sync_metagraph, start_block=start_block)
+        scheduler.add_job("set_weights", SET_WEIGHTS_RATE, self.maybe_set_weights, start_block=start_block)
+        if not self.config.wandb.off:
+            scheduler.add_job("log_wandb", WANDB_LOG_RATE, self.log_wandb, start_block=start_block)
+        scheduler.add_job("checkpoint", CHECKPOINT_RATE, self.save_state, start_block=start_block)
 
         # This loop maintains the validator's operations until intentionally stopped.
         try:
-            while True:
-                # Run multiple forwards concurrently - runs every 2 blocks
-                current_block = self.subtensor.block
-                if current_block - last_query_block > QUERY_RATE:
-                    bt.logging.info(f"step({self.step}) block({self.block})")
-
-                    if self.config.organic:
-                        future = asyncio.run_coroutine_threadsafe(self.concurrent_forward(), self.loop)
-                        future.result()  # Wait for the coroutine to complete
-                    else:
-                        self.loop.run_until_complete(self.concurrent_forward())
-
-                    last_query_block = current_block
-                    # Sync metagraph and potentially set weights.
-                    self.sync()
-
-                    if not self.config.wandb.off:
-                        bt.logging.debug("Logging info to wandb")
-                        try:
-                            metrics_to_log = {
-                                f"miner_scores/score_uid_{uid}": float(score) for uid, score in enumerate(self.scores)
-                            }
-                            other_metrics = {
-                                "block": self.block,
-                                "validator_run_step": self.step,
-                            }
-                            sim_penalties = {
-                                f"similarity_penalties/uid_{uid}": score for uid, score in self.similarity_penalties.items()
-                            }
-                            apys = {
-                                f"apys/uid_{uid}": apy for uid, apy in self.sorted_apys.items()
-                            }
-                            axon_times = {
-                                f"axon_times/uid_{uid}": axon_time for uid, axon_time in self.sorted_axon_times.items()
-                            }
-                            metrics_to_log.update(other_metrics)
-                            metrics_to_log.update(sim_penalties)
-                            metrics_to_log.update(apys)
-                            metrics_to_log.update(axon_times)
-                            self.wandb.log(metrics_to_log, step=self.block)
-                            self.wandb_run_log_count += 1
-                            bt.logging.info(
-                                f"wandb log count: {self.wandb_run_log_count} | \
-                                until reinit: {self.config.wandb.run_log_limit - self.wandb_run_log_count}"
-                            )
-                        except Exception as e:
-                            bt.logging.error("Failed to log info into wandb!")
-                            bt.logging.error(e)
-
-                        # rollover to new wandb run if needed:
-                        if should_reinit_wandb(self):
-                            try:
-                                reinit_wandb(self)
-                                self.wandb_run_log_count = 0
-                            except Exception as e:
-                                bt.logging.error("Failed reinit wandb run!")
-                                bt.logging.error(e)
-
-                # Check if we should exit.
-                if self.should_exit:
-                    break
-
-                self.step += 1
+            scheduler.run(start_block=start_block)
 
         # If someone intentionally stops the validator, it'll safely terminate operations.
         except KeyboardInterrupt:
@@ -238,11 +201,80 @@ class BaseValidatorNeuron(BaseNeuron):
             bt.logging.error("Error during validation", str(err))
             bt.logging.debug(print_exception(type(err), err, err.__traceback__))
 
-    async def run_concurrent_forward(self):
+    def poll_block(self) -> int:
+        """Gets the current block, and keeps it as `last_block` for other threads to read without going to the chain."""
+        self.last_block = self.block
+        return self.last_block
+
+    def run_forward_step(self) -> None:
+        """
+        Starts the next round on the validator's event loop, without waiting for it - or the previous rounds - to be
+        scored. If `max_in_flight_rounds` rounds are already running the round is skipped, rather than holding up the
+        scheduler's other jobs until one finishes - see `RoundPipeline`.
+        """
+        bt.logging.info(f"step({self.step}) block({self.block}) rounds in flight({self.pipeline.in_flight})")
+
+        def round_started(future: Future) -> None:
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                bt.logging.error(f"Failed to start a validation round: {future.exception()}")
+            elif future.result() is None:
+                bt.logging.warning(f"{self.pipeline.max_in_flight_rounds} rounds already in flight, skipping this one")
+            else:
+                self.step += 1
+
+        asyncio.run_coroutine_threadsafe(self.pipeline.try_start_round(), self.loop).add_done_callback(round_started)
+
+    def sync_metagraph(self) -> None:
+        """Checks that the validator is still registered and resyncs the metagraph if enough blocks have elapsed."""
+        self.check_registered()
+        if self.should_sync_metagraph():
+            self.resync_metagraph()
+
+    def maybe_set_weights(self) -> None:
+        """Sets weights on chain if enough blocks have elapsed since the last time they were set."""
+        if self.should_set_weights():
+            self.set_weights()
+
+    def log_wandb(self) -> None:
+        """Logs the latest scores and metrics to wandb, rolling over to a new run if needed."""
+        bt.logging.debug("Logging info to wandb")
         try:
-            await self.concurrent_forward()
+            metrics_to_log = {f"miner_scores/score_uid_{uid}": float(score) for uid, score in enumerate(self.scores)}
+            other_metrics = {
+                "block": self.block,
+                "validator_run_step": self.step,
+                "rounds_per_hour": self.pipeline.rounds_per_hour,
+                "rounds_in_flight": self.pipeline.in_flight,
+            }
+            sim_penalties = {
+                f"similarity_penalties/uid_{uid}": score for uid, score in self.similarity_penalties.items()
+            }
+            apys = {f"apys/uid_{uid}": apy for uid, apy in self.sorted_apys.items()}
+            axon_times = {f"axon_times/uid_{uid}": axon_time for uid, axon_time in self.sorted_axon_times.items()}
+            metrics_to_log.update(other_metrics)
+            metrics_to_log.update(sim_penalties)
+            metrics_to_log.update(apys)
+            metrics_to_log.update(axon_times)
+            self.wandb.log(metrics_to_log, step=self.block)
+            self.wandb_run_log_count += 1
+            bt.logging.info(
+                f"wandb log count: {self.wandb_run_log_count} | \
+                until reinit: {self.config.wandb.run_log_limit - self.wandb_run_log_count}"
+            )
         except Exception as e:
-            bt.logging.error(f"Error in concurrent_forward: {e}")
+            bt.logging.error("Failed to log info into wandb!")
+            bt.logging.error(e)
+
+        # rollover to new wandb run if needed:
+        if should_reinit_wandb(self):
+            try:
+                reinit_wandb(self)
+                self.wandb_run_log_count = 0
+            except Exception as e:
+                bt.logging.error("Failed reinit wandb run!")
+                bt.logging.error(e)
 
     def run_in_background_thread(self):
         """
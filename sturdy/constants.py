@@ -27,11 +27,50 @@ MIN_STOCHASTICITY = 0.002  # min stochasticity
 MAX_STOCHASTICITY = 0.002  # max stochasticity
 STOCHASTICITY_STEP = 0.0001
 POOL_RESERVE_SIZE = int(100e18)  # 100
+POOL_GEN_VERSION = 1  # synthetic pool generator version - see generate_assets_and_pools()
 
 QUERY_RATE = 2  # how often synthetic validator queries miners (blocks)
 QUERY_TIMEOUT = 45  # timeout (seconds)
+MINER_MAX_CONCURRENT_FORWARDS = 4  # maximum number of requests a miner works on at the same time
+WATER_FILL_CACHE_BUCKET = 0.001  # relative difference in total assets within which miners share allocations (0.1%)
+WATER_FILL_CACHE_MAX_SIZE = 256  # maximum number of allocations a miner keeps around for reuse
+ADMISSION_DEADLINE_MARGIN = 2  # time left for a miner's response to make it back to the validator (seconds)
+ADMISSION_WINDOW = 256  # number of recent requests a miner measures its service times and latencies over
+
+BLOCK_TIME = 12  # expected time between blocks (seconds)
+# how often the validator runs each of its periodic jobs (blocks)
+METAGRAPH_SYNC_RATE = 5
+SET_WEIGHTS_RATE = 5
+WANDB_LOG_RATE = QUERY_RATE + 1  # i.e. along with every forward
+CHECKPOINT_RATE = 5
 
 TOTAL_ALLOC_THRESHOLD = 0.98
+POOL_REGISTRY_MAX_SIZE = 1024  # maximum number of initialized chain based pools kept around for reuse
+SUPPLY_RATE_WORKERS = 16  # maximum number of supply rates looked up on chain at once when scoring organic requests
+SUPPLY_RATE_CURVE_MAX_ERROR = int(1e14)  # error supply rate curves are sampled to within, where possible (0.01%)
+SUPPLY_RATE_CURVE_MAX_SAMPLES = 65  # maximum number of supply rates sampled for a supply rate curve
+MINER_SUPPLY_RATE_SAMPLES = 5  # maximum number of supply rates a miner samples from the chain per pool, per request
+
+# api server
+API_KEY_CACHE_TTL = 60  # how long api keys are cached for before being reloaded from the db (seconds)
+API_KEYS_VERSION_CHECK_INTERVAL = 1  # how often to check whether sturdy-cli has changed any api keys (seconds)
+RATE_LIMIT_WINDOW = 60  # window over which api keys are rate limited (seconds)
+WRITE_BEHIND_FLUSH_INTERVAL = 1  # how often queued request logs and allocations are written to the db (seconds)
+WRITE_BEHIND_MAX_BATCH_SIZE = 1000  # maximum number of queued writes per db transaction
+WRITE_BEHIND_MAX_QUEUE_SIZE = 10000  # maximum number of queued writes before requests wait for the queue to drain
+DB_POOL_SIZE = 4  # number of db connections (and threads running queries on them) the api server keeps around
+DB_MAX_CONNECTIONS = 16  # maximum number of db connections the api server has open at once (e.g. for streamed responses)
+DB_CONNECTION_TIMEOUT = 30  # how long to wait for a db connection when all of them are in use (seconds)
+DB_MAX_PENDING_QUERIES = 64  # maximum number of queries waiting on the db before more requests wait to submit theirs
+ARCHIVE_DIR = "validator_archive"  # where old allocations and request logs are archived to
+ARCHIVE_RETENTION_DAYS = 30  # how long allocations and request logs are kept in the db before being archived (days)
+ARCHIVE_INTERVAL = 60 * 60  # how often old allocations and request logs are archived (seconds)
+ALLOCATION_CACHE_BLOCKS = 1  # how long the results of allocation requests are reused for identical requests (blocks)
+ALLOCATION_CACHE_MAX_SIZE = 1024  # maximum number of allocation request results kept for reuse
+IPC_SOCKET_PATH = "validator_core.sock"  # where the validator core listens for calls from api workers
+IPC_SOCKET_ENV = "STURDY_VALIDATOR_CORE_SOCKET"  # tells api workers where the validator core is listening
+IPC_TIMEOUT = 120  # how long api workers wait for the validator core to answer a call (seconds)
+IPC_MAX_MESSAGE_SIZE = 16 * 1024 * 1024  # maximum size of a message between api workers and the validator core (bytes)
 
 # The following constants are for different pool models
 # Aave
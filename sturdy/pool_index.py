@@ -0,0 +1,40 @@
+from collections.abc import Iterable
+
+import numpy as np
+import numpy.typing as npt
+
+from sturdy.protocol import AllocationsDict
+
+
+class PoolIndex:
+    """
+    Canonical index of a round's pools, mapping their uids (contract addresses) to dense integers - so that
+    allocations can be converted into arrays once, and compared and scored without looking pools up by address.
+
+    Pools are indexed in the order they're given in, which is the order they're in in `assets_and_pools["pools"]` and
+    in every step of the simulator's `pool_history`. Arrays hold python ints (`dtype=object`), as amounts in wei don't
+    fit into int64.
+    """
+
+    def __init__(self, pool_uids: Iterable[str]) -> None:
+        self.uids = list(pool_uids)
+        self.indices = {uid: idx for idx, uid in enumerate(self.uids)}
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    def to_array(self, allocations: AllocationsDict) -> npt.NDArray[np.object_]:
+        """
+        Converts allocations into an array of amounts indexed by pool. Pools that aren't allocated to are 0.
+        Raises a KeyError if anything is allocated to a pool that isn't in the index, and a ValueError if an amount
+        isn't a whole number - rather than rounding it down, which could hide an over allocation.
+        """
+        array = np.zeros(len(self.uids), dtype=object)
+        for uid, amount in allocations.items():
+            if int(amount) != amount:
+                raise ValueError(f"Allocation to pool {uid} isn't a whole amount: {amount}")
+            array[self.indices[uid]] = int(amount)
+        return array
+
+    def to_dict(self, array: npt.NDArray) -> AllocationsDict:
+        return {uid: int(amount) for uid, amount in zip(self.uids, array, strict=True)}
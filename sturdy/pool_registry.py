@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+
+from web3 import Web3
+
+from sturdy.constants import POOL_REGISTRY_MAX_SIZE
+from sturdy.pools import POOL_TYPES, ChainBasedPoolModel, PoolFactory, sync_pool
+
+PoolKey = tuple[int, str, str]
+
+
+class PoolRegistry:
+    """
+    Long-lived chain based pools, so that they're only initialized (which loads their abis and looks up the contracts
+    they depend on) once, rather than for every request they're in.
+
+    Pools are keyed by their type, contract address and user address. The pools handed out have been synced at the
+    current block: a pool is resynced the first time it's asked for in a new block. Resyncing syncs a copy of the pool
+    which then replaces it in the registry, so the pools handed out are never changed underneath whoever is using them.
+
+    Thread safe - pools are synced on the calling thread, and only one thread syncs a given pool at a time. At most
+    `max_size` pools are kept, the least recently used are dropped.
+    """
+
+    def __init__(self, web3_provider: Web3, get_block: Callable[[], int], max_size: int = POOL_REGISTRY_MAX_SIZE) -> None:
+        self.web3_provider = web3_provider
+        self.get_block = get_block
+        self.max_size = max_size
+        self._pools: OrderedDict[PoolKey, ChainBasedPoolModel] = OrderedDict()
+        self._sync_locks: dict[PoolKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pools)
+
+    @staticmethod
+    def key(pool_type: POOL_TYPES | int | str, contract_address: str, user_address: str) -> PoolKey:
+        if isinstance(pool_type, str):
+            pool_type = POOL_TYPES[pool_type]
+        return int(pool_type), Web3.to_checksum_address(contract_address), Web3.to_checksum_address(user_address)
+
+    def get_pool(self, pool_type: POOL_TYPES | int | str, contract_address: str, user_address: str) -> ChainBasedPoolModel:
+        """Returns the pool, synced at the current block."""
+        key = self.key(pool_type, contract_address, user_address)
+        block = self.get_block()
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None:
+                self._pools.move_to_end(key)
+                if pool.synced_block == block:
+                    return pool
+            sync_lock = self._sync_locks.setdefault(key, threading.Lock())
+
+        with sync_lock:
+            with self._lock:
+                pool = self._pools.get(key, pool)
+            # another thread may have synced it while we waited
+            if pool is not None and pool.synced_block == block:
+                return pool
+
+            if pool is None:
+                fresh_pool = PoolFactory.create_pool(pool_type=key[0], contract_address=key[1], user_address=key[2])
+            else:
+                fresh_pool = pool.snapshot()
+            sync_pool(fresh_pool, self.web3_provider)
+            fresh_pool._synced_block = block
+
+            with self._lock:
+                self._pools[key] = fresh_pool
+                self._pools.move_to_end(key)
+                while len(self._pools) > self.max_size:
+                    evicted, _ = self._pools.popitem(last=False)
+                    self._sync_locks.pop(evicted, None)
+            return fresh_pool
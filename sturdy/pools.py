@@ -17,6 +17,7 @@
 
 import json
 import math
+from collections.abc import Sequence
 from decimal import Decimal
 from enum import IntEnum
 from pathlib import Path
@@ -24,7 +25,9 @@ from typing import Any, ClassVar, Literal
 
 import bittensor as bt
 import numpy as np
+import numpy.typing as npt
 from eth_account import Account
+from eth_hash.auto import keccak
 from pydantic import BaseModel, Field, PrivateAttr, root_validator, validator
 from web3 import Web3
 from web3.constants import ADDRESS_ZERO
@@ -32,6 +35,7 @@ from web3.contract.contract import Contract
 from web3.types import BlockData
 
 from sturdy.constants import *
+from sturdy.supply_rate_curve import SupplyRateCurve
 from sturdy.utils.ethmath import wei_div, wei_mul
 from sturdy.utils.misc import (
     format_num_prec,
@@ -156,6 +160,69 @@ def check_allocations(
     return True
 
 
+class ALLOCATION_CHECK(IntEnum):
+    """Why allocations were rejected by `check_allocations_batch`"""
+
+    VALID = 0
+    MALFORMED = 1  # no allocations, or ones that couldn't be read
+    INVALID_REQUEST = 2  # the request itself (e.g. its total assets) is invalid, so no allocations are
+    NEGATIVE = 3
+    OVER_ALLOCATED = 4
+    UNDER_ALLOCATED = 5  # less than the alloc threshold of total assets is allocated
+    BELOW_MINIMUM = 6
+
+
+def check_allocations_batch(
+    assets_and_pools: dict,
+    allocations: Sequence[npt.NDArray | None],
+    alloc_threshold: float = TOTAL_ALLOC_THRESHOLD,
+) -> tuple[npt.NDArray[np.bool_], npt.NDArray[np.int8]]:
+    """
+    Checks the allocations of all miners at once - the same checks as `check_allocations`, but the minimum allocations
+    of the pools are only worked out once.
+
+    Args:
+    - assets_and_pools (dict[str, Union[dict[str, int], int]]): The assets and pools which the allocations are for.
+    - allocations (Sequence[Optional[npt.NDArray]]): Each miner's allocations, as an array of amounts indexed by the
+      pools' `PoolIndex` (i.e. in the order of `assets_and_pools["pools"]`) - None if they're missing or malformed.
+
+    Returns:
+    - npt.NDArray[np.bool_]: Whether each miner's allocations are valid.
+    - npt.NDArray[np.int8]: Each miner's `ALLOCATION_CHECK`.
+    """
+
+    reasons = np.full(len(allocations), ALLOCATION_CHECK.VALID, dtype=np.int8)
+    to_allocate = assets_and_pools.get("total_assets")
+    if to_allocate is None or not isinstance(to_allocate, int):
+        reasons[:] = ALLOCATION_CHECK.INVALID_REQUEST
+        return reasons == ALLOCATION_CHECK.VALID, reasons
+
+    present = np.array([allocs is not None for allocs in allocations], dtype=bool)
+    reasons[~present] = ALLOCATION_CHECK.MALFORMED
+    if present.any():
+        # amounts are python ints, so that sums and comparisons are exact
+        matrix = np.stack([allocs for allocs in allocations if allocs is not None])
+        minimums = np.array([get_minimum_allocation(pool) for pool in assets_and_pools["pools"].values()], dtype=object)
+        totals = matrix.sum(axis=1)
+        reasons[present] = np.select(
+            [
+                (matrix < 0).any(axis=1).astype(bool),
+                (totals > to_allocate).astype(bool),
+                (totals < int(alloc_threshold * to_allocate)).astype(bool),
+                (matrix < minimums).any(axis=1).astype(bool),
+            ],
+            [
+                ALLOCATION_CHECK.NEGATIVE,
+                ALLOCATION_CHECK.OVER_ALLOCATED,
+                ALLOCATION_CHECK.UNDER_ALLOCATED,
+                ALLOCATION_CHECK.BELOW_MINIMUM,
+            ],
+            default=ALLOCATION_CHECK.VALID,
+        )
+
+    return reasons == ALLOCATION_CHECK.VALID, reasons
+
+
 class BasePoolModel(BaseModel):
     """This model will primarily be used for synthetic requests"""
 
@@ -243,6 +310,28 @@ class BasePool(BasePoolModel):
     def supply_rate(self) -> int:
         return wei_mul(self.util_rate, self.borrow_rate)
 
+    def supply_rates(self, amounts: npt.ArrayLike) -> npt.NDArray[np.float64]:
+        """
+        Vectorized `supply_rate` of the pool after allocating (i.e. adding to its reserves) each of `amounts` - in
+        floating point, so close to, but not exactly the same as, `supply_rate`.
+        """
+        util_rates = self.borrow_amount / (self.reserve_size + np.asarray(amounts, dtype=np.float64))
+        optimal_util_rate = self.optimal_util_rate / 1e18
+        borrow_rates = np.where(
+            util_rates < optimal_util_rate,
+            self.base_rate + util_rates / optimal_util_rate * self.base_slope,
+            self.base_rate + self.base_slope + (util_rates - optimal_util_rate) / (1 - optimal_util_rate) * self.kink_slope,
+        )
+        return util_rates * borrow_rates
+
+    def supply_rate_curve(self, max_amount: int, **kwargs: Any) -> SupplyRateCurve:
+        """Returns the pool's supply rate as a function of the amount allocated to (i.e. added to the reserves of) it"""
+        return SupplyRateCurve(
+            lambda amount: self.copy(update={"reserve_size": self.reserve_size + amount}).supply_rate,
+            max_amount,
+            **kwargs,
+        )
+
 
 class ChainBasedPoolModel(BaseModel):
     """This serves as the base model of pools which need to pull data from on-chain
@@ -264,6 +353,7 @@ class ChainBasedPoolModel(BaseModel):
     contract_address: str = Field(default=ADDRESS_ZERO, description="address of contract to call")
 
     _initted: bool = PrivateAttr(False)  # noqa: FBT003
+    _synced_block: int | None = PrivateAttr(None)
 
     @validator("pool_type", pre=True)
     def validator_pool_type(cls, value) -> POOL_TYPES | int | str:
@@ -287,6 +377,22 @@ class ChainBasedPoolModel(BaseModel):
 
         return values
 
+    def snapshot(self) -> "ChainBasedPoolModel":
+        """
+        Returns a copy of the pool to sync in its place, leaving the pool itself as it is. Syncing replaces a pool's
+        on-chain state rather than mutating it, so the copy shares it - along with the contracts (and so web3 provider)
+        it was synced with, which would be expensive to copy.
+        """
+        return self.copy()
+
+    @property
+    def synced_block(self) -> int | None:
+        """
+        The block the pool was last synced at by a `PoolRegistry`, if it was. Pools hash and compare by it as well as by
+        their contracts, so cached supply rates (which are keyed on the pool) are never shared between snapshots.
+        """
+        return self._synced_block
+
     def pool_init(self, **args: Any) -> None:
         raise NotImplementedError("pool_init() has not been implemented!")
 
@@ -296,6 +402,13 @@ class ChainBasedPoolModel(BaseModel):
     def supply_rate(self, **args: Any) -> int:
         raise NotImplementedError("supply_rate() has not been implemented!")
 
+    def supply_rate_curve(self, max_amount: int, **kwargs: Any) -> SupplyRateCurve:
+        """
+        Returns the pool's supply rate as a function of the amount supplied to it, sampled from the chain. The pool
+        must have been synced - the curve is only valid for the block it was synced at.
+        """
+        return SupplyRateCurve(self.supply_rate, max_amount, **kwargs)
+
 
 class PoolFactory:
     @staticmethod
@@ -319,6 +432,20 @@ class PoolFactory:
                 raise ValueError(f"Unknown pool type: {pool_type}")
 
 
+def sync_pool(pool: ChainBasedPoolModel | BasePoolModel, web3_provider: Web3, user_address: str | None = None) -> None:
+    """
+    Syncs a pool with chain, whichever type of pool it is - synthetic pools have nothing to sync. Pools which need a user
+    address to sync are synced with `user_address`, or their own if it isn't given.
+    """
+    match pool.pool_type:
+        case POOL_TYPES.AAVE | POOL_TYPES.STURDY_SILO:
+            pool.sync(user_address if user_address is not None else pool.user_address, web3_provider)  # type: ignore[]
+        case POOL_TYPES.DAI_SAVINGS | POOL_TYPES.COMPOUND_V3 | POOL_TYPES.MORPHO | POOL_TYPES.YEARN_V3:
+            pool.sync(web3_provider)  # type: ignore[]
+        case _:
+            pass
+
+
 class AaveV3DefaultInterestRatePool(ChainBasedPoolModel):
     """This class defines the default pool type for Aave"""
 
@@ -344,15 +471,16 @@ class AaveV3DefaultInterestRatePool(ChainBasedPoolModel):
         arbitrary_types_allowed = True
 
     def __hash__(self) -> int:
-        return hash((self._atoken_contract.address, self._underlying_asset_address))
+        return hash((self._atoken_contract.address, self._underlying_asset_address, self._synced_block))
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, AaveV3DefaultInterestRatePool):
             return NotImplemented
         # Compare the attributes for equality
-        return (self._atoken_contract.address, self._underlying_asset_address) == (
+        return (self._atoken_contract.address, self._underlying_asset_address, self._synced_block) == (
             other._atoken_contract.address,
             other._underlying_asset_address,
+            other._synced_block,
         )
 
     def pool_init(self, web3_provider: Web3) -> None:
@@ -399,7 +527,7 @@ class AaveV3DefaultInterestRatePool(ChainBasedPoolModel):
                 address=self._underlying_asset_address,
             )
 
-            self._total_supplied = retry_with_backoff(self._atoken_contract.functions.totalSupply().call)
+            self._decimals = retry_with_backoff(self._underlying_asset_contract.functions.decimals().call)
 
             self._initted = True
 
@@ -412,21 +540,7 @@ class AaveV3DefaultInterestRatePool(ChainBasedPoolModel):
         if not self._initted:
             self.pool_init(web3_provider)
         try:
-            pool_abi_file_path = Path(__file__).parent / "abi/Pool.json"
-            pool_abi_file = pool_abi_file_path.open()
-            pool_abi = json.load(pool_abi_file)
-            pool_abi_file.close()
-
-            atoken_contract_onchain = self._atoken_contract
-            pool_address = retry_with_backoff(atoken_contract_onchain.functions.POOL().call)
-
-            pool_contract = web3_provider.eth.contract(abi=pool_abi, decode_tuples=True)
-            self._pool_contract = retry_with_backoff(pool_contract, address=pool_address)
-
-            self._underlying_asset_address = retry_with_backoff(
-                self._atoken_contract.functions.UNDERLYING_ASSET_ADDRESS().call,
-            )
-
+            # the pool contract and underlying asset were looked up by pool_init, only the reserve's state changes
             self._reserve_data = retry_with_backoff(
                 self._pool_contract.functions.getReserveData(self._underlying_asset_address).call,
             )
@@ -478,10 +592,10 @@ class AaveV3DefaultInterestRatePool(ChainBasedPoolModel):
 
             reserveConfiguration = self._reserve_data.configuration
             self._reserveFactor = getReserveFactor(reserveConfiguration)
-            self._decimals = retry_with_backoff(self._underlying_asset_contract.functions.decimals().call)
             self._collateral_amount = retry_with_backoff(
                 self._atoken_contract.functions.balanceOf(Web3.to_checksum_address(user_addr)).call
             )
+            self._total_supplied = retry_with_backoff(self._atoken_contract.functions.totalSupply().call)
 
         except Exception as err:
             bt.logging.error("Failed to sync to chain!")
@@ -539,15 +653,16 @@ class VariableInterestSturdySiloStrategy(ChainBasedPoolModel):
     _decimals: int = PrivateAttr()
 
     def __hash__(self) -> int:
-        return hash((self._silo_strategy_contract.address, self._pair_contract))
+        return hash((self._silo_strategy_contract.address, self._pair_contract, self._synced_block))
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, VariableInterestSturdySiloStrategy):
             return NotImplemented
         # Compare the attributes for equality
-        return (self._silo_strategy_contract.address, self._pair_contract) == (
+        return (self._silo_strategy_contract.address, self._pair_contract, self._synced_block) == (
             other._silo_strategy_contract.address,
             other._pair_contract.address,
+            other._synced_block,
         )
 
     def pool_init(self, user_addr: str, web3_provider: Web3) -> None:  # noqa: ARG002
@@ -766,13 +881,13 @@ class DaiSavingsRate(ChainBasedPoolModel):
     _pot_contract: Contract = PrivateAttr()
 
     def __hash__(self) -> int:
-        return hash(self._sdai_contract.address)
+        return hash((self._sdai_contract.address, self._synced_block))
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, VariableInterestSturdySiloStrategy):
             return NotImplemented
         # Compare the attributes for equality
-        return self._sdai_contract.address == other._sdai_contract.address  # type: ignore[]
+        return (self._sdai_contract.address, self._synced_block) == (other._sdai_contract.address, other._synced_block)  # type: ignore[]
 
     def pool_init(self, web3_provider: Web3) -> None:
         sdai_abi_file_path = Path(__file__).parent / "abi/SavingsDai.json"
@@ -808,6 +923,10 @@ class DaiSavingsRate(ChainBasedPoolModel):
         x = (dsr / RAY) ** seconds_per_year
         return int(math.floor((x - 1) * 1e18))
 
+    def supply_rate_curve(self, max_amount: int, **kwargs: Any) -> SupplyRateCurve:
+        # the dai savings rate doesn't depend on the amount supplied
+        return SupplyRateCurve(lambda _: self.supply_rate(), max_amount, **kwargs)
+
 
 class MorphoVault(ChainBasedPoolModel):
     # TODO: remove
@@ -846,13 +965,13 @@ class MorphoVault(ChainBasedPoolModel):
     _VIRTUAL_ASSETS: ClassVar[int] = 1
 
     def __hash__(self) -> int:
-        return hash(self._vault_contract.address)
+        return hash((self._vault_contract.address, self._synced_block))
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, MorphoVault):
             return NotImplemented
         # Compare the attributes for equality
-        return self._vault_contract.address == other._vault_contract.address  # type: ignore[]
+        return (self._vault_contract.address, self._synced_block) == (other._vault_contract.address, other._synced_block)  # type: ignore[]
 
     def pool_init(self, web3_provider: Web3) -> None:
         vault_abi_file_path = Path(__file__).parent / "abi/MetaMorpho.json"
@@ -981,7 +1100,55 @@ def generate_eth_public_key(rng_gen: np.random.RandomState) -> str:
     return account.address
 
 
-def generate_assets_and_pools(rng_gen: np.random.RandomState) -> dict[str, dict[str, BasePoolModel] | int]:  # generate pools
+def generate_eth_addresses(rng_gen: np.random.RandomState, num_addresses: int) -> list[str]:
+    """
+    Fast alternative to `generate_eth_public_key` - derives checksummed addresses from the keccak of random bytes instead
+    of from a private key, which skips the elliptic curve math. The addresses are only used as uids for synthetic pools.
+    """
+    raw_bytes = rng_gen.bytes(32 * num_addresses)  # type: ignore[]
+    addresses = []
+    for idx in range(num_addresses):
+        address = keccak(raw_bytes[idx * 32 : (idx + 1) * 32])[-20:].hex()
+        # EIP-55 checksum - done by hand as going through Web3.to_checksum_address is several times slower
+        address_hash = keccak(address.encode()).hex()
+        checksummed = (
+            char.upper() if hash_char in "89abcdef" else char
+            for char, hash_char in zip(address, address_hash, strict=False)
+        )
+        addresses.append("0x" + "".join(checksummed))
+    return addresses
+
+
+def draw_steps(rng_gen: np.random.RandomState, start: int, stop: int, step: int, size: int) -> list[int]:
+    """Batched, exact integer counterpart of `randrange_float` - draws `size` values from `start, start + step, ..., stop`"""
+    num_steps = (stop - start) // step
+    return [start + int(random_step) * step for random_step in rng_gen.randint(0, num_steps + 1, size=size)]
+
+
+def generate_assets_and_pools(
+    rng_gen: np.random.RandomState,
+    version: int = POOL_GEN_VERSION,
+    num_pools: int = NUM_POOLS,
+) -> dict[str, dict[str, BasePoolModel] | int]:
+    """
+    Generates synthetic pools along with the total assets to allocate across them.
+
+    Args:
+        rng_gen: the random state to draw from.
+        version: which generator to use. Version 1 builds the pools one by one and is kept as-is so that the existing
+            stream of synthetic scenarios stays reproducible. Version 2 draws all pool parameters with batched rng calls,
+            uses exact integer arithmetic and derives pool addresses from `generate_eth_addresses` - it scales to
+            thousands of pools but produces a different stream for the same seed.
+        num_pools: number of pools to generate.
+    """
+    if version == 1:
+        return _generate_assets_and_pools_v1(rng_gen, num_pools)
+    if version == 2:
+        return _generate_assets_and_pools_v2(rng_gen, num_pools)
+    raise ValueError(f"Unknown pool generator version: {version}")
+
+
+def _generate_assets_and_pools_v1(rng_gen: np.random.RandomState, num_pools: int) -> dict[str, dict[str, BasePoolModel] | int]:
     assets_and_pools = {}
 
     pools_list = [
@@ -1018,7 +1185,7 @@ def generate_assets_and_pools(rng_gen: np.random.RandomState) -> dict[str, dict[
             ),  # initial borrowed amount from pool
             reserve_size=int(POOL_RESERVE_SIZE),
         )
-        for _ in range(NUM_POOLS)
+        for _ in range(num_pools)
     ]
 
     pools = {str(pool.contract_address): pool for pool in pools_list}
@@ -1035,6 +1202,40 @@ def generate_assets_and_pools(rng_gen: np.random.RandomState) -> dict[str, dict[
     return assets_and_pools
 
 
+def _generate_assets_and_pools_v2(rng_gen: np.random.RandomState, num_pools: int) -> dict[str, dict[str, BasePoolModel] | int]:
+    addresses = generate_eth_addresses(rng_gen, num_pools)
+    base_rates = draw_steps(rng_gen, MIN_BASE_RATE, MAX_BASE_RATE, BASE_RATE_STEP, num_pools)
+    base_slopes = draw_steps(rng_gen, MIN_SLOPE, MAX_SLOPE, SLOPE_STEP, num_pools)
+    # kink rate - kicks in after pool hits optimal util rate
+    kink_slopes = draw_steps(rng_gen, MIN_KINK_SLOPE, MAX_KINK_SLOPE, SLOPE_STEP, num_pools)
+    # optimal util rate - after which the kink slope kicks in
+    optimal_util_rates = draw_steps(rng_gen, MIN_OPTIMAL_RATE, MAX_OPTIMAL_RATE, OPTIMAL_UTIL_STEP, num_pools)
+    # initial borrowed amount from pool
+    util_rates = draw_steps(rng_gen, MIN_UTIL_RATE, MAX_UTIL_RATE, UTIL_RATE_STEP, num_pools)
+    borrow_amounts = [POOL_RESERVE_SIZE * util_rate // int(1e18) for util_rate in util_rates]
+
+    # every parameter is drawn from a valid range, so we can skip validation
+    pools = {
+        address: BasePool.construct(
+            contract_address=address,
+            pool_type=POOL_TYPES.SYNTHETIC,
+            base_rate=base_rates[idx],
+            base_slope=base_slopes[idx],
+            kink_slope=kink_slopes[idx],
+            optimal_util_rate=optimal_util_rates[idx],
+            borrow_amount=borrow_amounts[idx],
+            reserve_size=POOL_RESERVE_SIZE,
+        )
+        for idx, address in enumerate(addresses)
+    }
+
+    (total_assets_offset,) = draw_steps(
+        rng_gen, int(MIN_TOTAL_ASSETS_OFFSET), int(MAX_TOTAL_ASSETS_OFFSET), int(TOTAL_ASSETS_OFFSET_STEP), 1
+    )
+
+    return {"total_assets": sum(borrow_amounts) + total_assets_offset, "pools": pools}
+
+
 class YearnV3Vault(ChainBasedPoolModel):
     pool_type: POOL_TYPES = Field(POOL_TYPES.YEARN_V3, const=True, description="type of pool")
 
@@ -1060,6 +1261,8 @@ class YearnV3Vault(ChainBasedPoolModel):
         apr_oracle = web3_provider.eth.contract(abi=apr_oracle_abi, decode_tuples=True)
         self._apr_oracle = retry_with_backoff(apr_oracle, address=APR_ORACLE)
 
+        self._initted = True
+
     def sync(self, web3_provider: Web3) -> None:
         if not self._initted:
             self.pool_init(web3_provider)
@@ -1,19 +1,24 @@
 import uuid
+from datetime import datetime, timedelta
+from typing import Optional
 
+import pandas as pd
 import typer
 from rich.console import Console
 from rich.table import Table
 
+from sturdy.constants import ARCHIVE_DIR, ARCHIVE_RETENTION_DAYS
 from sturdy.validator import sql
+from sturdy.validator.archive import Archive
 
 cli = typer.Typer(name="Sturdy Subnet CLI")
 
 
 @cli.command()
 def create_key(
-    balance: float | None = None,
-    rate_limit_per_minute: int | None = None,
-    name: str | None = None,
+    balance: Optional[float] = None,
+    rate_limit_per_minute: Optional[int] = None,
+    name: Optional[str] = None,
 ) -> str:
     """
     Create a new API key.
@@ -127,9 +132,6 @@ def show_key_info(key: str) -> None:
     console = Console()
     table = Table(show_header=True, header_style="bold magenta")
 
-    with sql.get_db_connection() as conn:
-        row = sql.get_api_key_info(conn, key)
-
     if row:
         for column_name in row:
             table.add_column(column_name)
@@ -165,49 +167,163 @@ def logs_for_key(key: str) -> None:
         print(f"No logs found for key: {key}")
 
 
+def _since(since_hours: float | None) -> datetime | None:
+    return datetime.now() - timedelta(hours=since_hours) if since_hours is not None else None  # noqa: DTZ005
+
+
+def _print_rows(console: Console, rows: list[dict], header_style: str = "bold magenta") -> None:
+    table = Table(show_header=True, header_style=header_style)
+    if rows:
+        for column_name in rows[0]:
+            table.add_column(column_name)
+    for row in rows:
+        table.add_row(*[str(value) for value in row.values()])
+    console.print(table)
+
+
+def _export(rows: list[dict], path: str | None) -> None:
+    """Writes rows to a csv or parquet file, depending on the extension of `path`."""
+    if path is None:
+        return
+    data = pd.DataFrame(rows)
+    if path.endswith(".parquet"):
+        data.to_parquet(path, index=False)
+    elif path.endswith(".csv"):
+        data.to_csv(path, index=False)
+    else:
+        raise typer.BadParameter("export path must end in .csv or .parquet")
+    print(f"Exported {len(rows)} rows to {path}")
+
+
 @cli.command()
-def logs_summary() -> None:
+def logs_summary(since_hours: Optional[float] = None) -> None:
     """
     Summary of all logs.
+
+    Arguments:
+    since_hours (optional): Only summarize logs from the last given number of hours.
     """
     with sql.get_db_connection() as conn:
-        keys = sql.get_all_api_keys(conn)
+        key_totals = sql.get_key_totals(conn, _since(since_hours))
+        endpoints = sql.get_endpoint_breakdown(conn, _since(since_hours))
 
     console = Console()
+    _print_rows(
+        console,
+        [
+            {"key": row[sql.KEY], "Total Requests": row[sql.TOTAL_REQUESTS], "Total Credits Used": row[sql.TOTAL_CREDITS_USED]}
+            for row in key_totals
+        ],
+    )
+    console.print("Endpoint Breakdown:")
+    _print_rows(
+        console, [{"Endpoint": row[sql.ENDPOINT], "Count": row[sql.TOTAL_REQUESTS]} for row in endpoints], "bold green"
+    )
 
-    summary_table = Table(show_header=True, header_style="bold magenta")
-    summary_table.add_column("key")
-    summary_table.add_column("Total Requests")
-    summary_table.add_column("Total Credits Used")
 
-    global_endpoint_dict = {}
+@cli.command()
+def key_totals(since_hours: Optional[float] = None, export: Optional[str] = None) -> None:
+    """
+    Show the number of requests and credits used by every API key.
 
-    for key in keys:
-        key = dict(key)[sql.KEY]  # noqa: PLW2901
-        with sql.get_db_connection() as conn:
-            logs = sql.get_all_logs_for_key(conn, key)
+    Arguments:
+    since_hours (optional): Only count requests from the last given number of hours.
+    export (optional): Also write the results to this .csv or .parquet file.
+    """
+    with sql.get_db_connection() as conn:
+        rows = sql.get_key_totals(conn, _since(since_hours))
+    _print_rows(Console(), rows)
+    _export(rows, export)
 
-        total_requests = len(logs)
-        total_credits_used = sum([dict(log).get("cost", 0) for log in logs])
 
-        for log in logs:
-            log = dict(log)  # noqa: PLW2901
-            endpoint = log.get(sql.ENDPOINT, "unknown_endpoint")
-            global_endpoint_dict[endpoint] = global_endpoint_dict.get(endpoint, 0) + 1
+@cli.command()
+def endpoint_breakdown(since_hours: Optional[float] = None, export: Optional[str] = None) -> None:
+    """
+    Show the number of requests and credits used per endpoint.
+
+    Arguments:
+    since_hours (optional): Only count requests from the last given number of hours.
+    export (optional): Also write the results to this .csv or .parquet file.
+    """
+    with sql.get_db_connection() as conn:
+        rows = sql.get_endpoint_breakdown(conn, _since(since_hours))
+    _print_rows(Console(), rows)
+    _export(rows, export)
+
 
-        summary_table.add_row(key, str(total_requests), str(total_credits_used))
+@cli.command()
+def miner_stats(since_hours: Optional[float] = None, export: Optional[str] = None) -> None:
+    """
+    Show the number of allocations returned by every miner for organic requests, and their apys.
 
-    console.print(summary_table)
+    Arguments:
+    since_hours (optional): Only count allocations from the last given number of hours.
+    export (optional): Also write the results to this .csv or .parquet file.
+    """
+    with sql.get_db_connection() as conn:
+        rows = sql.get_miner_allocation_stats(conn, _since(since_hours))
+    _print_rows(Console(), rows)
+    _export(rows, export)
 
-    breakdown_table = Table(show_header=True, header_style="bold green")
-    breakdown_table.add_column("Endpoint")
-    breakdown_table.add_column("Count")
 
-    for endpoint, count in global_endpoint_dict.items():
-        breakdown_table.add_row(endpoint, str(count))
+@cli.command()
+def request_rates(bucket: str = "hour", since_hours: Optional[float] = None, export: Optional[str] = None) -> None:
+    """
+    Show the number of requests per minute, hour or day.
 
-    console.print("Endpoint Breakdown:")
-    console.print(breakdown_table)
+    Arguments:
+    bucket: What to count requests per - minute, hour or day.
+    since_hours (optional): Only count requests from the last given number of hours.
+    export (optional): Also write the results to this .csv or .parquet file.
+    """
+    if bucket not in sql.BUCKET_FORMATS:
+        raise typer.BadParameter(f"bucket must be one of {', '.join(sql.BUCKET_FORMATS)}")
+    with sql.get_db_connection() as conn:
+        rows = sql.get_request_rates(conn, bucket, _since(since_hours))
+    _print_rows(Console(), rows)
+    _export(rows, export)
+
+
+@cli.command()
+def dedupe_pool_sets() -> None:
+    """
+    Deduplicate the assets and pools of past allocation requests.
+
+    Moves the assets and pools of allocation requests logged before they were deduplicated into the pool sets table.
+    Safe to run while the validator is running, and to run more than once. Run `vacuum` afterwards to give the freed
+    space back to the filesystem.
+    """
+    with sql.get_db_connection() as conn:
+        num_moved = sql.dedupe_pool_sets(conn)
+        num_pool_sets = conn.execute(f"SELECT COUNT(*) FROM {sql.POOL_SETS_TABLE}").fetchone()[0]
+        print(f"Moved {num_moved} allocation requests over to {num_pool_sets} pool sets")
+
+
+@cli.command()
+def vacuum() -> None:
+    """
+    Vacuum the database.
+
+    Gives the space freed up by deduplicating or archiving back to the filesystem.
+    """
+    with sql.get_db_connection() as conn:
+        conn.execute("VACUUM")
+
+
+@cli.command()
+def archive(retention_days: int = ARCHIVE_RETENTION_DAYS, archive_dir: str = ARCHIVE_DIR) -> None:
+    """
+    Archive old allocations and request logs.
+
+    Moves allocations and request logs older than the given number of days out of the database, into daily parquet files.
+
+    Arguments:
+    retention_days: Number of days of allocations and request logs to keep in the database.
+    archive_dir: Directory to archive them to.
+    """
+    num_archived = Archive(archive_dir, retention_days).archive()
+    for table, count in num_archived.items():
+        print(f"Archived {count} rows from {table}")
 
 
 if __name__ == "__main__":
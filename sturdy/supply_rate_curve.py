@@ -0,0 +1,73 @@
+import heapq
+from bisect import bisect_right
+from collections.abc import Callable
+
+from sturdy.constants import SUPPLY_RATE_CURVE_MAX_ERROR, SUPPLY_RATE_CURVE_MAX_SAMPLES
+
+
+class SupplyRateCurve:
+    """
+    A pool's supply rate as a function of the amount supplied to it, sampled once over [0, max_amount] and then
+    answered by (integer) linear interpolation between the samples - so that an optimizer can ask for the rate at as
+    many amounts as it likes without a call to the chain for each. Build one per pool per block.
+
+    The samples are placed adaptively: the interval whose midpoint is furthest off from interpolating over it is split
+    first, until every interval's midpoint is within `max_error` of the interpolation, or `max_samples` samples have been
+    taken. `error` is the resulting maximum error, but it is only ever measured at the midpoints: it is not a bound on
+    the error in between, which can be larger - e.g. next to a kink in a pool's rate curve, where it has been seen to be
+    around a third more on generated pools. Where that isn't good enough, e.g. for breaking ties when scoring, use
+    `exact`.
+    """
+
+    def __init__(
+        self,
+        supply_rate: Callable[[int], int],
+        max_amount: int,
+        max_error: int = SUPPLY_RATE_CURVE_MAX_ERROR,
+        max_samples: int = SUPPLY_RATE_CURVE_MAX_SAMPLES,
+    ) -> None:
+        if max_amount < 0:
+            raise ValueError(f"max_amount must not be negative: {max_amount}")
+
+        self.exact = supply_rate
+        self.max_amount = max_amount
+        samples = {0: int(supply_rate(0)), max_amount: int(supply_rate(max_amount))}
+
+        # intervals, worst first, along with how far off interpolating over them is - unknown until their midpoint is
+        # sampled, in which case it is the error of the interval they were split from
+        intervals = [(-float("inf"), 0, max_amount)]
+        while intervals:
+            neg_error, lo, hi = intervals[0]
+            if -neg_error <= max_error or len(samples) >= max(max_samples, 2):
+                break
+            heapq.heappop(intervals)
+            if hi - lo < 2:
+                # no amounts in between - interpolating over it is exact
+                heapq.heappush(intervals, (0, lo, hi))
+                continue
+
+            mid = (lo + hi) // 2
+            samples[mid] = int(supply_rate(mid))
+            error = abs(samples[mid] - self._interpolate(lo, samples[lo], hi, samples[hi], mid))
+            heapq.heappush(intervals, (-error, lo, mid))
+            heapq.heappush(intervals, (-error, mid, hi))
+
+        self.error = max((-neg_error for neg_error, _, _ in intervals), default=0)
+        self.amounts = sorted(samples)
+        self.rates = [samples[amount] for amount in self.amounts]
+
+    @staticmethod
+    def _interpolate(lo: int, lo_rate: int, hi: int, hi_rate: int, amount: int) -> int:
+        if hi == lo:
+            return lo_rate
+        return lo_rate + (hi_rate - lo_rate) * (amount - lo) // (hi - lo)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __call__(self, amount: int) -> int:
+        """Returns the supply rate given the amount supplied - exactly, if it is outside of the sampled range."""
+        if amount < 0 or amount > self.max_amount:
+            return self.exact(amount)
+        idx = min(bisect_right(self.amounts, amount), len(self.amounts) - 1)
+        return self._interpolate(self.amounts[idx - 1], self.rates[idx - 1], self.amounts[idx], self.rates[idx], amount)
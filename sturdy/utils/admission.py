@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Hashable, Iterator
+from contextlib import contextmanager
+
+import numpy as np
+
+from sturdy.constants import ADMISSION_DEADLINE_MARGIN, ADMISSION_WINDOW
+
+
+class AdmissionController:
+    """
+    Sheds the requests a miner can't answer before they time out, rather than working on them anyway at the expense of
+    the ones it can still answer in time.
+
+    A request is admitted (see `admit`) when it arrives, if - going by the mean time recent requests took to work on -
+    the requests ahead of it, spread over `workers` workers, leave it enough time to be worked on before its deadline:
+    its timeout, less `margin` seconds for the response to make it back. Requests which were admitted, but have waited
+    so long that they can no longer be worked on in time, are fast pathed instead (see `serve`).
+
+    Thread safe. Service times and latencies (from admission to response) are measured over the last `window` requests.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        margin: float = ADMISSION_DEADLINE_MARGIN,
+        window: int = ADMISSION_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.workers = workers
+        self.margin = margin
+        self.clock = clock
+        self.admitted = 0
+        self.shed = 0
+        self.fast_pathed = 0
+        self.served = 0
+        # request -> (when it was admitted, its deadline, its timeout)
+        self._pending: dict[Hashable, tuple[float, float, float]] = {}
+        self._in_flight = 0
+        self._service_times: deque[float] = deque(maxlen=window)
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def admit(self, request: Hashable, timeout: float) -> bool:
+        """Returns whether the request - which the validator waits `timeout` seconds for - should be worked on."""
+        now = self.clock()
+        deadline = now + timeout - self.margin
+        with self._lock:
+            # requests which never made it to being served (e.g. timed out waiting) are forgotten eventually
+            expired = [key for key, (admitted, _, waited) in self._pending.items() if now > admitted + 2 * waited]
+            for key in expired:
+                del self._pending[key]
+
+            if now + self._expected_wait(now) > deadline:
+                self.shed += 1
+                return False
+            self._pending[request] = (now, deadline, timeout)
+            self.admitted += 1
+            return True
+
+    @contextmanager
+    def serve(self, request: Hashable) -> Iterator[bool]:
+        """
+        Tracks the request while it's being worked on - enter it from the worker working on it, once it has been picked
+        up, so that the time spent waiting for a worker counts towards the request being queued rather than its service
+        time. Yields whether it should be fast pathed - i.e. answered without doing any work, as it was admitted but can
+        no longer be worked on before its deadline. Requests which weren't admitted first (see `admit`) are never fast
+        pathed.
+        """
+        start = self.clock()
+        with self._lock:
+            admitted, deadline, _ = self._pending.pop(request, (start, float("inf"), 0.0))
+            fast_path = start + self._service_time() > deadline
+            self._in_flight += 1
+
+        try:
+            yield fast_path
+        finally:
+            end = self.clock()
+            with self._lock:
+                self._in_flight -= 1
+                self.served += 1
+                if fast_path:
+                    self.fast_pathed += 1
+                else:
+                    self._service_times.append(end - start)
+                self._latencies.append(end - admitted)
+
+    def stats(self) -> dict[str, float]:
+        """Counts of requests admitted, shed, etc., the queue depth, and latency percentiles (seconds)."""
+        with self._lock:
+            latencies = np.array(self._latencies) if self._latencies else np.zeros(1)
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            return {
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "fast_pathed": self.fast_pathed,
+                "served": self.served,
+                "queued": len(self._pending),
+                "in_flight": self._in_flight,
+                "service_time_mean": self._service_time(),
+                "latency_p50": float(p50),
+                "latency_p90": float(p90),
+                "latency_p99": float(p99),
+            }
+
+    def _service_time(self) -> float:
+        return sum(self._service_times) / len(self._service_times) if self._service_times else 0.0
+
+    def _expected_wait(self, now: float) -> float:
+        """How long until a request arriving now is answered. Requests past their deadline are fast pathed - take no time."""
+        queued = sum(1 for _, deadline, _ in self._pending.values() if deadline >= now)
+        return ((queued + self._in_flight) // self.workers + 1) * self._service_time()
@@ -24,7 +24,14 @@ import torch
 from loguru import logger
 
 from sturdy import __spec_version__ as spec_version
-from sturdy.constants import QUERY_TIMEOUT
+from sturdy.constants import (
+    ALLOCATION_CACHE_BLOCKS,
+    ARCHIVE_DIR,
+    IPC_SOCKET_PATH,
+    MINER_MAX_CONCURRENT_FORWARDS,
+    POOL_GEN_VERSION,
+    QUERY_TIMEOUT,
+)
 
 
 def check_config(cls, config: "bt.Config") -> None:
@@ -169,6 +176,29 @@ def add_miner_args(cls, parser):
         help="Minimum validator stake to accept forward requests from as a miner",
     )
 
+    parser.add_argument(
+        "--neuron.max_concurrent_forwards",
+        type=int,
+        default=MINER_MAX_CONCURRENT_FORWARDS,
+        help="The maximum number of requests worked on at the same time - any more wait for one of them to finish.",
+    )
+
+    parser.add_argument(
+        "--neuron.disable_water_fill_cache",
+        action="store_true",
+        help="If set, allocations are worked out for every organic request, rather than shared between requests for "
+        "the same pools in the same block.",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--neuron.disable_admission_control",
+        action="store_true",
+        help="If set, requests are worked on even when they can't be answered before the validator stops waiting for "
+        "them, rather than being rejected (or answered with the allocations they came with).",
+        default=False,
+    )
+
 
 def add_validator_args(cls, parser):
     """Add validator specific arguments to the parser."""
@@ -194,6 +224,29 @@ def add_validator_args(cls, parser):
         default=1,
     )
 
+    parser.add_argument(
+        "--neuron.max_in_flight_rounds",
+        type=int,
+        help="The maximum number of synthetic rounds that can be querying or scoring miners at the same time.",
+        default=2,
+    )
+
+    parser.add_argument(
+        "--neuron.num_prefetched_scenarios",
+        type=int,
+        help="The number of synthetic scenarios to generate ahead of time. Set to 0 to generate them on demand.",
+        default=4,
+    )
+
+    parser.add_argument(
+        "--neuron.pool_gen_version",
+        type=int,
+        choices=[1, 2],
+        help="Version of the synthetic pool generator. Version 2 is much faster, but generates different pools for the "
+        "same seed.",
+        default=POOL_GEN_VERSION,
+    )
+
     parser.add_argument(
         "--neuron.disable_set_weights",
         action="store_true",
@@ -260,6 +313,51 @@ def add_validator_args(cls, parser):
         default=False,
     )
 
+    parser.add_argument(
+        "--compress_allocations",
+        help="If you want the allocations returned by miners for organic requests to be stored zlib compressed",
+        type=lambda x: (str(x).lower() == "true"),
+        default=False,
+    )
+
+    parser.add_argument(
+        "--archive_retention_days",
+        type=int,
+        help="Number of days allocations and request logs are kept in the database before they're moved into parquet "
+        "files in --archive_dir. Set to 0 to keep everything in the database.",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--archive_dir",
+        type=str,
+        help="Directory allocations and request logs are archived to",
+        default=ARCHIVE_DIR,
+    )
+
+    parser.add_argument(
+        "--allocation_cache_blocks",
+        type=int,
+        help="Number of blocks the result of an organic allocation request is reused for identical requests. Identical "
+        "requests in flight at the same time always share one result. Set to 0 to only share those.",
+        default=ALLOCATION_CACHE_BLOCKS,
+    )
+
+    parser.add_argument(
+        "--api_workers",
+        type=int,
+        help="Number of processes serving the api of an organic validator. With more than 1, the api is served by "
+        "separate worker processes, which forward allocation requests to the validator over --ipc_socket.",
+        default=1,
+    )
+
+    parser.add_argument(
+        "--ipc_socket",
+        type=str,
+        help="Unix socket the validator listens on for allocation requests from api workers",
+        default=IPC_SOCKET_PATH,
+    )
+
 
 def config(cls) -> bt.config:
     """
@@ -16,6 +16,7 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import threading
 import time
 from collections.abc import Callable
 from functools import lru_cache, update_wrapper
@@ -152,6 +153,8 @@ def ttl_cache(maxsize: int = 128, typed: bool = False, ttl: int = -1) -> Any:
     if ttl <= 0:
         ttl = 65536
     hash_gen = _ttl_hash_gen(ttl)
+    # the generator can't be advanced by two threads at once
+    hash_gen_lock = threading.Lock()
 
     def wrapper(func: Callable) -> Callable:
         @lru_cache(maxsize, typed)
@@ -159,7 +162,8 @@ def ttl_cache(maxsize: int = 128, typed: bool = False, ttl: int = -1) -> Any:
             return func(*args, **kwargs)
 
         def wrapped(*args, **kwargs) -> Any:  # noqa: ANN002, ANN003
-            th = next(hash_gen)
+            with hash_gen_lock:
+                th = next(hash_gen)
             return ttl_func(th, *args, **kwargs)
 
         return update_wrapper(wrapped, func)
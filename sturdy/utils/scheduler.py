@@ -0,0 +1,98 @@
+import time
+from collections.abc import Callable
+from traceback import print_exception
+
+import bittensor as bt
+
+from sturdy.constants import BLOCK_TIME
+
+
+class BlockJob:
+    """A periodic job which runs once every `every_n_blocks` blocks."""
+
+    def __init__(self, name: str, every_n_blocks: int, fn: Callable[[], None]) -> None:
+        if every_n_blocks < 1:
+            raise ValueError(f"every_n_blocks must be at least 1, got {every_n_blocks}")
+        self.name = name
+        self.every_n_blocks = every_n_blocks
+        self.fn = fn
+        self.last_run_block: int | None = None
+
+    def is_due(self, block: int) -> bool:
+        return self.last_run_block is None or block - self.last_run_block >= self.every_n_blocks
+
+
+class BlockScheduler:
+    """
+    Drives periodic jobs off of new blocks instead of spinning on the chain.
+
+    The scheduler polls `get_block` (which is expected to be cheap, i.e. `ttl_get_block`) and backs off exponentially
+    while the block number stays the same, so we only end up asking for the block a handful of times per block. Once a
+    new block is seen, every job that is due runs in the order it was added. A failing job is logged and does not stop
+    the other jobs (or the scheduler) from running.
+    """
+
+    def __init__(
+        self,
+        get_block: Callable[[], int],
+        should_exit: Callable[[], bool],
+        min_poll_interval: float = 1.0,
+        max_poll_interval: float = BLOCK_TIME / 3,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.get_block = get_block
+        self.should_exit = should_exit
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.sleep = sleep
+        self.jobs: list[BlockJob] = []
+
+    def add_job(self, name: str, every_n_blocks: int, fn: Callable[[], None], start_block: int | None = None) -> BlockJob:
+        """
+        Registers a job to run every `every_n_blocks` blocks. If `start_block` is given, the first run happens
+        `every_n_blocks` after it - otherwise the job runs on the first block the scheduler sees.
+        """
+        job = BlockJob(name, every_n_blocks, fn)
+        job.last_run_block = start_block
+        self.jobs.append(job)
+        return job
+
+    def wait_for_new_block(self, last_block: int | None) -> int | None:
+        """
+        Blocks until a block newer than `last_block` is seen. Returns the new block, or None if we should exit.
+        """
+        poll_interval = self.min_poll_interval
+        while not self.should_exit():
+            block = self.get_block()
+            if last_block is None or block > last_block:
+                return block
+            self.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, self.max_poll_interval)
+        return None
+
+    def run_pending(self, block: int) -> list[str]:
+        """Runs every job which is due at `block`. Returns the names of the jobs that were run."""
+        ran = []
+        for job in self.jobs:
+            if self.should_exit():
+                break
+            if not job.is_due(block):
+                continue
+            try:
+                job.fn()
+            except Exception as e:
+                bt.logging.error(f"Error while running scheduled job '{job.name}' at block {block}: {e}")
+                bt.logging.debug(print_exception(type(e), e, e.__traceback__))
+            job.last_run_block = block
+            ran.append(job.name)
+        return ran
+
+    def run(self, start_block: int | None = None) -> None:
+        """Runs jobs on new blocks until `should_exit` returns True."""
+        last_block = start_block
+        while True:
+            block = self.wait_for_new_block(last_block)
+            if block is None:
+                break
+            self.run_pending(block)
+            last_block = block
@@ -1 +1,3 @@
-from .forward import forward, query_and_score_miners
+from .forward import query_and_score_miners
+
+__all__ = ["query_and_score_miners"]
@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from sturdy.constants import ALLOCATION_CACHE_BLOCKS, ALLOCATION_CACHE_MAX_SIZE
+
+T = TypeVar("T")
+
+
+def request_key(request: dict) -> str:
+    """Hash of a (json encoded) allocation request, which doesn't depend on key order."""
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class AllocationCache:
+    """
+    Makes identical allocation requests share one round of querying and scoring miners.
+
+    Requests which arrive while an identical one is being handled wait for its result, instead of querying the miners
+    again. Results are then kept for `ttl_blocks` blocks (counting the block the request came in on) - so with the
+    default of 1, identical requests within the same block are only ever handled once. Set `ttl_blocks` to 0 to only
+    share the results of requests which are in flight at the same time. At most `max_size` results are kept.
+
+    Only the work done by the validator is shared - every request is still charged to, and logged for, its api key.
+    `get_block` is called on the event loop for every request, so it has to be cheap - e.g. the block last seen by the
+    validator's scheduler (see `BaseValidatorNeuron.poll_block`), rather than a call to the chain.
+    """
+
+    def __init__(
+        self,
+        get_block: Callable[[], int],
+        ttl_blocks: int = ALLOCATION_CACHE_BLOCKS,
+        max_size: int = ALLOCATION_CACHE_MAX_SIZE,
+    ) -> None:
+        self.get_block = get_block
+        self.ttl_blocks = ttl_blocks
+        self.max_size = max_size
+        self.hits = 0
+        self.coalesced = 0
+        self._results: OrderedDict[str, tuple[int, Any]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    async def get(self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        """Returns the result for `key` - from the cache, from an identical request in flight, or by awaiting `compute`."""
+        block = self.get_block()
+        cached = self._results.get(key)
+        if cached is not None:
+            cached_block, result = cached
+            if block - cached_block < self.ttl_blocks:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._results[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, block, compute))
+            self._in_flight[key] = task
+        else:
+            self.coalesced += 1
+        # requests which give up waiting (e.g. timed out) mustn't cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, block: int, compute: Callable[[], Awaitable[T]]) -> T:
+        try:
+            result = await compute()
+        finally:
+            del self._in_flight[key]
+
+        if self.ttl_blocks > 0:
+            # results are only valid for the blocks after the one the miners were queried on
+            self._results[key] = (block, result)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+        return result
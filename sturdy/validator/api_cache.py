@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from datetime import timedelta
+
+from sturdy.constants import API_KEY_CACHE_TTL, API_KEYS_VERSION_CHECK_INTERVAL, RATE_LIMIT_WINDOW
+from sturdy.validator import sql
+
+
+class SlidingWindowRateLimiter:
+    """
+    Per key sliding window rate limiter held in memory.
+
+    Every key has a deque of the times of its recent successful requests, plus one of the requests that have been
+    admitted but haven't finished yet - counting those stops a burst of concurrent requests from all squeezing in under
+    the limit. Admitted requests which are never released (e.g. the api worker serving them died) stop counting after a
+    window. Checking and recording are amortized O(1).
+    """
+
+    def __init__(self, window: float = RATE_LIMIT_WINDOW, clock: Callable[[], float] = time.time) -> None:
+        self.window = window
+        self.clock = clock
+        self._requests: dict[str, deque[float]] = {}
+        self._pending: dict[str, deque[float]] = {}
+
+    def is_tracked(self, key: str) -> bool:
+        return key in self._requests
+
+    def seed(self, key: str, request_times: list[float]) -> None:
+        """Starts tracking a key from the times (unix timestamps) of its recent requests."""
+        self._requests[key] = deque(sorted(request_times))
+        self._evict(key)
+
+    def acquire(self, key: str, limit: int) -> bool:
+        """Admits a request for `key` if it is under `limit` requests per window. Admitted requests must be `release`d."""
+        self._evict(key)
+        if len(self._requests.get(key, ())) + len(self._pending.get(key, ())) >= limit:
+            return False
+        self._pending.setdefault(key, deque()).append(self.clock())
+        return True
+
+    def release(self, key: str, success: bool) -> None:
+        """Marks an admitted request as done - only successful requests count towards the limit."""
+        pending = self._pending.get(key)
+        if pending:
+            pending.popleft()
+            if not pending:
+                del self._pending[key]
+        if success:
+            self._requests.setdefault(key, deque()).append(self.clock())
+
+    def forget(self, key: str) -> None:
+        self._requests.pop(key, None)
+
+    def _evict(self, key: str) -> None:
+        cutoff = self.clock() - self.window
+        for requests in (self._requests.get(key), self._pending.get(key)):
+            while requests and requests[0] < cutoff:
+                requests.popleft()
+
+
+class ApiKeyCache:
+    """
+    In-memory cache of api keys in front of the api key database, along with their rate limiters.
+
+    Keys are loaded from the database on first use and kept for `ttl` seconds. Balances are debited in the database (see
+    `sql.debit_api_key`) - the cached balances are only used to turn away keys which are out of credits early, and are
+    refreshed with the balance left after every debit.
+
+    `sturdy-cli` runs in its own process, so it can't clear this cache directly - instead, every change it makes to the
+    api keys bumps a version number in the database. The cache checks that version at most every `version_check_interval`
+    seconds and drops every cached key when it changes.
+    """
+
+    def __init__(
+        self,
+        ttl: float = API_KEY_CACHE_TTL,
+        version_check_interval: float = API_KEYS_VERSION_CHECK_INTERVAL,
+        rate_limiter: SlidingWindowRateLimiter | None = None,
+        db_connection: Callable = sql.get_db_connection,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self.rate_limiter = rate_limiter if rate_limiter is not None else SlidingWindowRateLimiter()
+        self.db_connection = db_connection
+        self.clock = clock
+        self._keys: dict[str, tuple[float, dict]] = {}
+        self._version: int | None = None
+        self._last_version_check = float("-inf")
+        # bumped whenever cached keys are dropped
+        self._generation = 0
+        # never held while the db is read, as `acquire` and `release` are called from the event loop
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str) -> dict | None:
+        """Returns the info of an api key, or None if there is no such key."""
+        now = self.clock()
+        self._check_version(now)
+        with self._lock:
+            cached = self._keys.get(api_key)
+            if cached is not None and now - cached[0] < self.ttl:
+                return cached[1]
+        return self._load(api_key, now)
+
+    def get_cached(self, api_key: str) -> dict | None:
+        """
+        Returns the info of an api key if it can be returned without touching the db - i.e. the key is cached, and the
+        version doesn't have to be checked - and None otherwise. Never blocks, so it's safe to call from the event loop.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            now = self.clock()
+            if now - self._last_version_check >= self.version_check_interval:
+                return None
+            cached = self._keys.get(api_key)
+            if cached is not None and now - cached[0] < self.ttl:
+                return cached[1]
+            return None
+        finally:
+            self._lock.release()
+
+    def update_balance(self, api_key: str, balance: float | None) -> None:
+        """Sets a cached key's balance, e.g. to what was left after a debit."""
+        with self._lock:
+            cached = self._keys.get(api_key)
+            if cached is not None:
+                cached[1][sql.BALANCE] = balance
+
+    def invalidate(self, api_key: str | None = None) -> None:
+        """Drops a single key - or all keys - from the cache."""
+        with self._lock:
+            self._generation += 1
+            if api_key is None:
+                self._keys.clear()
+            else:
+                self._keys.pop(api_key, None)
+
+    def acquire(self, api_key_info: dict) -> bool:
+        """Admits a request if the key is within its rate limit. Admitted requests must be `release`d."""
+        with self._lock:
+            return self.rate_limiter.acquire(api_key_info[sql.KEY], api_key_info[sql.RATE_LIMIT_PER_MINUTE])
+
+    def release(self, api_key: str, success: bool) -> None:
+        with self._lock:
+            self.rate_limiter.release(api_key, success)
+
+    def _check_version(self, now: float) -> None:
+        with self._lock:
+            if now - self._last_version_check < self.version_check_interval:
+                return
+            # claimed before reading it, so that only one thread checks the version at a time
+            self._last_version_check = now
+        with self.db_connection() as conn:
+            version = sql.get_api_keys_version(conn)
+        with self._lock:
+            if version != self._version:
+                self._generation += 1
+                self._keys.clear()
+                self._version = version
+
+    def _load(self, api_key: str, now: float) -> dict | None:
+        with self._lock:
+            generation = self._generation
+            seed = not self.rate_limiter.is_tracked(api_key)
+
+        request_times = None
+        with self.db_connection() as conn:
+            api_key_info = sql.get_api_key_info(conn, api_key)
+            if api_key_info is not None and seed:
+                since = sql.now() - timedelta(seconds=self.rate_limiter.window)
+                request_times = sql.get_request_times_since(conn, api_key, since)
+
+        with self._lock:
+            if api_key_info is None:
+                self._keys.pop(api_key, None)
+                self.rate_limiter.forget(api_key)
+                return None
+
+            # pick up the requests this key has made recently (i.e. before a restart), unless another thread has already
+            if request_times is not None and not self.rate_limiter.is_tracked(api_key):
+                self.rate_limiter.seed(api_key, [request_time.timestamp() for request_time in request_times])
+            # not cached if the cache was cleared while it was being read, as it may be out of date
+            if generation == self._generation:
+                self._keys[api_key] = (now, api_key_info)
+            return api_key_info
@@ -0,0 +1,157 @@
+import sqlite3
+from collections.abc import Callable, Iterator
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import bittensor as bt
+import pandas as pd
+
+from sturdy.constants import ARCHIVE_DIR, ARCHIVE_RETENTION_DAYS
+from sturdy.validator import sql
+
+ARCHIVED_TABLES = (sql.ALLOCATIONS_TABLE, sql.LOGS_TABLE)
+DAY_PREFIX = "day="
+
+
+def _to_created_at(ts: int) -> str:
+    """Converts a unix timestamp in ms into a created_at value, as stored in the db."""
+    return datetime.fromtimestamp(ts / 1000).isoformat(" ")  # noqa: DTZ006
+
+
+class Archive:
+    """
+    Moves rows older than `retention_days` out of the db and into daily parquet files.
+
+    Each archived table gets a directory under `archive_dir`, with a `day=YYYY-MM-DD` partition for every day of rows
+    archived, holding one or more parquet files. Rows keep their rowid (as `row_id`) and created_at, so they can be
+    paged through with the same (created_at, rowid) keys as the rows in the db - and because everything archived is
+    older than what's left in the db, the archive can simply be read before the db. Queries only read the partitions
+    of the days they ask for.
+
+    Rows are written to the archive before they're deleted from the db, and rows which are already in a partition are
+    skipped, so archiving can be interrupted at any point and run again without losing or duplicating rows.
+    """
+
+    def __init__(
+        self,
+        archive_dir: str = ARCHIVE_DIR,
+        retention_days: int = ARCHIVE_RETENTION_DAYS,
+        db_connection: Callable = sql.get_db_connection,
+    ) -> None:
+        if retention_days < 1:
+            raise ValueError("retention_days must be at least 1")
+        self.archive_dir = Path(archive_dir)
+        self.retention_days = retention_days
+        self.db_connection = db_connection
+
+    def days(self, table: str) -> list[date]:
+        """Days which have been archived for `table`, oldest first."""
+        table_dir = self.archive_dir / table
+        if not table_dir.is_dir():
+            return []
+        return sorted(
+            date.fromisoformat(path.name.removeprefix(DAY_PREFIX))
+            for path in table_dir.iterdir()
+            if path.is_dir() and path.name.startswith(DAY_PREFIX)
+        )
+
+    def archive(self, now: datetime | None = None) -> dict[str, int]:
+        """
+        Archives every row from before the retention period, a day at a time. Returns how many rows were archived.
+        `now` defaults to `sql.now()`, the clock every archived table's created_at is stamped with.
+        """
+        if now is None:
+            now = sql.now()
+        cutoff = datetime.combine(now.date() - timedelta(days=self.retention_days), datetime.min.time())
+
+        num_archived = {}
+        with self.db_connection() as conn:
+            for table in ARCHIVED_TABLES:
+                num_archived[table] = 0
+                while (day := self._oldest_day(conn, table, cutoff)) is not None:
+                    num_archived[table] += self._archive_day(conn, table, day, cutoff)
+        bt.logging.info(f"Archived {num_archived} rows from before {cutoff}")
+        return num_archived
+
+    def iter_rows(
+        self,
+        table: str,
+        filters: dict[str, str | None],
+        from_ts: int | None,
+        to_ts: int | None,
+        after: tuple[str, int] | None = None,
+    ) -> Iterator[dict]:
+        """
+        Yields the archived rows of `table` matching the same filters as `sql.get_filtered_allocations`, in
+        (created_at, row_id) order. Only the partitions of the days between `from_ts` and `to_ts` are read.
+        """
+        from_created_at = _to_created_at(from_ts) if from_ts else None
+        to_created_at = _to_created_at(to_ts) if to_ts else None
+        first_day = max(filter(None, [from_created_at, after[0] if after else None]), default=None)
+
+        for day in self.days(table):
+            if first_day is not None and day.isoformat() < first_day[:10]:
+                continue
+            if to_created_at is not None and day.isoformat() > to_created_at[:10]:
+                break
+
+            pushdown = [(column, "==", value) for column, value in filters.items() if value]
+            if from_created_at is not None:
+                pushdown.append((sql.CREATED_AT, ">=", from_created_at))
+            if to_created_at is not None:
+                pushdown.append((sql.CREATED_AT, "<=", to_created_at))
+            if after is not None:
+                pushdown.append((sql.CREATED_AT, ">=", after[0]))
+
+            rows = self._read_day(table, day, pushdown or None)
+            if after is not None:
+                created_at, row_id = after
+                rows = rows[(rows[sql.CREATED_AT] > created_at) | (rows[sql.ROW_ID] > row_id)]
+            yield from rows.sort_values([sql.CREATED_AT, sql.ROW_ID]).to_dict("records")
+
+    def _day_dir(self, table: str, day: date) -> Path:
+        return self.archive_dir / table / f"{DAY_PREFIX}{day.isoformat()}"
+
+    def _read_day(self, table: str, day: date, filters: list | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        parts = sorted(self._day_dir(table, day).glob("*.parquet"))
+        if not parts:
+            return pd.DataFrame(columns=columns or [sql.ROW_ID, sql.CREATED_AT])
+        frames = [pd.read_parquet(part, columns=columns, filters=filters) for part in parts]
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _oldest_day(conn: sqlite3.Connection, table: str, cutoff: datetime) -> date | None:
+        query = f"SELECT MIN({sql.CREATED_AT}) FROM {table} WHERE {sql.CREATED_AT} < ?"
+        (oldest,) = conn.execute(query, (cutoff,)).fetchone()
+        return date.fromisoformat(str(oldest)[:10]) if oldest is not None else None
+
+    def _archive_day(self, conn: sqlite3.Connection, table: str, day: date, cutoff: datetime) -> int:
+        start = datetime.combine(day, datetime.min.time())
+        end = min(start + timedelta(days=1), cutoff)
+        rows = [
+            sql.decode_row(row)
+            for row in conn.execute(
+                f"SELECT rowid AS {sql.ROW_ID}, * FROM {table} WHERE {sql.CREATED_AT} >= ? AND {sql.CREATED_AT} < ?",
+                (start, end),
+            )
+        ]
+        new_rows = pd.DataFrame(rows)
+        new_rows[sql.CREATED_AT] = new_rows[sql.CREATED_AT].astype(str)
+
+        # skip rows which made it into the archive on a previous run that was interrupted before they were deleted
+        archived = self._read_day(table, day, columns=[sql.CREATED_AT, sql.ROW_ID])
+        keys = pd.MultiIndex.from_frame(new_rows[[sql.CREATED_AT, sql.ROW_ID]])
+        new_rows = new_rows[~keys.isin(pd.MultiIndex.from_frame(archived))]
+
+        if not new_rows.empty:
+            day_dir = self._day_dir(table, day)
+            day_dir.mkdir(parents=True, exist_ok=True)
+            part = day_dir / f"part-{len(list(day_dir.glob('*.parquet'))):05d}.parquet"
+            tmp = part.with_suffix(".tmp")
+            new_rows.to_parquet(tmp, index=False, compression="zstd")
+            tmp.replace(part)
+
+        # only delete the rows that were archived - not any which were inserted since they were read
+        conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", [(row[sql.ROW_ID],) for row in rows])
+        conn.commit()
+        return len(rows)
@@ -0,0 +1,127 @@
+import asyncio
+import contextlib
+import queue
+import sqlite3
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, TypeVar
+
+from sturdy.constants import DB_CONNECTION_TIMEOUT, DB_MAX_CONNECTIONS, DB_MAX_PENDING_QUERIES, DB_POOL_SIZE
+from sturdy.validator import sql
+
+T = TypeVar("T")
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of db connections, so that they aren't opened, configured and closed for every query.
+
+    Up to `size` idle connections are kept around. A connection is only ever used by one thread at a time, but may be
+    used by different threads over its lifetime. When every idle connection is in use, an extra one is opened - and
+    closed once it's done with - so that long running users (e.g. streamed responses) can't starve everyone else. At
+    most `max_connections` are open at once though: beyond that, callers wait up to `timeout` seconds for one to be
+    returned, and then fail with `sqlite3.OperationalError`, like a query on a locked db would.
+    """
+
+    def __init__(
+        self,
+        path: str = sql.DB_PATH,
+        size: int = DB_POOL_SIZE,
+        max_connections: int = DB_MAX_CONNECTIONS,
+        timeout: float = DB_CONNECTION_TIMEOUT,
+    ) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        if max_connections < size:
+            raise ValueError("max_connections must be at least size")
+        self.path = path
+        self.size = size
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=size)
+        self._available = threading.BoundedSemaphore(max_connections)
+        self._closed = False
+
+    @property
+    def num_idle(self) -> int:
+        return self._idle.qsize()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Drop-in replacement for `sql.get_db_connection`, which borrows a connection from the pool."""
+        if not self._available.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError(f"Timed out waiting for one of {self.max_connections} db connections")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = sql.connect(self.path, check_same_thread=False)
+
+            try:
+                yield conn
+            finally:
+                self._return(conn)
+        finally:
+            self._available.release()
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _return(self, conn: sqlite3.Connection) -> None:
+        with contextlib.suppress(sqlite3.Error, queue.Full):
+            # don't hand a connection in the middle of a transaction on to the next user
+            if conn.in_transaction:
+                conn.rollback()
+            if not self._closed:
+                self._idle.put_nowait(conn)
+                return
+        conn.close()
+
+
+class AsyncDatabase:
+    """
+    Runs db queries for the api server without blocking its event loop.
+
+    Queries are run on a small dedicated thread pool, on connections from a `ConnectionPool`. At most
+    `max_pending_queries` can be submitted at a time - beyond that, callers wait (asynchronously) for earlier queries to
+    finish, rather than queueing up unbounded work behind a slow disk.
+    """
+
+    def __init__(
+        self,
+        path: str = sql.DB_PATH,
+        pool_size: int = DB_POOL_SIZE,
+        max_pending_queries: int = DB_MAX_PENDING_QUERIES,
+    ) -> None:
+        self.pool = ConnectionPool(path, pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="db")
+        self._pending = asyncio.Semaphore(max_pending_queries)
+
+    def connection(self):  # noqa: ANN201
+        """Borrows a connection from the pool. For code which is already running off of the event loop."""
+        return self.pool.connection()
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Runs `fn(*args, **kwargs)` - which uses the db itself, e.g. through `connection` - on the db threads."""
+        async with self._pending:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def run_query(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Runs `fn(conn, *args, **kwargs)` - e.g. any of the `sql` queries - on the db threads, with a pooled connection."""
+        return await self.run(self._with_connection, fn, *args, **kwargs)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+    def _with_connection(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self.pool.connection() as conn:
+            return fn(conn, *args, **kwargs)
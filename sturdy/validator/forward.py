@@ -17,29 +17,41 @@
 # DEALINGS IN THE SOFTWARE.
 
 import asyncio
-import copy
 from typing import Any
 
 import bittensor as bt
+import torch
 from web3.constants import ADDRESS_ZERO
 
 from sturdy.constants import QUERY_TIMEOUT
 from sturdy.protocol import REQUEST_TYPES, AllocateAssets, AllocInfo
 from sturdy.validator.reward import get_rewards
+from sturdy.validator.simulator import Simulator
 
 
-async def forward(self) -> Any:
+class ForwardContext:
     """
-    The forward function is called by the validator every time step.
+    State owned by a single forward pass.
 
-    It is responsible for querying the network with synthetic requests and scoring the responses.
-
-    Args:
-        self (:obj:`bittensor.neuron.Neuron`): The neuron object which contains all the necessary state for the validator.
+    Every forward (synthetic or organic) gets its own simulator and its own intermediate results, so that concurrent
+    forwards never share mutable state. The only shared state they touch is the validator's scores, which are updated
+    behind `self.lock` once a forward has been scored.
 
+    The reward functions read `simulator`, `device` and `w3` from - and write their intermediate results to - the object
+    passed to them as `self`, so a context can be passed to them in place of the validator.
     """
-    # initialize pools and assets
-    await query_and_score_miners(self)
+
+    def __init__(self, validator, simulator: Simulator) -> None:
+        self.simulator = simulator
+        self.device = validator.device
+        self.w3 = getattr(validator, "w3", None)  # only organic validators have a web3 provider
+        self.similarity_penalties: dict[str, int] = {}
+        self.sorted_apys: dict[str, int] = {}
+        self.sorted_axon_times: dict[str, float] = {}
+        # filled in by `query_miners`
+        self.assets_and_pools: Any = None
+        self.active_uids: list[str] = []
+        self.responses: list[bt.Synapse] = []
 
 
 async def query_miner(
@@ -67,26 +79,41 @@ async def query_multiple_miners(
     return await asyncio.gather(*uid_to_query_task.values())
 
 
-async def query_and_score_miners(
+async def query_miners(
     self,
     assets_and_pools: Any = None,
     request_type: REQUEST_TYPES = REQUEST_TYPES.SYNTHETIC,
     user_address: str = ADDRESS_ZERO,
-) -> dict[str, AllocInfo]:
-
-    # intialize simulator
-    if request_type == REQUEST_TYPES.ORGANIC:
-        self.simulator.initialize(timesteps=1)
-    else:
-        self.simulator.initialize()
+) -> ForwardContext:
+    """
+    First phase of a forward: sets up the simulation for the request and queries the miners.
+    Returns the context holding the responses, ready to be scored by `score_responses`.
+    """
 
-    # initialize simulator data
-    # if there is no "organic" info then generate synthetic info
-    if assets_and_pools is not None:
-        self.simulator.init_data(init_assets_and_pools=copy.deepcopy(assets_and_pools))
+    scenario_prefetcher = getattr(self, "scenario_prefetcher", None)
+    if assets_and_pools is None and request_type != REQUEST_TYPES.ORGANIC and scenario_prefetcher is not None:
+        # synthetic rounds can start straight away from a scenario that was generated ahead of time
+        ctx = ForwardContext(self, await asyncio.to_thread(scenario_prefetcher.get))
+        simulator = ctx.simulator
+        assets_and_pools = simulator.assets_and_pools
     else:
-        self.simulator.init_data()
-        assets_and_pools = self.simulator.assets_and_pools
+        # every forward runs in its own context so that concurrent forwards can overlap safely
+        ctx = ForwardContext(self, self.simulator.clone())
+        simulator = ctx.simulator
+
+        # intialize simulator
+        if request_type == REQUEST_TYPES.ORGANIC:
+            simulator.initialize(timesteps=1)
+        else:
+            simulator.initialize()
+
+        # initialize simulator data
+        # if there is no "organic" info then generate synthetic info
+        if assets_and_pools is not None:
+            simulator.init_data(init_assets_and_pools=assets_and_pools)
+        else:
+            simulator.init_data()
+            assets_and_pools = simulator.assets_and_pools
 
     # The dendrite client queries the network.
     # TODO: write custom availability function later down the road
@@ -96,8 +123,8 @@ async def query_and_score_miners(
 
     synapse = AllocateAssets(
         request_type=request_type,
-        assets_and_pools=self.simulator.assets_and_pools,
-        allocations=self.simulator.allocations,
+        assets_and_pools=simulator.assets_and_pools,
+        allocations=simulator.allocations,
         user_address=user_address,
     )
 
@@ -112,17 +139,49 @@ async def query_and_score_miners(
     bt.logging.debug(f"Assets and pools: {synapse.assets_and_pools}")
     bt.logging.debug(f"Received allocations (uid -> allocations): {allocations}")
 
-    # Adjust the scores based on responses from miners.
+    ctx.assets_and_pools = assets_and_pools
+    ctx.active_uids = active_uids
+    ctx.responses = responses
+    return ctx
+
+
+def score_responses(ctx: ForwardContext, query: int) -> tuple[torch.Tensor, dict[str, AllocInfo]]:
+    """
+    Second phase of a forward: scores the miners' responses. This is cpu-bound and only touches the context, so it is
+    safe to run off of the event loop.
+    """
     rewards, allocs = get_rewards(
-        self,
-        query=self.step,
-        uids=active_uids,
-        responses=responses,
-        assets_and_pools=assets_and_pools,
+        ctx,
+        query=query,
+        uids=ctx.active_uids,
+        responses=ctx.responses,
+        assets_and_pools=ctx.assets_and_pools,
     )
 
     bt.logging.info(f"Scored responses: {rewards}")
+    return rewards, allocs
+
 
-    int_active_uids = [int(uid) for uid in active_uids]
-    self.update_scores(rewards, int_active_uids)
+async def apply_scores(self, ctx: ForwardContext, rewards: torch.Tensor) -> None:
+    """Last phase of a forward: folds the rewards into the validator's scores and publishes the forward's metrics."""
+    int_active_uids = [int(uid) for uid in ctx.active_uids]
+    # only the score update is serialized between concurrent forwards
+    async with self.lock:
+        self.update_scores(rewards, int_active_uids)
+        self.similarity_penalties = ctx.similarity_penalties
+        self.sorted_apys = ctx.sorted_apys
+        self.sorted_axon_times = ctx.sorted_axon_times
+
+
+async def query_and_score_miners(
+    self,
+    assets_and_pools: Any = None,
+    request_type: REQUEST_TYPES = REQUEST_TYPES.SYNTHETIC,
+    user_address: str = ADDRESS_ZERO,
+) -> dict[str, AllocInfo]:
+    ctx = await query_miners(self, assets_and_pools, request_type, user_address)
+    # Adjust the scores based on responses from miners.
+    # scoring looks up supply rates on chain for organic requests - don't hold up the event loop (i.e. the api) meanwhile
+    rewards, allocs = await asyncio.to_thread(score_responses, ctx, self.step)
+    await apply_scores(self, ctx, rewards)
     return allocs
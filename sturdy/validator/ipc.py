@@ -0,0 +1,186 @@
+import asyncio
+import itertools
+import json
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from pathlib import Path
+from typing import Any
+
+import bittensor as bt
+
+from sturdy.constants import IPC_MAX_MESSAGE_SIZE, IPC_TIMEOUT
+
+Handler = Callable[[dict], Awaitable[Any]]
+
+
+class IpcError(Exception):
+    """Raised when the validator core fails to handle a call made to it."""
+
+
+class InProcessCore:
+    """
+    Calls the validator core's handlers directly - for when the api server runs in the same process as the validator.
+    Has the same interface as `IpcClient`, so the api server doesn't need to know which one it's talking to.
+    """
+
+    def __init__(self, handlers: dict[str, Handler]) -> None:
+        self.handlers = handlers
+
+    async def call(self, method: str, params: dict | None = None) -> Any:
+        handler = self.handlers.get(method)
+        if handler is None:
+            raise IpcError(f"Unknown method: {method}")
+        return await handler(params or {})
+
+    async def close(self) -> None:
+        pass
+
+
+class IpcServer:
+    """
+    Serves calls to the validator core's handlers over a unix socket, so that the api server can run in separate worker
+    processes - scaling with the number of cores, instead of sharing one GIL and event loop with the validator.
+
+    Messages are newline delimited json. Each call is `{"id": ..., "method": ..., "params": {...}}` and is answered with
+    `{"id": ..., "result": ...}` or `{"id": ..., "error": "..."}`. Calls on the same connection are handled concurrently,
+    and may be answered out of order.
+    """
+
+    def __init__(self, socket_path: str, handlers: dict[str, Handler], max_message_size: int = IPC_MAX_MESSAGE_SIZE) -> None:
+        self.socket_path = socket_path
+        self.max_message_size = max_message_size
+        self._core = InProcessCore(handlers)
+        self._server: asyncio.AbstractServer | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._writers: set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        # a socket left behind by a validator which didn't shut down cleanly would stop us from binding
+        Path(self.socket_path).unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle_connection, self.socket_path, limit=self.max_message_size)
+        bt.logging.info(f"Validator core listening on {self.socket_path}")
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for task in list(self._tasks):
+            task.cancel()
+        for writer in list(self._writers):
+            writer.close()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        Path(self.socket_path).unlink(missing_ok=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._respond(line, writer))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except (ValueError, ConnectionError) as e:
+            # ValueError is raised for messages over max_message_size - there's no way to resync after one of those
+            bt.logging.error(f"Dropping api worker connection: {e}")
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter) -> None:
+        id_ = None
+        try:
+            message = json.loads(line)
+            id_ = message["id"]
+            response = {"id": id_, "result": await self._core.call(message["method"], message.get("params"))}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            bt.logging.error(f"Failed to handle call from api worker: {e}")
+            response = {"id": id_, "error": f"{type(e).__name__}: {e}"}
+
+        if writer.is_closing():
+            return
+        try:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError as e:
+            bt.logging.error(f"Failed to respond to api worker: {e}")
+
+
+class IpcClient:
+    """
+    Calls the validator core's handlers, served by an `IpcServer`, from an api worker.
+
+    All calls from the worker share one connection, which is opened on the first call and reopened if it's lost.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = IPC_TIMEOUT, max_message_size: int = IPC_MAX_MESSAGE_SIZE) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.max_message_size = max_message_size
+        self._ids = itertools.count()
+        # calls waiting to be answered, and the connection they were made on
+        self._pending: dict[int, tuple[asyncio.Future, asyncio.StreamWriter]] = {}
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._connect_lock: asyncio.Lock | None = None
+
+    async def call(self, method: str, params: dict | None = None) -> Any:
+        """
+        Calls `method` on the validator core. Raises `IpcError` if the core fails to handle it, `ConnectionError` if the
+        core can't be reached and `TimeoutError` if it doesn't answer within `timeout` seconds.
+        """
+        writer = await self._connect()
+        id_ = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[id_] = (future, writer)
+        try:
+            writer.write(json.dumps({"id": id_, "method": method, "params": params or {}}).encode() + b"\n")
+            await writer.drain()
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(id_, None)
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader_task
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                try:
+                    reader, self._writer = await asyncio.open_unix_connection(self.socket_path, limit=self.max_message_size)
+                except OSError as e:
+                    raise ConnectionError(f"Failed to connect to the validator core at {self.socket_path}: {e}") from e
+                self._reader_task = asyncio.create_task(self._read_responses(reader, self._writer))
+            return self._writer
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                future, _ = self._pending.get(message["id"], (None, None))
+                if future is None or future.done():
+                    continue  # the call timed out
+                if "error" in message:
+                    future.set_exception(IpcError(message["error"]))
+                else:
+                    future.set_result(message["result"])
+        except (ValueError, ConnectionError) as e:
+            bt.logging.error(f"Lost connection to the validator core: {e}")
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            # calls waiting on this connection won't be answered now
+            for future, call_writer in self._pending.values():
+                if call_writer is writer and not future.done():
+                    future.set_exception(ConnectionError("Lost connection to the validator core"))
@@ -0,0 +1,155 @@
+import asyncio
+import contextlib
+from collections.abc import Callable
+from traceback import print_exception
+from typing import Any
+
+import bittensor as bt
+
+from sturdy.constants import WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_MAX_BATCH_SIZE, WRITE_BEHIND_MAX_QUEUE_SIZE
+from sturdy.protocol import AllocInfo
+from sturdy.validator import sql
+
+
+class RequestLog:
+    """A served request - whose credits have already been debited, leaving `balance` - still to be logged."""
+
+    def __init__(self, api_key: str, endpoint: str, cost: float, balance: float | None) -> None:
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.cost = cost
+        self.balance = balance
+        self.created_at = sql.now()
+
+
+class AllocationLog:
+    """An organic allocation request and the allocations returned for it, still to be written to the db."""
+
+    def __init__(self, request_uid: str, assets_and_pools: Any, allocations: dict[str, AllocInfo]) -> None:
+        self.request_uid = request_uid
+        self.assets_and_pools = assets_and_pools
+        self.allocations = allocations
+        self.created_at = sql.now()
+
+
+class WriteBehindQueue:
+    """
+    Takes writes to the validator database off of the request path.
+
+    Request logs and allocation records are put on a bounded queue and written by a background task, which drains up to
+    `max_batch_size` of them every `flush_interval` seconds and writes each batch in a single transaction from a worker
+    thread. When the queue is full, callers wait for it to drain.
+
+    Credits aren't written behind - they're debited in the db before a request is served (see `sql.debit_api_key`), so
+    balances are always up to date. A batch that fails to be written is retried on the next flush rather than dropped,
+    and everything still queued is flushed on `stop`. If the process dies outright, at most the last `flush_interval`
+    seconds of logs are lost, which only affects analytics and the rate limits picked up on a restart.
+
+    Both kinds of write are stamped with `sql.now()` when they're queued rather than when they're written, so request
+    logs and allocations share one clock (naive local time) and keep the order they were served in.
+    """
+
+    def __init__(
+        self,
+        max_size: int = WRITE_BEHIND_MAX_QUEUE_SIZE,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+        max_batch_size: int = WRITE_BEHIND_MAX_BATCH_SIZE,
+        db_connection: Callable = sql.get_db_connection,
+        compress_allocations: bool = False,
+    ) -> None:
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.db_connection = db_connection
+        self.compress_allocations = compress_allocations
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._failed_batch: list[RequestLog | AllocationLog] = []
+        self._flush_lock: asyncio.Lock | None = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._failed_batch) + (self._queue.qsize() if self._queue is not None else 0)
+
+    def start(self) -> None:
+        """Starts the background flusher on the running event loop, if it isn't running already."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._flush_lock = asyncio.Lock()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the background flusher and writes out everything that is still queued."""
+        if self._task is not None:
+            # don't interrupt a batch that is in the middle of being written
+            async with self._flush_lock:  # type: ignore[]
+                self._task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await self._task
+            self._task = None
+        while self.pending > 0:
+            if not await self.flush():
+                bt.logging.error(f"Failed to flush {self.pending} pending writes to the database on shutdown!")
+                break
+
+    async def log_request(self, api_key: str, endpoint: str, cost: float, balance: float | None) -> None:
+        await self._put(RequestLog(api_key, endpoint, cost, balance))
+
+    async def log_allocations(self, request_uid: str, assets_and_pools: Any, allocations: dict[str, AllocInfo]) -> None:
+        await self._put(AllocationLog(request_uid, assets_and_pools, allocations))
+
+    async def flush(self) -> bool:
+        """Writes the next batch of queued writes. Returns whether the batch was written."""
+        if self._queue is None:
+            return True
+        async with self._flush_lock:  # type: ignore[]
+            batch = self._failed_batch
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._failed_batch = []
+            if not batch:
+                return True
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                bt.logging.error(f"Failed to write {len(batch)} queued writes to the database, will retry: {e}")
+                bt.logging.debug(print_exception(type(e), e, e.__traceback__))
+                self._failed_batch = batch
+                return False
+            return True
+
+    async def _put(self, item: RequestLog | AllocationLog) -> None:
+        self.start()
+        await self._queue.put(item)  # type: ignore[]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # keep going while there's a backlog, but back off if the database is unavailable
+            while self.pending > 0 and await self.flush():
+                pass
+
+    def _write_batch(self, batch: list[RequestLog | AllocationLog]) -> None:
+        requests = [
+            (item.api_key, item.endpoint, item.cost, item.balance, item.created_at)
+            for item in batch
+            if isinstance(item, RequestLog)
+        ]
+        with self.db_connection() as conn:
+            try:
+                sql.log_requests(conn, requests)
+                for item in batch:
+                    if isinstance(item, AllocationLog):
+                        sql.insert_allocations(
+                            conn,
+                            item.request_uid,
+                            item.assets_and_pools,
+                            item.allocations,
+                            created_at=item.created_at,
+                            compress=self.compress_allocations,
+                        )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
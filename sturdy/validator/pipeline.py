@@ -0,0 +1,122 @@
+import asyncio
+import time
+from collections import deque
+from traceback import print_exception
+
+import bittensor as bt
+
+from sturdy.validator.forward import ForwardContext, apply_scores, query_miners, score_responses
+
+SECONDS_PER_HOUR = 3600
+
+
+class RoundPipeline:
+    """
+    Overlaps synthetic validation rounds.
+
+    A round queries the miners (`num_concurrent_forwards` forwards at once), scores their responses off of the event
+    loop, and then folds the rewards into the validator's scores. Starting a round only waits for a free slot, so round
+    N+1 can be generated and its queries dispatched while round N is still waiting on miners or being scored. At most
+    `max_in_flight_rounds` rounds run at any time, and scores are always applied in the order the rounds were started -
+    so the moving average sees exactly the same sequence of rewards as it would without pipelining.
+    """
+
+    def __init__(self, validator, max_in_flight_rounds: int = 2) -> None:
+        if max_in_flight_rounds < 1:
+            raise ValueError(f"max_in_flight_rounds must be at least 1, got {max_in_flight_rounds}")
+        self.validator = validator
+        self.max_in_flight_rounds = max_in_flight_rounds
+        self._slots = asyncio.Semaphore(max_in_flight_rounds)
+        self._next_round_id = 0
+        self._next_round_to_apply = 0
+        # rounds waiting for their turn to apply scores, and rounds done with their turn before it came up
+        self._turns: dict[int, asyncio.Future[None]] = {}
+        self._handed_over: set[int] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._started_at = time.monotonic()
+        self._completed_at: deque[float] = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    @property
+    def rounds_per_hour(self) -> float:
+        """Number of rounds completed over the last hour (extrapolated if the pipeline has been up for less)."""
+        now = time.monotonic()
+        while self._completed_at and now - self._completed_at[0] > SECONDS_PER_HOUR:
+            self._completed_at.popleft()
+        window = min(now - self._started_at, SECONDS_PER_HOUR)
+        if window <= 0:
+            return 0.0
+        return len(self._completed_at) * SECONDS_PER_HOUR / window
+
+    async def start_round(self) -> asyncio.Task:
+        """
+        Starts a new round once fewer than `max_in_flight_rounds` rounds are running. Returns the round's task without
+        waiting for it to finish.
+        """
+        await self._slots.acquire()
+        round_id = self._next_round_id
+        self._next_round_id += 1
+        task = asyncio.create_task(self._run_round(round_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def try_start_round(self) -> asyncio.Task | None:
+        """
+        Starts a new round if fewer than `max_in_flight_rounds` rounds are running - like `start_round`, but returns None
+        rather than waiting for a slot if there are already that many.
+        """
+        if self._slots.locked():
+            return None
+        return await self.start_round()
+
+    async def wait_for_all(self) -> None:
+        """Waits for every round that has been started to finish."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_round(self, round_id: int) -> None:
+        try:
+            results = []
+            try:
+                num_forwards = self.validator.config.neuron.num_concurrent_forwards
+                contexts: list[ForwardContext] = await asyncio.gather(
+                    *[query_miners(self.validator) for _ in range(num_forwards)]
+                )
+                for ctx in contexts:
+                    rewards, _ = await asyncio.to_thread(score_responses, ctx, round_id)
+                    results.append((ctx, rewards))
+            except Exception as e:
+                bt.logging.error(f"Error in validation round {round_id}: {e}")
+                bt.logging.debug(print_exception(type(e), e, e.__traceback__))
+
+            # apply scores in round order
+            await self._wait_for_turn(round_id)
+            for ctx, rewards in results:
+                await apply_scores(self.validator, ctx, rewards)
+
+            if results:
+                self._completed_at.append(time.monotonic())
+        finally:
+            # a round that failed or was cancelled - even before its turn came up - still has to hand over its turn
+            self._hand_over_turn(round_id)
+            self._slots.release()
+
+    async def _wait_for_turn(self, round_id: int) -> None:
+        if self._next_round_to_apply != round_id:
+            turn = self._turns.setdefault(round_id, asyncio.get_running_loop().create_future())
+            await turn
+
+    def _hand_over_turn(self, round_id: int) -> None:
+        """Passes the turn on from `round_id` - once every round before it has done the same."""
+        self._turns.pop(round_id, None)
+        self._handed_over.add(round_id)
+        while self._next_round_to_apply in self._handed_over:
+            self._handed_over.remove(self._next_round_to_apply)
+            self._next_round_to_apply += 1
+        turn = self._turns.pop(self._next_round_to_apply, None)
+        if turn is not None and not turn.done():
+            turn.set_result(None)
@@ -16,7 +16,8 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import copy
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, cast
 
 import bittensor as bt
@@ -25,10 +26,18 @@ import numpy as np
 import numpy.typing as npt
 import torch
 
-from sturdy.constants import QUERY_TIMEOUT, SIMILARITY_THRESHOLD
-from sturdy.pools import POOL_TYPES, BasePoolModel, ChainBasedPoolModel, check_allocations
+from sturdy.constants import QUERY_TIMEOUT, SIMILARITY_THRESHOLD, SUPPLY_RATE_WORKERS
+from sturdy.pool_index import PoolIndex
+from sturdy.pools import (
+    ALLOCATION_CHECK,
+    POOL_TYPES,
+    BasePoolModel,
+    ChainBasedPoolModel,
+    check_allocations_batch,
+    sync_pool,
+)
 from sturdy.protocol import REQUEST_TYPES, AllocationsDict, AllocInfo
-from sturdy.utils.ethmath import wei_div, wei_mul
+from sturdy.utils.ethmath import wei_div, wei_mul, wei_mul_arrays
 
 
 def get_response_times(uids: list[str], responses, timeout: float) -> dict[str, float]:
@@ -113,19 +122,35 @@ def dynamic_normalize_zscore(
     return (squared - squared.min()) / (squared.max() - squared.min() + epsilon)
 
 
+def calculate_penalty_array(
+    similarities: npt.NDArray[np.float64],
+    axon_times: npt.NDArray[np.float64],
+    similarity_threshold: float = SIMILARITY_THRESHOLD,
+) -> npt.NDArray[np.int64]:
+    """
+    Array version of `calculate_penalties`: miner j is penalized once for every miner i whose allocations its own are
+    similar to, and which responded no later than it did - i.e. penalties[j] counts the i for which
+    similarities[i, j] <= similarity_threshold and axon_times[i] <= axon_times[j].
+    """
+    similar = (similarities <= similarity_threshold) & (axon_times[:, None] <= axon_times[None, :])
+    return similar.sum(axis=0)
+
+
 def calculate_penalties(
     similarity_matrix: dict[str, dict[str, float]],
     axon_times: dict[str, float],
     similarity_threshold: float = SIMILARITY_THRESHOLD,
 ) -> dict[str, int]:
-    penalties = {miner: 0 for miner in similarity_matrix}
-
-    for miner_a, similarities in similarity_matrix.items():
-        for miner_b, similarity in similarities.items():
-            if similarity <= similarity_threshold and axon_times[miner_a] <= axon_times[miner_b]:
-                penalties[miner_b] += 1
+    miners = list(similarity_matrix)
+    indices = {miner: idx for idx, miner in enumerate(miners)}
+    similarities = np.full((len(miners), len(miners)), np.inf)
+    for miner_a, row in similarity_matrix.items():
+        for miner_b, similarity in row.items():
+            similarities[indices[miner_a], indices[miner_b]] = similarity
+    times = np.array([axon_times[miner] for miner in miners], dtype=np.float64)
 
-    return penalties
+    penalties = calculate_penalty_array(similarities, times, similarity_threshold)
+    return dict(zip(miners, penalties.tolist(), strict=True))
 
 
 def calculate_rewards_with_adjusted_penalties(miners, rewards_apy, penalties) -> torch.Tensor:
@@ -151,6 +176,44 @@ def get_distance(alloc_a: npt.NDArray, alloc_b: npt.NDArray, total_assets: int)
     return norm / gmpy2.sqrt(float(2 * total_assets**2))
 
 
+def get_allocation_arrays(
+    apys_and_allocations: dict[str, dict[str, AllocationsDict | int]], pool_index: PoolIndex
+) -> list[npt.NDArray | None]:
+    """
+    Converts each miner's allocations into an array - None if they're missing, to pools that aren't indexed, or aren't
+    whole amounts.
+    """
+    allocation_arrays = []
+    for info in apys_and_allocations.values():
+        allocations = cast(AllocationsDict | None, info["allocations"])
+        try:
+            allocation_arrays.append(None if allocations is None else pool_index.to_array(allocations))
+        except (KeyError, TypeError, ValueError):
+            allocation_arrays.append(None)
+    return allocation_arrays
+
+
+def get_similarity_array(allocation_arrays: list[npt.NDArray | None], total_assets: int) -> npt.NDArray[np.float64]:
+    """
+    Array version of `get_similarity_matrix`: element (i, j) is the normalized Euclidean distance between the
+    allocations i and j. The distance of allocations to themselves, and to or from missing allocations, is infinite.
+    """
+    num_miners = len(allocation_arrays)
+    similarities = np.full((num_miners, num_miners), np.inf)
+    present = np.array([array is not None for array in allocation_arrays], dtype=bool)
+    if present.any():
+        allocations = np.stack([array for array in allocation_arrays if array is not None])
+        # |a - b|^2 = |a|^2 + |b|^2 - 2a.b - exact, as the amounts are python ints
+        squared_norms = (allocations * allocations).sum(axis=1)
+        squared_distances = squared_norms[:, None] + squared_norms[None, :] - 2 * allocations.dot(allocations.T)
+        # gmpy2 takes the square root of the exact squared distance, as get_distance does
+        norms = np.frompyfunc(lambda squared_distance: gmpy2.sqrt(gmpy2.mpz(squared_distance)), 1, 1)(squared_distances)
+        distances = (norms / gmpy2.sqrt(float(2 * total_assets**2))).astype(np.float64)
+        similarities[np.ix_(present, present)] = distances
+    np.fill_diagonal(similarities, np.inf)
+    return similarities
+
+
 def get_similarity_matrix(
     apys_and_allocations: dict[str, dict[str, AllocationsDict | int]],
     assets_and_pools: dict[str, dict[str, ChainBasedPoolModel | BasePoolModel] | int],
@@ -179,26 +242,16 @@ def get_similarity_matrix(
             normalized Euclidean distances to every other miner. The distances are scaled between 0 and 1.
     """
 
-    similarity_matrix = {}
-    total_assets = cast(int, assets_and_pools["total_assets"])
-    for miner_a, info_a in apys_and_allocations.items():
-        _alloc_a = cast(AllocationsDict, info_a["allocations"])
-        alloc_a = np.array(
-            [gmpy2.mpz(x) for x in list(format_allocations(_alloc_a, assets_and_pools).values())],
-        )
-        similarity_matrix[miner_a] = {}
-        for miner_b, info_b in apys_and_allocations.items():
-            if miner_a != miner_b:
-                _alloc_b = cast(AllocationsDict, info_b["allocations"])
-                if _alloc_a is None or _alloc_b is None:
-                    similarity_matrix[miner_a][miner_b] = float("inf")
-                    continue
-                alloc_b = np.array(
-                    [gmpy2.mpz(x) for x in list(format_allocations(_alloc_b, assets_and_pools).values())],
-                )
-                similarity_matrix[miner_a][miner_b] = get_distance(alloc_a, alloc_b, total_assets)
+    pool_index = PoolIndex(cast(dict, assets_and_pools["pools"]))
+    similarities = get_similarity_array(
+        get_allocation_arrays(apys_and_allocations, pool_index), cast(int, assets_and_pools["total_assets"])
+    )
 
-    return similarity_matrix
+    miners = list(apys_and_allocations)
+    return {
+        miner_a: {miner_b: float(similarities[idx_a, idx_b]) for idx_b, miner_b in enumerate(miners) if idx_a != idx_b}
+        for idx_a, miner_a in enumerate(miners)
+    }
 
 
 def adjust_rewards_for_plagiarism(
@@ -209,6 +262,7 @@ def adjust_rewards_for_plagiarism(
     uids: list,
     axon_times: dict[str, float],
     similarity_threshold: float = SIMILARITY_THRESHOLD,
+    allocation_arrays: list[npt.NDArray | None] | None = None,
 ) -> torch.Tensor:
     """
     Adjusts the annual percentage yield (APY) rewards for miners based on the similarity of their allocations
@@ -229,6 +283,8 @@ def adjust_rewards_for_plagiarism(
         uids (List): A list of unique identifiers for the miners.
         axon_times (dict[str, float]): A dictionary that tracks the arrival times of each miner, with the keys being
             miner identifiers and the values being their arrival times. Earlier times are lower values.
+        allocation_arrays (list[Optional[npt.NDArray]], optional): The miners' allocations, already converted into
+            arrays by a `PoolIndex` - in the same order as `apys_and_allocations`. Converted here if not given.
 
     Returns:
         torch.Tensor: The adjusted APY rewards for the miners, accounting for penalties due to similarity with
@@ -236,14 +292,20 @@ def adjust_rewards_for_plagiarism(
     Notes:
         - This function relies on the helper functions `calculate_penalties` and `calculate_rewards_with_adjusted_penalties`
           which are defined separately.
-        - The `format_allocations` function used in the similarity calculation converts the allocation dictionaries
-          to a consistent format suitable for comparison.
+        - The similarity calculation works on the allocations as arrays indexed by a `PoolIndex`, so that they're
+          converted into a consistent format suitable for comparison once, rather than for every pair of miners.
     """
+    if allocation_arrays is None:
+        pool_index = PoolIndex(cast(dict, assets_and_pools["pools"]))
+        allocation_arrays = get_allocation_arrays(apys_and_allocations, pool_index)
+
     # Step 1: Calculate pairwise similarity (e.g., using Euclidean distance)
-    similarity_matrix = get_similarity_matrix(apys_and_allocations, assets_and_pools)
+    similarities = get_similarity_array(allocation_arrays, cast(int, assets_and_pools["total_assets"]))
 
     # Step 2: Apply penalties considering axon times
-    penalties = calculate_penalties(similarity_matrix, axon_times, similarity_threshold)
+    miners = list(apys_and_allocations)
+    times = np.array([axon_times[miner] for miner in miners], dtype=np.float64)
+    penalties = dict(zip(miners, calculate_penalty_array(similarities, times, similarity_threshold).tolist(), strict=True))
     self.similarity_penalties = penalties
 
     # Step 3: Calculate final rewards with adjusted penalties
@@ -256,6 +318,7 @@ def _get_rewards(
     assets_and_pools: dict[str, dict[str, ChainBasedPoolModel | BasePoolModel] | int],
     uids: list[str],
     axon_times: dict[str, float],
+    allocation_arrays: list[npt.NDArray | None] | None = None,
 ) -> torch.Tensor:
     """
     Rewards miner responses to request. This method returns a reward
@@ -269,53 +332,92 @@ def _get_rewards(
 
     rewards_apy = dynamic_normalize_zscore(apys_and_allocations).to(self.device)
 
-    return adjust_rewards_for_plagiarism(self, rewards_apy, apys_and_allocations, assets_and_pools, uids, axon_times)
+    return adjust_rewards_for_plagiarism(
+        self, rewards_apy, apys_and_allocations, assets_and_pools, uids, axon_times, allocation_arrays=allocation_arrays
+    )
+
+
+SupplyRates = dict[tuple[int, int], Future[int]]
+
+
+def _supply_rate_key(pool: ChainBasedPoolModel, pool_idx: int, amount: int) -> tuple[int, int]:
+    # the dai savings rate doesn't depend on the amount supplied
+    return (pool_idx, 0) if pool.pool_type == POOL_TYPES.DAI_SAVINGS else (pool_idx, int(amount))
+
+
+def _supply_rate(pool: ChainBasedPoolModel, amount: int) -> int:
+    return pool.supply_rate() if pool.pool_type == POOL_TYPES.DAI_SAVINGS else pool.supply_rate(amount=amount)
+
+
+def get_supply_rates(
+    assets_and_pools: dict[str, dict[str, ChainBasedPoolModel | BasePoolModel] | int],
+    allocations: Iterable[npt.NDArray],
+    max_workers: int = SUPPLY_RATE_WORKERS,
+) -> SupplyRates:
+    """
+    Looks up the supply rate of every distinct (pool, amount) pair in the given allocations - concurrently, as each
+    one takes an eth_call or more for most chain based pools. This way scoring a round takes as many round trips to the
+    chain as the slowest lookup, rather than one for every pool of every miner.
+
+    The allocations are arrays indexed by the `PoolIndex` of the pools. Returns a table of the lookups keyed by
+    (pool index, amount), all of which are done by the time it returns - failed lookups raise when their result is
+    asked for, so that only the miners whose allocations need them are affected.
+    """
+
+    pools = list(cast(dict[str, ChainBasedPoolModel], assets_and_pools["pools"]).values())
+    keys = {
+        _supply_rate_key(pool, pool_idx, amount)
+        for allocs in allocations
+        for pool_idx, (pool, amount) in enumerate(zip(pools, allocs, strict=True))
+    }
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="supply_rate") as executor:
+        return {key: executor.submit(_supply_rate, pools[key[0]], key[1]) for key in keys}
 
 
 def calculate_apy(
-    allocations: AllocationsDict,
+    allocations: npt.NDArray,
     assets_and_pools: dict[str, dict[str, ChainBasedPoolModel | BasePoolModel] | int],
+    supply_rates: SupplyRates | None = None,
 ) -> int:
     """
-    Calculates immediate projected yields given intial assets and pools, pool history, and number of timesteps
+    Calculates immediate projected yields given intial assets and pools, pool history, and number of timesteps.
+    The allocations are an array indexed by the `PoolIndex` of the pools. The supply rates are looked up in
+    `supply_rates` (see `get_supply_rates`) if given, otherwise they're looked up on chain one after the other.
     """
 
     # calculate projected yield
     initial_balance = cast(int, assets_and_pools["total_assets"])
     pools = cast(dict[str, ChainBasedPoolModel], assets_and_pools["pools"])
     pct_yield = 0
-    for uid, pool in pools.items():
-        allocation = allocations[uid]
-        match pool.pool_type:
-            case POOL_TYPES.DAI_SAVINGS:
-                pool_yield = wei_mul(allocation, pool.supply_rate())
-            case _:
-                pool_yield = wei_mul(allocation, pool.supply_rate(amount=allocation))
-        pct_yield += pool_yield
+    for pool_idx, (pool, allocation) in enumerate(zip(pools.values(), allocations, strict=True)):
+        if supply_rates is None:
+            supply_rate = _supply_rate(pool, allocation)
+        else:
+            supply_rate = supply_rates[_supply_rate_key(pool, pool_idx, allocation)].result()
+        pct_yield += wei_mul(allocation, supply_rate)
 
     return wei_div(pct_yield, initial_balance)
 
 
 def calculate_aggregate_apy(
-    allocations: AllocationsDict,
+    allocations: npt.NDArray,
     assets_and_pools: dict[str, dict[str, ChainBasedPoolModel | BasePoolModel] | int],
     timesteps: int,
     pool_history: list[dict[str, Any]],
 ) -> int:
     """
-    Calculates aggregate yields given intial assets and pools, pool history, and number of timesteps
+    Calculates aggregate yields given intial assets and pools, pool history, and number of timesteps.
+    The allocations are an array indexed by the `PoolIndex` of the pools, which every step of the pool history is
+    ordered by.
     """
 
     # calculate aggregate yield
     initial_balance = cast(int, assets_and_pools["total_assets"])
     pct_yield = 0
     for pools in pool_history:
-        curr_yield = 0
-        for uid, allocs in allocations.items():
-            pool_data = pools[uid]
-            pool_yield = wei_mul(allocs, pool_data.supply_rate)
-            curr_yield += pool_yield
-        pct_yield += curr_yield
+        supply_rates = np.array([pool.supply_rate for pool in pools.values()], dtype=object)
+        pct_yield += sum(int(pool_yield) for pool_yield in wei_mul_arrays(allocations, supply_rates))
 
     pct_yield = wei_div(pct_yield, initial_balance)
     return int(pct_yield // timesteps)  # for simplicity each timestep is a day in the simulator
@@ -345,27 +447,49 @@ def get_rewards(
     max_apy = 0
     apys = {}
 
-    init_assets_and_pools = copy.deepcopy(assets_and_pools)
+    # the pools are never changed in place (see Simulator), so they needn't be deepcopied
+    init_assets_and_pools = {**assets_and_pools, "pools": dict(assets_and_pools["pools"])}
 
     bt.logging.debug(f"Running simulator for {self.simulator.timesteps} timesteps for each allocation...")
 
     # TODO: assuming that we are only getting immediate apy for organic chainbasedpool requests
     pools_to_scan = cast(dict, init_assets_and_pools["pools"])
     # update reserves given allocations
-    for pool in pools_to_scan.values():
-        match pool.pool_type:
-            case T if T in (
-                POOL_TYPES.AAVE,
-                POOL_TYPES.DAI_SAVINGS,
-                POOL_TYPES.COMPOUND_V3,
-                POOL_TYPES.MORPHO,
-                POOL_TYPES.YEARN_V3,
-            ):
-                pool.sync(self.w3)
-            case POOL_TYPES.STURDY_SILO:
-                pool.sync(pool.user_address, self.w3)
-            case _:
-                pass
+    for uid, pool in pools_to_scan.items():
+        # pools from a PoolRegistry have been synced at the current block already
+        if isinstance(pool, ChainBasedPoolModel) and pool.synced_block is None:
+            synced_pool = pool.snapshot()
+            sync_pool(synced_pool, self.w3)
+            pools_to_scan[uid] = synced_pool
+
+    # allocations are converted into arrays indexed by pool once, here - everything past this works on those
+    pool_index = PoolIndex(pools_to_scan)
+    allocation_arrays: dict[str, npt.NDArray] = {}
+    for uid, response in zip(uids, responses, strict=True):
+        if not response.allocations:
+            continue
+        try:
+            allocation_arrays[uid] = pool_index.to_array(response.allocations)
+        except (KeyError, TypeError, ValueError) as e:
+            # allocating to pools that aren't in the request is just as invalid
+            bt.logging.error(f"Failed to read allocations of miner {uid}: {e!r}")
+
+    # validate miner allocations before running simulation
+    # are the miners cheating w.r.t allocations?
+    try:
+        valid, reasons = check_allocations_batch(init_assets_and_pools, [allocation_arrays.get(uid) for uid in uids])
+    except Exception as e:
+        bt.logging.error(e)  # type: ignore[]
+        valid = np.zeros(len(uids), dtype=bool)
+        reasons = np.full(len(uids), ALLOCATION_CHECK.INVALID_REQUEST, dtype=np.int8)
+
+    # organic allocations are scored with supply rates from the chain - look them all up at once beforehand
+    organic_allocations = [
+        allocation_arrays[uid]
+        for uid, response, is_valid in zip(uids, responses, valid, strict=True)
+        if is_valid and response.request_type == REQUEST_TYPES.ORGANIC
+    ]
+    supply_rates = get_supply_rates(init_assets_and_pools, organic_allocations) if organic_allocations else None
 
     resulting_apy = 0
     for response_idx, response in enumerate(responses):
@@ -374,18 +498,11 @@ def get_rewards(
 
         allocations = response.allocations
 
-        # validator miner allocations before running simulation
-        # is the miner cheating w.r.t allocations?
-        cheating = True
-        try:
-            cheating = not check_allocations(init_assets_and_pools, allocations)
-        except Exception as e:
-            bt.logging.error(e)  # type: ignore[]
-
         # score response very low if miner is cheating somehow or returns allocations with incorrect format
-        if cheating:
+        if not valid[response_idx]:
             miner_uid = uids[response_idx]
-            bt.logging.warning(f"CHEATER DETECTED  - MINER WITH UID {miner_uid} - PUNISHING 👊😠")
+            reason = ALLOCATION_CHECK(reasons[response_idx]).name
+            bt.logging.warning(f"CHEATER DETECTED  - MINER WITH UID {miner_uid} ({reason}) - PUNISHING 👊😠")
             apys[miner_uid] = 0
             continue
 
@@ -393,7 +510,7 @@ def get_rewards(
             if response.request_type == REQUEST_TYPES.SYNTHETIC:
                 # miner does not appear to be cheating - so we init simulator data
                 self.simulator.init_data(
-                    init_assets_and_pools=copy.deepcopy(init_assets_and_pools),
+                    init_assets_and_pools=init_assets_and_pools,
                     init_allocations=allocations,
                 )
                 self.simulator.update_reserves_with_allocs()
@@ -401,7 +518,7 @@ def get_rewards(
                 self.simulator.run()
 
                 resulting_apy = calculate_aggregate_apy(
-                    allocations,
+                    allocation_arrays[uids[response_idx]],
                     init_assets_and_pools,
                     self.simulator.timesteps,
                     self.simulator.pool_history,
@@ -409,8 +526,9 @@ def get_rewards(
 
             else:
                 resulting_apy = calculate_apy(
-                    allocations,
+                    allocation_arrays[uids[response_idx]],
                     init_assets_and_pools,
+                    supply_rates,
                 )
         except Exception as e:
             bt.logging.error(e)  # type: ignore[]
@@ -474,6 +592,9 @@ def get_rewards(
             assets_and_pools=init_assets_and_pools,  # type: ignore[]
             uids=uids,
             axon_times=axon_times,
+            allocation_arrays=[
+                allocation_arrays.get(uid) if info["allocations"] is not None else None for uid, info in allocs.items()
+            ],
         ),
         sorted_filtered_allocs,
     )
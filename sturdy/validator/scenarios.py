@@ -0,0 +1,92 @@
+import queue
+import threading
+from traceback import print_exception
+
+import bittensor as bt
+import numpy as np
+
+from sturdy.constants import POOL_GEN_VERSION, REVERSION_SPEED
+from sturdy.validator.simulator import Simulator
+
+
+class ScenarioPrefetcher:
+    """
+    Generates synthetic scenarios ahead of time so that synthetic rounds don't have to.
+
+    A scenario is a fully set up `Simulator` - initialized, with its pools and initial allocations generated and the noise
+    for every timestep pre-drawn. A background worker keeps up to `num_scenarios` of them ready in a queue.
+
+    Each scenario is seeded from a child of a single `np.random.SeedSequence`, so the sequence of scenarios handed out
+    only depends on `seed` (or, if no seed is given, on the logged entropy of the seed sequence).
+    """
+
+    def __init__(
+        self,
+        num_scenarios: int,
+        reversion_speed: float = REVERSION_SPEED,
+        seed: int | None = None,
+        pool_gen_version: int = POOL_GEN_VERSION,
+    ) -> None:
+        if num_scenarios < 1:
+            raise ValueError(f"num_scenarios must be at least 1, got {num_scenarios}")
+        self.reversion_speed = reversion_speed
+        self.pool_gen_version = pool_gen_version
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self._queue: queue.Queue[Simulator] = queue.Queue(maxsize=num_scenarios)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        bt.logging.info(f"Scenario seed sequence entropy: {self.seed_sequence.entropy}")
+
+    def generate(self) -> Simulator:
+        """Generates the next scenario in the seed sequence."""
+        (child,) = self.seed_sequence.spawn(1)
+        simulator = Simulator(
+            reversion_speed=self.reversion_speed,
+            seed=int(child.generate_state(1)[0]),
+            pool_gen_version=self.pool_gen_version,
+        )
+        simulator.initialize()
+        simulator.init_data()
+        simulator.predraw_noise()
+        return simulator
+
+    def start(self) -> None:
+        """Starts the background worker, if it isn't running already."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def get(self) -> Simulator:
+        """
+        Returns the next ready scenario, starting the background worker on first use. Blocks until one is ready - only
+        the worker ever generates scenarios so that they are always handed out in seed sequence order.
+        """
+        self.start()
+        return self._queue.get()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                simulator = self.generate()
+            except Exception as e:
+                bt.logging.error(f"Failed to generate synthetic scenario: {e}")
+                bt.logging.debug(print_exception(type(e), e, e.__traceback__))
+                self._stop.wait(1)
+                continue
+
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(simulator, timeout=1)
+                    break
+                except queue.Full:
+                    continue
@@ -16,18 +16,31 @@ from sturdy.utils.ethmath import wei_div, wei_mul
 
 
 class Simulator:
+    """
+    Pools are treated as immutable snapshots: the simulation never changes a pool in place, it replaces it with an
+    updated copy. So pools can be shared between the caller, the pool history and other simulations without having to
+    deepcopy them first.
+    """
+
     def __init__(
         self,
         reversion_speed: float = REVERSION_SPEED,
         seed=None,
+        pool_gen_version: int = POOL_GEN_VERSION,
     ) -> None:
         self.reversion_speed = reversion_speed
+        self.pool_gen_version = pool_gen_version
         self.assets_and_pools = {}
         self.allocations = {}
         self.pool_history = []
         self.init_rng = None
         self.rng_state_container: Any = None
         self.seed = seed
+        self.noise_schedule: np.ndarray | None = None
+
+    # fresh, uninitialized simulator with the same parameters - lets each forward run its own isolated simulation
+    def clone(self) -> "Simulator":
+        return Simulator(reversion_speed=self.reversion_speed, seed=self.seed, pool_gen_version=self.pool_gen_version)
 
     # initializes data - by default these are randomly generated
     def init_data(
@@ -41,9 +54,11 @@ class Simulator:
         if init_assets_and_pools is None:
             self.assets_and_pools: Any = generate_assets_and_pools(
                 rng_gen=self.rng_state_container,
+                version=self.pool_gen_version,
             )
         else:
-            self.assets_and_pools = init_assets_and_pools
+            # our own pools dict, as the pools in it are replaced when reserves are updated
+            self.assets_and_pools = {**init_assets_and_pools, "pools": dict(init_assets_and_pools["pools"])}
 
         if init_allocations is None:
             self.allocations = generate_initial_allocations_for_pools(
@@ -53,17 +68,13 @@ class Simulator:
             self.allocations = init_allocations
 
         # initialize pool history
-        self.pool_history = [
-            {
-                uid: copy.deepcopy(pool)
-                for uid, pool in self.assets_and_pools["pools"].items()  #
-            },
-        ]
+        self.pool_history = [dict(self.assets_and_pools["pools"])]
 
     # initialize fresh simulation instance
     def initialize(self, timesteps: int | None = None, stochasticity: float | None = None) -> None:
         # create fresh rng state
         self.init_rng = np.random.RandomState(self.seed)
+        self.noise_schedule = None
         self.rng_state_container = copy.copy(self.init_rng)
 
         if timesteps is None:
@@ -90,6 +101,15 @@ class Simulator:
 
         self.rng_state_container = copy.copy(self.init_rng)
 
+    # draw the noise for every timestep of the simulation ahead of time - these are exactly the draws run() would make
+    # after a reset(), so pre-drawing does not change the outcome of the simulation
+    def predraw_noise(self) -> None:
+        if self.init_rng is None or len(self.assets_and_pools) <= 0:
+            raise RuntimeError("You must first initialize() and init_data() before pre-drawing noise!!!")
+        rng = copy.copy(self.init_rng)
+        num_pools = len(self.assets_and_pools["pools"])
+        self.noise_schedule = rng.normal(0, self.stochasticity * 1e18, (max(self.timesteps - 1, 0), num_pools))
+
     # reset sim to initial params for rng
     def reset(self) -> None:
         if self.rng_state_container is None or self.init_rng is None:
@@ -112,13 +132,15 @@ class Simulator:
                 "You must have first init data for the simulation if you'd like to update reserves",
             )
 
+        pools = self.assets_and_pools["pools"]
+        pool_history_start = self.pool_history[0]
         for uid, alloc in allocations.items():
-            pool = self.assets_and_pools["pools"][uid]
-            pool_history_start = self.pool_history[0]
-            pool.reserve_size += int(alloc)
-            pool.reserve_size = int(pool.reserve_size)
+            pool = pools[uid]
+            pools[uid] = pool.copy(update={"reserve_size": int(pool.reserve_size + int(alloc))})
             pool_from_history = pool_history_start[uid]
-            pool_from_history.reserve_size += allocations[uid]
+            pool_history_start[uid] = pool_from_history.copy(
+                update={"reserve_size": pool_from_history.reserve_size + allocations[uid]}
+            )
 
     # initialize pools
     # Function to update borrow amounts and other pool params based on reversion rate and stochasticity
@@ -132,7 +154,12 @@ class Simulator:
         kink_slopes = np.array([pool.kink_slope for _, pool in latest_pool_data.items()])
 
         median_rate = np.median(curr_borrow_rates)  # Calculate the median borrow rate
-        noise = self.rng_state_container.normal(0, self.stochasticity * 1e18, len(curr_borrow_rates))  # Add some random noise
+        # Add some random noise - use the pre-drawn noise for this timestep if there is any
+        timestep = len(self.pool_history) - 1
+        if self.noise_schedule is not None and timestep < len(self.noise_schedule):
+            noise = self.noise_schedule[timestep]
+        else:
+            noise = self.rng_state_container.normal(0, self.stochasticity * 1e18, len(curr_borrow_rates))
         rate_changes = (-self.reversion_speed * (curr_borrow_rates - median_rate)) + noise  # Mean reversion principle
 
         new_borrow_amounts = []
@@ -158,10 +185,10 @@ class Simulator:
         amounts = np.clip(new_borrow_amounts, 0, curr_reserve_sizes)  # Ensure borrow amounts do not exceed reserves
         pool_uids = list(latest_pool_data.keys())
 
-        new_pools = [copy.deepcopy(pool) for pool in self.assets_and_pools["pools"].values()]
-
-        for idx, pool in enumerate(new_pools):
-            pool.borrow_amount = amounts[idx]
+        new_pools = [
+            pool.copy(update={"borrow_amount": amounts[idx]})
+            for idx, pool in enumerate(self.assets_and_pools["pools"].values())
+        ]
 
         return {pool_uids[uid]: pool for uid, pool in enumerate(new_pools)}
 
@@ -1,14 +1,23 @@
 # db_queries.py
 
+import base64
+import hashlib
 import json
 import sqlite3
+import zlib
+from collections.abc import Iterable, Iterator, Mapping
 from contextlib import contextmanager
 from datetime import datetime, timedelta
+from itertools import islice
+from typing import TYPE_CHECKING
 
 from fastapi.encoders import jsonable_encoder
 
 from sturdy.protocol import AllocInfo, PoolModel
 
+if TYPE_CHECKING:
+    from sturdy.validator.archive import Archive
+
 BALANCE = "balance"
 KEY = "key"
 NAME = "name"
@@ -18,6 +27,8 @@ API_KEYS_TABLE = "api_keys"
 LOGS_TABLE = "logs"
 ENDPOINT = "endpoint"
 CREATED_AT = "created_at"
+API_KEYS_VERSION_TABLE = "api_keys_version"
+VERSION = "version"
 
 # allocations table
 ALLOCATION_REQUESTS_TABLE = "allocation_requests"
@@ -26,13 +37,61 @@ REQUEST_UID = "request_uid"
 MINER_UID = "miner_uid"
 USER_ADDRESS = "user_address"
 ALLOCATION = "allocation"
+ASSETS_AND_POOLS = "assets_and_pools"
+POOL_SET_HASH = "pool_set_hash"
+ROW_ID = "row_id"
+
+# distinct assets_and_pools of allocation requests, keyed by hash
+POOL_SETS_TABLE = "pool_sets"
+HASH = "hash"
+
+# hourly totals of logs and allocations
+LOGS_HOURLY_TABLE = "logs_hourly"
+ALLOCATIONS_HOURLY_TABLE = "allocations_hourly"
+HOUR = "hour"
+NUM_REQUESTS = "num_requests"
+CREDITS_USED = "credits_used"
+LAST_REQUEST_AT = "last_request_at"
+NUM_ALLOCATIONS = "num_allocations"
+NUM_APYS = "num_apys"
+SUM_APY = "sum_apy"
+MAX_APY = "max_apy"
+FIRST_ALLOCATION_AT = "first_allocation_at"
+LAST_ALLOCATION_AT = "last_allocation_at"
+
+# number of rows fetched from the db at a time when streaming results
+STREAM_BATCH_SIZE = 500
+
+
+DB_PATH = "validator_database.db"
+# number of prepared statements each connection keeps around
+CACHED_STATEMENTS = 256
+
+
+def configure_connection(conn: sqlite3.Connection) -> None:
+    """
+    WAL lets the api server read while the validator writes, and with it synchronous=NORMAL is still safe against
+    corruption - a power loss can only roll back the last few commits. Writers wait on each other for up to
+    busy_timeout ms instead of failing straight away with "database is locked".
+    """
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA cache_size = -65536")  # 64MiB
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute("PRAGMA foreign_keys = ON")
+
+
+def connect(path: str = DB_PATH, check_same_thread: bool = True) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, cached_statements=CACHED_STATEMENTS, check_same_thread=check_same_thread)
+    configure_connection(conn)
+    return conn
 
 
 @contextmanager
-def get_db_connection():  # noqa: ANN201
-    conn = sqlite3.connect("validator_database.db")
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+def get_db_connection(path: str = DB_PATH, check_same_thread: bool = True):  # noqa: ANN201
+    conn = connect(path, check_same_thread)
     try:
         yield conn
     finally:
@@ -56,6 +115,14 @@ def get_all_logs(conn: sqlite3.Connection) -> list:
     return conn.execute(f"SELECT * FROM {LOGS_TABLE}").fetchall()
 
 
+def now() -> datetime:
+    """
+    The time rows are stamped with - every created_at in the db is naive local time, which is also how the timestamps
+    in queries (see `_filtered_query`) and rate limits are read.
+    """
+    return datetime.now()  # noqa: DTZ005
+
+
 def add_api_key(
     conn: sqlite3.Connection,
     api_key: str,
@@ -65,13 +132,15 @@ def add_api_key(
 ) -> None:
     conn.execute(
         f"INSERT INTO {API_KEYS_TABLE} VALUES (?, ?, ?, ?, ?)",
-        (api_key, name, balance, rate_limit_per_minute, datetime.now()),  # noqa: DTZ005
+        (api_key, name, balance, rate_limit_per_minute, now()),
     )
+    bump_api_keys_version(conn)
     conn.commit()
 
 
 def update_api_key_balance(conn: sqlite3.Connection, key: str, balance: float) -> None:
     conn.execute(f"UPDATE {API_KEYS_TABLE} SET {BALANCE} = ? WHERE {KEY} = ?", (balance, key))
+    bump_api_keys_version(conn)
     conn.commit()
 
 
@@ -80,19 +149,39 @@ def update_api_key_rate_limit(conn: sqlite3.Connection, key: str, rate: int) ->
         f"UPDATE {API_KEYS_TABLE} SET {RATE_LIMIT_PER_MINUTE} = ? WHERE {KEY} = ?",
         (rate, key),
     )
+    bump_api_keys_version(conn)
     conn.commit()
 
 
 def update_api_key_name(conn: sqlite3.Connection, key: str, name: str) -> None:
     conn.execute(f"UPDATE {API_KEYS_TABLE} SET {NAME} = ? WHERE {KEY} = ?", (name, key))
+    bump_api_keys_version(conn)
     conn.commit()
 
 
 def delete_api_key(conn: sqlite3.Connection, api_key: str) -> None:
     conn.execute(f"DELETE FROM {API_KEYS_TABLE} WHERE {KEY} = ?", (api_key,))
+    bump_api_keys_version(conn)
     conn.commit()
 
 
+def bump_api_keys_version(conn: sqlite3.Connection) -> None:
+    conn.execute(f"UPDATE {API_KEYS_VERSION_TABLE} SET {VERSION} = {VERSION} + 1")
+
+
+def get_api_keys_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute(f"SELECT {VERSION} FROM {API_KEYS_VERSION_TABLE}").fetchone()
+    return row[VERSION] if row else 0
+
+
+def get_request_times_since(conn: sqlite3.Connection, api_key: str, since: datetime) -> list[datetime]:
+    rows = conn.execute(
+        f"SELECT {CREATED_AT} FROM {LOGS_TABLE} WHERE {KEY} = ? AND {CREATED_AT} >= ?",
+        (api_key, since.strftime("%Y-%m-%d %H:%M:%S")),
+    ).fetchall()
+    return [datetime.fromisoformat(row[CREATED_AT]) for row in rows]
+
+
 def update_requests_and_credits(conn: sqlite3.Connection, api_key_info: dict, cost: float) -> None:
     conn.execute(
         f"UPDATE api_keys SET {BALANCE} = {BALANCE} - {cost} WHERE {KEY} = ?",
@@ -100,31 +189,121 @@ def update_requests_and_credits(conn: sqlite3.Connection, api_key_info: dict, co
     )
 
 
+def debit_api_key(conn: sqlite3.Connection, api_key: str, cost: float) -> dict | None:
+    """
+    Debits `cost` credits from a key, if its balance is more than that (or it doesn't have one), in a single statement -
+    so concurrent requests, from any process, can never spend more than the key's balance between them. Commits. Returns
+    the key's info after the debit, or None if there is no such key or it doesn't have enough credits.
+    """
+    row = conn.execute(
+        f"""
+        UPDATE {API_KEYS_TABLE} SET {BALANCE} = {BALANCE} - ?
+        WHERE {KEY} = ? AND ({BALANCE} IS NULL OR {BALANCE} > ?)
+        RETURNING *
+        """,
+        (cost, api_key, cost),
+    ).fetchone()
+    conn.commit()
+    return dict(row) if row else None
+
+
+def refund_api_key(conn: sqlite3.Connection, api_key: str, cost: float) -> None:
+    """Gives back the credits debited (see `debit_api_key`) for a request which ended up not being served. Commits."""
+    conn.execute(f"UPDATE {API_KEYS_TABLE} SET {BALANCE} = {BALANCE} + ? WHERE {KEY} = ?", (cost, api_key))
+    conn.commit()
+
+
 def log_request(conn: sqlite3.Connection, api_key_info: dict, path: str, cost: float) -> None:
     info = get_api_key_info(conn, api_key_info[KEY])
     if isinstance(info, dict):
         balance = info[BALANCE]
 
+        created_at = now()
         conn.execute(
             f"INSERT INTO {LOGS_TABLE} VALUES (?, ?, ?, ?, ?)",
-            (info[KEY], path, cost, balance, datetime.now()),  # noqa: DTZ005
+            (info[KEY], path, cost, balance, created_at),
+        )
+        _rollup_requests(conn, [(info[KEY], path, cost, created_at)])
+
+
+def log_requests(conn: sqlite3.Connection, requests: list[tuple[str, str, float, float | None, datetime]]) -> None:
+    """
+    Logs a batch of served requests, given as (key, endpoint, cost, balance, created_at) - with the key's balance after
+    its credits were debited (see `debit_api_key`). Does not commit, so that a batch can be written in a single
+    transaction.
+    """
+    logged = []
+    for key, endpoint, cost, balance, created_at in requests:
+        cur = conn.execute(
+            f"INSERT INTO {LOGS_TABLE} SELECT {KEY}, ?, ?, ?, ? FROM {API_KEYS_TABLE} WHERE {KEY} = ?",
+            (endpoint, cost, balance, created_at, key),
         )
+        # requests for keys which have been deleted since aren't logged
+        if cur.rowcount > 0:
+            logged.append((key, endpoint, cost, created_at))
+    _rollup_requests(conn, logged)
+
+
+def _hour(created_at: datetime) -> str:
+    return created_at.strftime("%Y-%m-%d %H:00:00")
+
+
+def _rollup_requests(conn: sqlite3.Connection, requests: list[tuple[str, str, float, datetime]]) -> None:
+    """Adds logged requests, given as (key, endpoint, cost, created_at), to the hourly totals. Does not commit."""
+    totals: dict[tuple[str, str, str], list] = {}
+    for key, endpoint, cost, created_at in requests:
+        total = totals.setdefault((_hour(created_at), key, endpoint), [0, 0.0, created_at])
+        total[0] += 1
+        total[1] += cost
+        total[2] = max(total[2], created_at)
+
+    conn.executemany(
+        f"""
+        INSERT INTO {LOGS_HOURLY_TABLE} VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT ({HOUR}, {KEY}, {ENDPOINT}) DO UPDATE SET
+            {NUM_REQUESTS} = {NUM_REQUESTS} + excluded.{NUM_REQUESTS},
+            {CREDITS_USED} = {CREDITS_USED} + excluded.{CREDITS_USED},
+            {LAST_REQUEST_AT} = MAX({LAST_REQUEST_AT}, excluded.{LAST_REQUEST_AT})
+        """,
+        [(*group, *total) for group, total in totals.items()],
+    )
+
+
+def _rollup_allocations(conn: sqlite3.Connection, allocations: dict[str, str], created_at: datetime) -> None:
+    """Adds the json allocations of a request, keyed by miner uid, to the hourly totals. Does not commit."""
+    rows = []
+    for miner_uid, allocation in allocations.items():
+        apy = json.loads(allocation).get("apy")
+        rows.append((_hour(created_at), miner_uid, 1, int(apy is not None), apy or 0, apy, created_at, created_at))
+
+    conn.executemany(
+        f"""
+        INSERT INTO {ALLOCATIONS_HOURLY_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT ({HOUR}, {MINER_UID}) DO UPDATE SET
+            {NUM_ALLOCATIONS} = {NUM_ALLOCATIONS} + excluded.{NUM_ALLOCATIONS},
+            {NUM_APYS} = {NUM_APYS} + excluded.{NUM_APYS},
+            {SUM_APY} = {SUM_APY} + excluded.{SUM_APY},
+            {MAX_APY} = MAX(COALESCE({MAX_APY}, excluded.{MAX_APY}), COALESCE(excluded.{MAX_APY}, {MAX_APY})),
+            {FIRST_ALLOCATION_AT} = MIN({FIRST_ALLOCATION_AT}, excluded.{FIRST_ALLOCATION_AT}),
+            {LAST_ALLOCATION_AT} = MAX({LAST_ALLOCATION_AT}, excluded.{LAST_ALLOCATION_AT})
+        """,
+        rows,
+    )
 
 
 def rate_limit_exceeded(conn: sqlite3.Connection, api_key_info: dict) -> bool:
-    one_minute_ago = datetime.now() - timedelta(minutes=1)  # noqa: DTZ005
+    one_minute_ago = now() - timedelta(minutes=1)
 
-    # Prepare a SQL statement
+    # covered by the logs (key, created_at) index
     query = f"""
-        SELECT *
-        FROM logs
+        SELECT COUNT(*)
+        FROM {LOGS_TABLE}
         WHERE {KEY} = ? AND {CREATED_AT} >= ?
     """
 
-    cur = conn.execute(query, (api_key_info[KEY], one_minute_ago.strftime("%Y-%m-%d %H:%M:%S")))
-    recent_logs = cur.fetchall()
+    (num_recent_logs,) = conn.execute(query, (api_key_info[KEY], one_minute_ago.strftime("%Y-%m-%d %H:%M:%S"))).fetchone()
 
-    return len(recent_logs) >= api_key_info[RATE_LIMIT_PER_MINUTE]
+    return num_recent_logs >= api_key_info[RATE_LIMIT_PER_MINUTE]
 
 
 def to_json_string(input_data) -> str:
@@ -153,65 +332,253 @@ def log_allocations(
     request_uid: str,
     assets_and_pools: dict[str, dict[str, PoolModel] | int],
     allocations: dict[str, AllocInfo],
+    compress: bool = False,
+) -> None:
+    insert_allocations(conn, request_uid, assets_and_pools, allocations, compress=compress)
+    conn.commit()
+
+
+def insert_allocations(
+    conn: sqlite3.Connection,
+    request_uid: str,
+    assets_and_pools: dict[str, dict[str, PoolModel] | int],
+    allocations: dict[str, AllocInfo],
+    created_at: datetime | None = None,
+    compress: bool = False,
 ) -> None:
-    ts_now = datetime.utcnow().timestamp()  # noqa: DTZ003
+    """
+    Same as `log_allocations`, but does not commit. The request's assets_and_pools are stored as a reference to a
+    (deduplicated) pool set, and with `compress` the allocations are stored zlib compressed.
+    """
+    if created_at is None:
+        created_at = now()
+    pool_set_hash = insert_pool_set(conn, jsonable_encoder(assets_and_pools), created_at)
     conn.execute(
-        f"INSERT INTO {ALLOCATION_REQUESTS_TABLE} VALUES (?, json(?), ?)",
-        (
-            request_uid,
-            json.dumps(jsonable_encoder(assets_and_pools)),
-            datetime.fromtimestamp(ts_now),  # noqa: DTZ006
-        ),
+        f"INSERT INTO {ALLOCATION_REQUESTS_TABLE} ({REQUEST_UID}, {POOL_SET_HASH}, {CREATED_AT}) VALUES (?, ?, ?)",
+        (request_uid, pool_set_hash, created_at),
     )
 
+    json_allocations = {miner_uid: to_json_string(allocation) for miner_uid, allocation in allocations.items()}
     to_insert = []
-    ts_now = datetime.utcnow().timestamp()  # noqa: DTZ003
-    for miner_uid, miner_allocation in allocations.items():
+    for miner_uid, allocation in json_allocations.items():
         row = (
             request_uid,
             miner_uid,
-            to_json_string(miner_allocation),
-            datetime.fromtimestamp(ts_now),  # noqa: DTZ006
+            zlib.compress(allocation.encode()) if compress else allocation,
+            created_at,
         )
         to_insert.append(row)
 
-    conn.executemany(f"INSERT INTO {ALLOCATIONS_TABLE} VALUES (?, ?, json(?), ?)", to_insert)
+    # compressed allocations are stored as blobs, which is how they're told apart when they're read back
+    value = "?" if compress else "json(?)"
+    conn.executemany(f"INSERT INTO {ALLOCATIONS_TABLE} VALUES (?, ?, {value}, ?)", to_insert)
+    _rollup_allocations(conn, json_allocations, created_at)
 
-    conn.commit()
 
+def pool_set_hash(assets_and_pools: dict) -> tuple[str, str]:
+    """Returns the canonical json of `assets_and_pools` - which doesn't depend on key order or whitespace - and its hash."""
+    canonical = json.dumps(assets_and_pools, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest(), canonical
 
-def get_filtered_allocations(
-    conn: sqlite3.Connection,
-    request_uid: str | None,
-    miner_uid: str | None,
+
+def insert_pool_set(conn: sqlite3.Connection, assets_and_pools: dict, created_at: datetime) -> str:
+    """Stores `assets_and_pools` unless an identical pool set is stored already. Returns its hash. Does not commit."""
+    hash_, canonical = pool_set_hash(assets_and_pools)
+    conn.execute(f"INSERT OR IGNORE INTO {POOL_SETS_TABLE} VALUES (?, ?, ?)", (hash_, canonical, created_at))
+    return hash_
+
+
+def dedupe_pool_sets(conn: sqlite3.Connection, batch_size: int = 1000) -> int:
+    """
+    Moves the assets_and_pools still stored inline in allocation requests (i.e. from before pool sets were
+    deduplicated) into the pool sets table, committing after every `batch_size` requests. Returns how many requests
+    were moved over.
+    """
+    num_moved = 0
+    while True:
+        rows = conn.execute(
+            f"""
+            SELECT {REQUEST_UID}, {ASSETS_AND_POOLS}, {CREATED_AT} FROM {ALLOCATION_REQUESTS_TABLE}
+            WHERE {POOL_SET_HASH} IS NULL AND {ASSETS_AND_POOLS} IS NOT NULL
+            LIMIT ?
+            """,
+            (batch_size,),
+        ).fetchall()
+        if not rows:
+            return num_moved
+
+        for row in rows:
+            hash_ = insert_pool_set(conn, json.loads(row[ASSETS_AND_POOLS]), row[CREATED_AT])
+            conn.execute(
+                f"UPDATE {ALLOCATION_REQUESTS_TABLE} SET {POOL_SET_HASH} = ?, {ASSETS_AND_POOLS} = NULL "
+                f"WHERE {REQUEST_UID} = ?",
+                (hash_, row[REQUEST_UID]),
+            )
+        conn.commit()
+        num_moved += len(rows)
+
+
+def encode_cursor(after: tuple[str, int]) -> str:
+    """Encodes the (created_at, rowid) key of the last row of a page into an opaque cursor for the next page."""
+    return base64.urlsafe_b64encode(json.dumps(after).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _filtered_query(
+    table: str,
+    filters: dict[str, str | None],
     from_ts: int | None,
     to_ts: int | None,
-) -> list[dict]:
+    after: tuple[str, int] | None,
+    columns: str | None = None,
+    joins: str = "",
+) -> tuple[str, list]:
+    """
+    Builds a query for the rows of `table` matching `filters`, in (created_at, rowid) order - so that results can be
+    paged through with `after`, the key of the last row of the previous page, using the created_at indexes.
+    """
     query = f"""
-    SELECT * FROM {ALLOCATIONS_TABLE}
+    SELECT {table}.rowid AS {ROW_ID}, {columns or f"{table}.*"} FROM {table}
+    {joins}
     WHERE 1=1
     """
     params = []
 
-    if request_uid:
-        query += " AND request_uid = ?"
-        params.append(request_uid)
-
-    if miner_uid:
-        query += " AND miner_uid = ?"
-        params.append(miner_uid)
+    for column, value in filters.items():
+        if value:
+            query += f" AND {table}.{column} = ?"
+            params.append(value)
 
     if from_ts:
-        query += " AND created_at >= ?"
+        query += f" AND {table}.{CREATED_AT} >= ?"
         params.append(datetime.fromtimestamp(from_ts / 1000))  # noqa: DTZ006
 
     if to_ts:
-        query += " AND created_at <= ?"
+        query += f" AND {table}.{CREATED_AT} <= ?"
         params.append(datetime.fromtimestamp(to_ts / 1000))  # noqa: DTZ006
 
+    if after is not None:
+        query += f" AND ({table}.{CREATED_AT}, {table}.rowid) > (?, ?)"
+        params.extend(after)
+
+    query += f" ORDER BY {table}.{CREATED_AT}, {table}.rowid"
+    return query, params
+
+
+def _request_info_query(
+    request_uid: str | None, from_ts: int | None, to_ts: int | None, after: tuple[str, int] | None
+) -> tuple[str, list]:
+    # requests reference their (deduplicated) pool set, unless they're from before pool sets were deduplicated
+    table = ALLOCATION_REQUESTS_TABLE
+    columns = (
+        f"{table}.{REQUEST_UID}, COALESCE({POOL_SETS_TABLE}.{ASSETS_AND_POOLS}, {table}.{ASSETS_AND_POOLS}) "
+        f"AS {ASSETS_AND_POOLS}, {table}.{CREATED_AT}"
+    )
+    joins = f"LEFT JOIN {POOL_SETS_TABLE} ON {POOL_SETS_TABLE}.{HASH} = {table}.{POOL_SET_HASH}"
+    return _filtered_query(table, {REQUEST_UID: request_uid}, from_ts, to_ts, after, columns, joins)
+
+
+def decode_row(row: Mapping) -> dict:
+    """Converts a row into a dict, decompressing its allocation if it was stored compressed."""
+    info = dict(row)
+    if isinstance(info.get(ALLOCATION), bytes):
+        info[ALLOCATION] = zlib.decompress(info[ALLOCATION]).decode()
+    return info
+
+
+def _split_row(row: Mapping) -> tuple[dict, tuple[str, int]]:
+    info = decode_row(row)
+    row_id = info.pop(ROW_ID)
+    return info, (info[CREATED_AT], row_id)
+
+
+def _fetch_page(
+    conn: sqlite3.Connection, query: str, params: list, limit: int | None, archived: Iterable[Mapping] = ()
+) -> tuple[list[dict], tuple[str, int] | None]:
+    # archived rows are all older than the ones still in the db, so they come first
+    if limit is None:
+        rows = [*archived, *conn.execute(query, params)]
+    else:
+        # fetch one more row than asked for to find out if there's another page
+        rows = list(islice(archived, limit + 1))
+        if len(rows) <= limit:
+            rows += conn.execute(query + " LIMIT ?", [*params, limit + 1 - len(rows)]).fetchall()
+
+    page = [_split_row(row) for row in rows[:limit]]
+    next_after = page[-1][1] if limit is not None and len(rows) > limit else None
+    return [info for info, _ in page], next_after
+
+
+def _iter_rows(
+    conn: sqlite3.Connection, query: str, params: list, batch_size: int, archived: Iterable[Mapping] = ()
+) -> Iterator[dict]:
+    for row in archived:
+        yield _split_row(row)[0]
+
     cur = conn.execute(query, params)
-    rows = cur.fetchall()
-    return [dict(row) for row in rows]
+    try:
+        while rows := cur.fetchmany(batch_size):
+            for row in rows:
+                yield _split_row(row)[0]
+    finally:
+        cur.close()
+
+
+def get_filtered_allocations(
+    conn: sqlite3.Connection,
+    request_uid: str | None,
+    miner_uid: str | None,
+    from_ts: int | None,
+    to_ts: int | None,
+    limit: int | None = None,
+    after: tuple[str, int] | None = None,
+    archive: "Archive | None" = None,
+) -> list[dict]:
+    return get_filtered_allocations_page(conn, request_uid, miner_uid, from_ts, to_ts, limit, after, archive)[0]
+
+
+def get_filtered_allocations_page(
+    conn: sqlite3.Connection,
+    request_uid: str | None,
+    miner_uid: str | None,
+    from_ts: int | None,
+    to_ts: int | None,
+    limit: int | None,
+    after: tuple[str, int] | None = None,
+    archive: "Archive | None" = None,
+) -> tuple[list[dict], tuple[str, int] | None]:
+    """
+    Returns up to `limit` allocations after `after`, along with the key to pass as `after` for the next page (if any).
+    Allocations which have been moved out of the db into `archive` are included too.
+    """
+    filters = {REQUEST_UID: request_uid, MINER_UID: miner_uid}
+    query, params = _filtered_query(ALLOCATIONS_TABLE, filters, from_ts, to_ts, after)
+    archived = archive.iter_rows(ALLOCATIONS_TABLE, filters, from_ts, to_ts, after) if archive else ()
+    return _fetch_page(conn, query, params, limit, archived)
+
+
+def iter_filtered_allocations(
+    conn: sqlite3.Connection,
+    request_uid: str | None,
+    miner_uid: str | None,
+    from_ts: int | None,
+    to_ts: int | None,
+    after: tuple[str, int] | None = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+    archive: "Archive | None" = None,
+) -> Iterator[dict]:
+    """Streams every matching allocation, holding at most `batch_size` rows (or one archived day) in memory at a time."""
+    filters = {REQUEST_UID: request_uid, MINER_UID: miner_uid}
+    query, params = _filtered_query(ALLOCATIONS_TABLE, filters, from_ts, to_ts, after)
+    archived = archive.iter_rows(ALLOCATIONS_TABLE, filters, from_ts, to_ts, after) if archive else ()
+    return _iter_rows(conn, query, params, batch_size, archived)
 
 
 def get_request_info(
@@ -219,25 +586,134 @@ def get_request_info(
     request_uid: str | None,
     from_ts: int | None,
     to_ts: int | None,
+    limit: int | None = None,
+    after: tuple[str, int] | None = None,
 ) -> list[dict]:
+    return get_request_info_page(conn, request_uid, from_ts, to_ts, limit, after)[0]
+
+
+def get_request_info_page(
+    conn: sqlite3.Connection,
+    request_uid: str | None,
+    from_ts: int | None,
+    to_ts: int | None,
+    limit: int | None,
+    after: tuple[str, int] | None = None,
+) -> tuple[list[dict], tuple[str, int] | None]:
+    """Returns up to `limit` requests after `after`, along with the key to pass as `after` for the next page (if any)."""
+    query, params = _request_info_query(request_uid, from_ts, to_ts, after)
+    return _fetch_page(conn, query, params, limit)
+
+
+def iter_request_info(
+    conn: sqlite3.Connection,
+    request_uid: str | None,
+    from_ts: int | None,
+    to_ts: int | None,
+    after: tuple[str, int] | None = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[dict]:
+    """Streams every matching request, holding at most `batch_size` rows in memory at a time."""
+    query, params = _request_info_query(request_uid, from_ts, to_ts, after)
+    return _iter_rows(conn, query, params, batch_size)
+
+
+# analytics
+TOTAL_REQUESTS = "total_requests"
+TOTAL_CREDITS_USED = "total_credits_used"
+NUM_KEYS = "num_keys"
+MEAN_APY = "mean_apy"
+BUCKET = "bucket"
+# strftime formats of the time buckets request rates can be grouped into
+BUCKET_FORMATS = {
+    "minute": "%Y-%m-%d %H:%M",
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+}
+
+
+def _since_clause(since: datetime | None, column: str = HOUR) -> tuple[str, list]:
+    """
+    Filters the hourly totals down to those from `since` onwards. As they're hourly, `since` is rounded down to the
+    start of its hour.
+    """
+    if since is None:
+        return "", []
+    return f"WHERE {column} >= ?", [_hour(since) if column == HOUR else since]
+
+
+def get_key_totals(conn: sqlite3.Connection, since: datetime | None = None) -> list[dict]:
+    """Number of requests, credits used and time of the last request of every api key - including unused ones."""
+    where, params = _since_clause(since)
     query = f"""
-    SELECT * FROM {ALLOCATION_REQUESTS_TABLE}
-    WHERE 1=1
+        SELECT {API_KEYS_TABLE}.{KEY}, {API_KEYS_TABLE}.{NAME}, {API_KEYS_TABLE}.{BALANCE},
+            COALESCE(totals.{TOTAL_REQUESTS}, 0) AS {TOTAL_REQUESTS},
+            COALESCE(totals.{TOTAL_CREDITS_USED}, 0) AS {TOTAL_CREDITS_USED},
+            totals.{LAST_REQUEST_AT}
+        FROM {API_KEYS_TABLE}
+        LEFT JOIN (
+            SELECT {KEY}, SUM({NUM_REQUESTS}) AS {TOTAL_REQUESTS}, SUM({CREDITS_USED}) AS {TOTAL_CREDITS_USED},
+                MAX({LAST_REQUEST_AT}) AS {LAST_REQUEST_AT}
+            FROM {LOGS_HOURLY_TABLE} {where}
+            GROUP BY {KEY}
+        ) AS totals ON totals.{KEY} = {API_KEYS_TABLE}.{KEY}
+        ORDER BY {TOTAL_REQUESTS} DESC, {API_KEYS_TABLE}.{KEY}
     """
-    params = []
+    return [dict(row) for row in conn.execute(query, params)]
 
-    if request_uid:
-        query += " AND request_uid = ?"
-        params.append(request_uid)
 
-    if from_ts:
-        query += " AND created_at >= ?"
-        params.append(datetime.fromtimestamp(from_ts / 1000))  # noqa: DTZ006
+def get_endpoint_breakdown(conn: sqlite3.Connection, since: datetime | None = None) -> list[dict]:
+    """Number of requests, credits used and api keys used per endpoint."""
+    where, params = _since_clause(since)
+    query = f"""
+        SELECT {ENDPOINT}, SUM({NUM_REQUESTS}) AS {TOTAL_REQUESTS}, SUM({CREDITS_USED}) AS {TOTAL_CREDITS_USED},
+            COUNT(DISTINCT {KEY}) AS {NUM_KEYS}
+        FROM {LOGS_HOURLY_TABLE} {where}
+        GROUP BY {ENDPOINT}
+        ORDER BY {TOTAL_REQUESTS} DESC, {ENDPOINT}
+    """
+    return [dict(row) for row in conn.execute(query, params)]
 
-    if to_ts:
-        query += " AND created_at <= ?"
-        params.append(datetime.fromtimestamp(to_ts / 1000))  # noqa: DTZ006
 
-    cur = conn.execute(query, params)
-    rows = cur.fetchall()
-    return [dict(row) for row in rows]
+def get_miner_allocation_stats(conn: sqlite3.Connection, since: datetime | None = None) -> list[dict]:
+    """Number of allocations, and the mean and max apy they were given, of every miner which returned allocations."""
+    where, params = _since_clause(since)
+    query = f"""
+        SELECT {MINER_UID}, SUM({NUM_ALLOCATIONS}) AS {NUM_ALLOCATIONS},
+            SUM({SUM_APY}) / NULLIF(SUM({NUM_APYS}), 0) AS {MEAN_APY}, MAX({MAX_APY}) AS {MAX_APY},
+            MIN({FIRST_ALLOCATION_AT}) AS {FIRST_ALLOCATION_AT}, MAX({LAST_ALLOCATION_AT}) AS {LAST_ALLOCATION_AT}
+        FROM {ALLOCATIONS_HOURLY_TABLE} {where}
+        GROUP BY {MINER_UID}
+        ORDER BY {NUM_ALLOCATIONS} DESC, CAST({MINER_UID} AS INTEGER)
+    """
+    return [dict(row) for row in conn.execute(query, params)]
+
+
+def get_request_rates(conn: sqlite3.Connection, bucket: str = "hour", since: datetime | None = None) -> list[dict]:
+    """
+    Number of requests, api keys used and credits used per `bucket` (minute, hour or day), oldest first. Hourly and
+    daily rates come from the hourly totals, but per minute rates have to be counted from the (unarchived) logs.
+    """
+    if bucket not in BUCKET_FORMATS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKET_FORMATS)}")
+    bucket_format = BUCKET_FORMATS[bucket]
+
+    if bucket == "minute":
+        where, params = _since_clause(since, CREATED_AT)
+        query = f"""
+            SELECT strftime('{bucket_format}', {CREATED_AT}) AS {BUCKET}, COUNT(*) AS {TOTAL_REQUESTS},
+                COUNT(DISTINCT {KEY}) AS {NUM_KEYS}, SUM(cost) AS {TOTAL_CREDITS_USED}
+            FROM {LOGS_TABLE} {where}
+            GROUP BY {BUCKET}
+            ORDER BY {BUCKET}
+        """
+    else:
+        where, params = _since_clause(since)
+        query = f"""
+            SELECT strftime('{bucket_format}', {HOUR}) AS {BUCKET}, SUM({NUM_REQUESTS}) AS {TOTAL_REQUESTS},
+                COUNT(DISTINCT {KEY}) AS {NUM_KEYS}, SUM({CREDITS_USED}) AS {TOTAL_CREDITS_USED}
+            FROM {LOGS_HOURLY_TABLE} {where}
+            GROUP BY {BUCKET}
+            ORDER BY {BUCKET}
+        """
+    return [dict(row) for row in conn.execute(query, params)]
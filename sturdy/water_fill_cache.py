@@ -0,0 +1,110 @@
+import math
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from sturdy.constants import WATER_FILL_CACHE_BUCKET, WATER_FILL_CACHE_MAX_SIZE
+
+
+class WaterFillCache:
+    """
+    Water filled allocations (see `water_fill`) of a miner's organic requests, so that when several validators send
+    the same pools within a block, the allocations are only worked out once.
+
+    Entries are keyed by the pools - e.g. the `PoolRegistry` keys of each, in the order they were requested in - and a
+    bucket of the total assets: total assets within a factor of `1 + bucket` of each other share an entry, with what's
+    allocated on top of the minimum allocations scaled to the total assets asked for. Entries are only used in the block
+    they were worked out in.
+
+    Thread safe - only one thread works out a given entry at a time, any others asking for it wait for that. Each
+    entry's lock is kept for as long as any thread is working it out or waiting to. At most `max_size` entries are
+    kept, the least recently used are dropped.
+    """
+
+    def __init__(
+        self,
+        get_block: Callable[[], int],
+        bucket: float = WATER_FILL_CACHE_BUCKET,
+        max_size: int = WATER_FILL_CACHE_MAX_SIZE,
+    ) -> None:
+        self.get_block = get_block
+        self.bucket = bucket
+        self.max_size = max_size
+        self.hits = 0
+        self._entries: OrderedDict[tuple, tuple[int, int, list[int]]] = OrderedDict()
+        # each entry's lock, along with how many threads are holding it or waiting for it
+        self._compute_locks: dict[tuple, tuple[threading.Lock, int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, pools_key: Hashable, minimums: list[int], total_assets: int, compute: Callable[[], list[int]]) -> list[int]:
+        """Returns the allocations of `total_assets` to the pools - from the cache where possible, else `compute()`."""
+        remaining = total_assets - sum(minimums)
+        if remaining <= 0:
+            # nothing left over after the minimum allocations to share
+            return compute()
+
+        key = (pools_key, math.floor(math.log(total_assets) / math.log1p(self.bucket)))
+        block = self.get_block()
+        with self._lock:
+            allocations = self._get_entry(key, block, minimums, total_assets)
+            if allocations is not None:
+                return allocations
+            compute_lock, users = self._compute_locks.get(key, (threading.Lock(), 0))
+            self._compute_locks[key] = (compute_lock, users + 1)
+
+        try:
+            with compute_lock:
+                with self._lock:
+                    # another thread may have worked it out while we waited
+                    allocations = self._get_entry(key, block, minimums, total_assets)
+                    if allocations is not None:
+                        return allocations
+
+                allocations = compute()
+                # nothing to scale if nothing was allocated on top of the minimum allocations
+                if sum(allocations) > sum(minimums):
+                    with self._lock:
+                        self._entries[key] = (block, total_assets, allocations)
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_size:
+                            self._entries.popitem(last=False)
+                return list(allocations)
+        finally:
+            with self._lock:
+                compute_lock, users = self._compute_locks[key]
+                if users > 1:
+                    self._compute_locks[key] = (compute_lock, users - 1)
+                else:
+                    del self._compute_locks[key]
+
+    def _get_entry(self, key: tuple, block: int, minimums: list[int], total_assets: int) -> list[int] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry_block, entry_total_assets, allocations = entry
+        if entry_block != block:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if entry_total_assets == total_assets:
+            return list(allocations)
+        return scale_allocations(allocations, minimums, total_assets)
+
+
+def scale_allocations(allocations: list[int], minimums: list[int], total_assets: int) -> list[int]:
+    """
+    Scales what's allocated on top of the minimum allocations - of which there must be some - so that the allocations add
+    up to `total_assets`.
+    """
+    extras = [allocation - minimum for allocation, minimum in zip(allocations, minimums, strict=True)]
+    allocated = sum(extras)
+    remaining = total_assets - sum(minimums)
+    scaled = [extra * remaining // allocated for extra in extras]
+    # what's left from rounding down goes to the pool which was given the most
+    scaled[scaled.index(max(scaled))] += remaining - sum(scaled)
+    return [minimum + extra for minimum, extra in zip(minimums, scaled, strict=True)]
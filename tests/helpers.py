@@ -15,11 +15,17 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import sqlite3
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from functools import partial
+from pathlib import Path
 from typing import Union
+
 from bittensor import (
+    AxonInfo,
     Balance,
     NeuronInfo,
-    AxonInfo,
     PrometheusInfo,
     # __ss58_format__,
 )
@@ -29,10 +35,11 @@ from bittensor.mock.wallet_mock import get_mock_hotkey as _get_mock_hotkey
 
 # from bittensor.mock.wallet_mock import get_mock_keypair as _get_mock_keypair
 from bittensor.mock.wallet_mock import get_mock_wallet as _get_mock_wallet
-
 from rich.console import Console
 from rich.text import Text
 
+from sturdy.validator import sql
+
 
 def __mock_wallet_factory__(*args, **kwargs) -> _MockWallet:
     """Returns a mock wallet object."""
@@ -167,3 +174,20 @@ class MockConsole:
         output_no_syntax = Text.from_ansi(Text.from_markup(text).plain).plain
 
         return output_no_syntax
+
+
+MIGRATIONS_DIR = Path(__file__).parent.parent / "db" / "migrations"
+
+
+def create_test_db(path: str) -> Callable[[], AbstractContextManager[sqlite3.Connection]]:
+    """
+    Creates a validator database at `path` by running the "up" half of every migration.
+    Returns a drop-in replacement for `sql.get_db_connection` which connects to it.
+    """
+    conn = sqlite3.connect(path)
+    for migration in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        conn.executescript(migration.read_text().split("-- migrate:down")[0])
+    conn.commit()
+    conn.close()
+
+    return partial(sql.get_db_connection, path)
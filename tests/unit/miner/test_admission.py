@@ -0,0 +1,72 @@
+import unittest
+
+from sturdy.utils.admission import AdmissionController
+
+
+class TestAdmissionController(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.controller = AdmissionController(workers=2, margin=1, clock=lambda: self.now)
+
+    def serve(self, request: str, duration: float) -> bool:
+        with self.controller.serve(request) as fast_path:
+            self.now += duration
+        return fast_path
+
+    def test_admits_everything_until_service_times_are_known(self) -> None:
+        for request in range(10):
+            self.assertTrue(self.controller.admit(request, timeout=10))
+        self.assertEqual(self.controller.stats()["queued"], 10)
+
+    def test_sheds_requests_which_cant_meet_their_deadline(self) -> None:
+        self.assertTrue(self.controller.admit("a", timeout=10))
+        self.assertFalse(self.serve("a", 5))
+
+        # 2 workers taking 5s each - with 2 requests ahead, a third would be answered in 10s, past its 10s - 1s deadline
+        for request in "bc":
+            self.assertTrue(self.controller.admit(request, timeout=10))
+        self.assertFalse(self.controller.admit("d", timeout=10))
+        # ... but not one which is waited on for longer
+        self.assertTrue(self.controller.admit("e", timeout=20))
+
+        stats = self.controller.stats()
+        self.assertEqual((stats["admitted"], stats["shed"], stats["queued"]), (4, 1, 3))
+
+    def test_fast_paths_requests_past_their_deadline(self) -> None:
+        self.controller.admit("a", timeout=10)
+        self.serve("a", 3)
+
+        self.controller.admit("b", timeout=10)
+        self.now += 7
+        # 3s to serve would finish past the deadline
+        self.assertTrue(self.serve("b", 0.001))
+        self.assertEqual(self.controller.stats()["fast_pathed"], 1)
+        # fast pathed requests don't count towards service times
+        self.assertEqual(self.controller.stats()["service_time_mean"], 3)
+
+    def test_requests_never_served_are_forgotten(self) -> None:
+        self.controller.admit("a", timeout=10)
+        self.serve("a", 3)
+        for request in "bcd":
+            self.controller.admit(request, timeout=10)
+
+        # b, c and d timed out waiting (e.g. in the axon's priority queue) and are no longer ahead of anything
+        self.now += 10
+        self.assertTrue(self.controller.admit("e", timeout=10))
+        self.now += 15
+        self.controller.admit("f", timeout=10)
+        self.assertEqual(self.controller.stats()["queued"], 2)
+
+    def test_latency_percentiles(self) -> None:
+        for request in range(100):
+            self.controller.admit(request, timeout=1000)
+            self.serve(request, request / 100)
+        stats = self.controller.stats()
+        self.assertEqual(stats["served"], 100)
+        self.assertAlmostEqual(stats["latency_p50"], 0.495)
+        self.assertAlmostEqual(stats["latency_p99"], 0.9801)
+        self.assertEqual(stats["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import bittensor as bt
+import numpy as np
+
+from sturdy.algo import get_supply_rates, optimized_algorithm, randomize_allocations, water_fill
+from sturdy.constants import MINER_SUPPLY_RATE_SAMPLES
+from sturdy.pools import (
+    AaveV3DefaultInterestRatePool,
+    BasePool,
+    check_allocations,
+    generate_assets_and_pools,
+    get_minimum_allocation,
+)
+from sturdy.protocol import REQUEST_TYPES, AllocateAssets
+
+USER_ADDRESS = "0xD8f9475A4A1A6812212FD62e80413d496038A89A"
+
+
+def total_yield(pools: list[BasePool], allocations: list[int]) -> int:
+    return sum(
+        allocation * pool.copy(update={"reserve_size": pool.reserve_size + allocation}).supply_rate
+        for pool, allocation in zip(pools, allocations, strict=True)
+    )
+
+
+class TestWaterFill(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        bt.logging.off()
+
+    def setUp(self) -> None:
+        self.assets_and_pools = generate_assets_and_pools(np.random.RandomState(69))
+        self.pools = list(self.assets_and_pools["pools"].values())
+        self.total_assets = self.assets_and_pools["total_assets"]
+        self.minimums = [int(get_minimum_allocation(pool)) for pool in self.pools]
+        self.supply_rates = get_supply_rates(self.pools, self.total_assets)
+
+    def test_allocates_all_assets(self) -> None:
+        allocations = water_fill(self.supply_rates, self.minimums, self.total_assets)
+        self.assertEqual(sum(allocations), self.total_assets)
+        for allocation, minimum in zip(allocations, self.minimums, strict=True):
+            self.assertGreaterEqual(allocation, minimum)
+        self.assertTrue(
+            check_allocations(self.assets_and_pools, dict(zip(self.assets_and_pools["pools"], allocations, strict=True)))
+        )
+
+    def test_beats_greedy_allocations(self) -> None:
+        allocations = water_fill(self.supply_rates, self.minimums, self.total_assets)
+
+        # everything left after the minimums into the pool with the best supply rate
+        best = max(range(len(self.pools)), key=lambda idx: self.pools[idx].supply_rate)
+        greedy = list(self.minimums)
+        greedy[best] += self.total_assets - sum(self.minimums)
+        self.assertGreaterEqual(total_yield(self.pools, allocations), total_yield(self.pools, greedy))
+
+        # moving a step between any two pools doesn't improve on it
+        step = (self.total_assets - sum(self.minimums)) // 100
+        best_yield = total_yield(self.pools, allocations)
+        for src in range(len(self.pools)):
+            if allocations[src] - step < self.minimums[src]:
+                continue
+            for dst in range(len(self.pools)):
+                if dst != src:
+                    moved = list(allocations)
+                    moved[src] -= step
+                    moved[dst] += step
+                    self.assertLessEqual(total_yield(self.pools, moved), best_yield)
+
+    def test_minimums_exceed_total_assets(self) -> None:
+        self.assertEqual(water_fill(self.supply_rates, self.minimums, sum(self.minimums) - 1), self.minimums)
+        self.assertEqual(water_fill([], [], self.total_assets), [])
+
+    def test_constant_supply_rates(self) -> None:
+        # equal supply rates - any split is optimal, but everything is allocated
+        supply_rates = [lambda amounts: np.full(len(amounts), 0.05e18)] * 3
+        allocations = water_fill(supply_rates, [1, 2, 3], 1000, steps=7)
+        self.assertEqual(sum(allocations), 1000)
+
+
+class TestRandomizeAllocations(unittest.TestCase):
+    def test_keeps_total_and_minimums(self) -> None:
+        minimums = [10**18, 0, 5 * 10**17]
+        allocations = [3 * 10**18, 7 * 10**18, 5 * 10**17]
+        for _ in range(20):
+            randomized = randomize_allocations(allocations, minimums)
+            self.assertEqual(sum(randomized), sum(allocations))
+            for allocation, minimum in zip(randomized, minimums, strict=True):
+                self.assertGreaterEqual(allocation, minimum)
+
+    def test_nothing_above_minimums(self) -> None:
+        self.assertEqual(randomize_allocations([1, 2], [1, 2]), [1, 2])
+        self.assertEqual(randomize_allocations([1, 3], [1, 2]), [1, 3])
+
+
+class TestOptimizedAlgorithm(unittest.TestCase):
+    def test_synthetic_request(self) -> None:
+        assets_and_pools = generate_assets_and_pools(np.random.RandomState(420))
+        synapse = AllocateAssets(request_type=REQUEST_TYPES.SYNTHETIC, assets_and_pools=assets_and_pools)
+        allocations = optimized_algorithm(SimpleNamespace(w3=None), synapse)  # type: ignore[]
+
+        self.assertEqual(list(allocations), list(assets_and_pools["pools"]))
+        self.assertTrue(check_allocations(assets_and_pools, allocations))
+
+    def test_organic_request_samples_a_few_supply_rates_per_pool(self) -> None:
+        addresses = [f"0x{idx:040x}" for idx in range(1, 4)]
+        synced_pools = {}
+        for idx, address in enumerate(addresses):
+            pool = AaveV3DefaultInterestRatePool(contract_address=address, user_address=USER_ADDRESS)
+            pool._synced_block = 100
+            # nothing borrowed, so there are no minimum allocations
+            pool._nextTotalStableDebt = pool._totalVariableDebt = pool._collateral_amount = 0
+            pool._decimals = 18
+            pool._total_supplied = (idx + 1) * 10**24
+            synced_pools[address] = pool
+        pool_registry = SimpleNamespace(get_pool=lambda _pool_type, address, _user_address: synced_pools[address])
+
+        calls = []
+        lock = threading.Lock()
+
+        def supply_rate(pool: AaveV3DefaultInterestRatePool, amount: int) -> int:
+            with lock:
+                calls.append(pool.contract_address)
+            # falls off the more is supplied, like a real pool's
+            return int(0.05e18) * pool._total_supplied // (pool._total_supplied + amount)
+
+        assets_and_pools = {
+            "total_assets": 10**24,
+            "pools": {
+                address: {"pool_model_disc": "CHAIN", "pool_type": "AAVE", "contract_address": address}
+                for address in addresses
+            },
+        }
+        synapse = AllocateAssets(
+            request_type=REQUEST_TYPES.ORGANIC, assets_and_pools=assets_and_pools, user_address=USER_ADDRESS
+        )
+        miner = SimpleNamespace(w3=None, pool_registry=pool_registry)
+        with mock.patch.object(AaveV3DefaultInterestRatePool, "supply_rate", supply_rate):
+            allocations = optimized_algorithm(miner, synapse)  # type: ignore[]
+
+        self.assertEqual(sum(allocations.values()), 10**24)
+        # the pools with more supplied are given more
+        self.assertLess(allocations[addresses[0]], allocations[addresses[2]])
+        for address in addresses:
+            self.assertLessEqual(calls.count(address), MINER_SUPPLY_RATE_SAMPLES)
+
+
+if __name__ == "__main__":
+    unittest.main()
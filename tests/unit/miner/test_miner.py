@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import bittensor as bt
+import numpy as np
+
+from neurons.miner import Miner, admission_key
+from sturdy.pools import generate_assets_and_pools
+from sturdy.protocol import REQUEST_TYPES, AllocateAssets
+from sturdy.utils.admission import AdmissionController
+
+
+class TestMinerForward(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        bt.logging.off()
+        cls.assets_and_pools = generate_assets_and_pools(np.random.RandomState(69))
+
+    def setUp(self) -> None:
+        # only what forward needs
+        self.miner = Miner.__new__(Miner)
+        self.miner.executor = ThreadPoolExecutor(max_workers=2)
+        self.miner.admission_controller = None
+        self.addCleanup(self.miner.executor.shutdown)
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = 0
+        self.gate = threading.Semaphore(0)
+        # so that the executor can shut down even if a test fails with requests still held up
+        self.addCleanup(self.gate.release, 100)
+
+    def optimized_algorithm(self, miner: Miner, synapse: AllocateAssets) -> dict:  # noqa: ARG002
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # a blocking call to the chain
+        time.sleep(0.2)
+        with self.lock:
+            self.in_flight -= 1
+        return {uid: 0 for uid in synapse.assets_and_pools["pools"]}
+
+    def gated_algorithm(self, miner: Miner, synapse: AllocateAssets) -> dict:  # noqa: ARG002
+        with self.lock:
+            self.started += 1
+        # until the test lets it finish
+        self.gate.acquire()
+        return {uid: 0 for uid in synapse.assets_and_pools["pools"]}
+
+    async def wait_for_started(self, started: int) -> None:
+        for _ in range(500):
+            if self.started >= started:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"{started} requests weren't picked up")
+
+    def synapse(self, nonce: int = 0, timeout: float = 12) -> AllocateAssets:
+        synapse = AllocateAssets(request_type=REQUEST_TYPES.SYNTHETIC, assets_and_pools=self.assets_and_pools)
+        synapse.timeout = timeout
+        synapse.dendrite.nonce = nonce  # type: ignore[]
+        synapse.allocations = {uid: 1 for uid in self.assets_and_pools["pools"]}
+        return synapse
+
+    def admit_after_a_request_taking(self, service_time: float, synapses: list[AllocateAssets]) -> None:
+        self.now = 0.0
+        self.miner.admission_controller = AdmissionController(workers=2, margin=1, clock=lambda: self.now)
+        with self.miner.admission_controller.serve("earlier request"):
+            self.now += service_time
+        for synapse in synapses:
+            self.assertTrue(self.miner.admission_controller.admit(admission_key(synapse), synapse.timeout))
+
+    async def test_requests_are_answered_concurrently(self) -> None:
+        ticks = 0
+
+        async def tick() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        with mock.patch("neurons.miner.optimized_algorithm", self.optimized_algorithm):
+            responses = await asyncio.gather(*(self.miner.forward(self.synapse()) for _ in range(4)))
+        ticker.cancel()
+
+        for response in responses:
+            self.assertEqual(response.allocations, {uid: 0 for uid in self.assets_and_pools["pools"]})
+        # in parallel, up to the number of worker threads
+        self.assertEqual(self.max_in_flight, 2)
+        # the event loop kept running while the requests were being worked on
+        self.assertGreater(ticks, 10)
+
+    async def test_failed_requests_keep_the_given_allocations(self) -> None:
+        synapse = self.synapse()
+        synapse.allocations = {uid: 1 for uid in self.assets_and_pools["pools"]}
+        with mock.patch("neurons.miner.optimized_algorithm", side_effect=RuntimeError("eth_call failed")):
+            response = await self.miner.forward(synapse)
+        self.assertEqual(response.allocations, {uid: 1 for uid in self.assets_and_pools["pools"]})
+
+    async def test_requests_past_their_deadline_are_fast_pathed(self) -> None:
+        now = 0.0
+        self.miner.admission_controller = AdmissionController(workers=2, margin=1, clock=lambda: now)
+        # a request which took 3s to work on
+        with self.miner.admission_controller.serve("earlier request"):
+            now += 3
+
+        synapse = self.synapse()
+        synapse.allocations = {uid: 1 for uid in self.assets_and_pools["pools"]}
+        self.assertTrue(self.miner.admission_controller.admit(admission_key(synapse), synapse.timeout))
+        now += synapse.timeout - 2
+        with mock.patch("neurons.miner.optimized_algorithm") as optimized_algorithm:
+            response = await self.miner.forward(synapse)
+        optimized_algorithm.assert_not_called()
+        self.assertEqual(response.allocations, {uid: 1 for uid in self.assets_and_pools["pools"]})
+        self.assertEqual(self.miner.admission_controller.stats()["fast_pathed"], 1)
+
+    async def test_requests_waiting_for_a_worker_are_queued(self) -> None:
+        synapses = [self.synapse(nonce, timeout=100) for nonce in range(4)]
+        self.admit_after_a_request_taking(3, synapses)
+
+        with mock.patch("neurons.miner.optimized_algorithm", self.gated_algorithm):
+            forwards = asyncio.gather(*(self.miner.forward(synapse) for synapse in synapses))
+            await self.wait_for_started(2)
+            stats = self.miner.admission_controller.stats()
+            self.assertEqual((stats["in_flight"], stats["queued"]), (2, 2))
+
+            # each request takes 2s once it's picked up - the time the last two waited for a worker doesn't count
+            self.now += 2
+            self.gate.release(2)
+            await self.wait_for_started(4)
+            self.now += 2
+            self.gate.release(2)
+            await asyncio.wait_for(forwards, 5)
+        self.assertAlmostEqual(self.miner.admission_controller.stats()["service_time_mean"], (3 + 2 * 4) / 5)
+
+    async def test_requests_which_waited_too_long_for_a_worker_are_fast_pathed(self) -> None:
+        synapses = [self.synapse(nonce) for nonce in range(4)]
+        self.admit_after_a_request_taking(3, synapses)
+
+        with mock.patch("neurons.miner.optimized_algorithm", self.gated_algorithm):
+            forwards = asyncio.gather(*(self.miner.forward(synapse) for synapse in synapses))
+            await self.wait_for_started(2)
+            # the first two take 9s, by when the last two - waiting for a worker - can't be answered in time
+            self.now += 9
+            self.gate.release(2)
+            responses = await asyncio.wait_for(forwards, 5)
+
+        self.assertEqual(self.started, 2)
+        self.assertEqual([response.allocations[next(iter(response.allocations))] for response in responses], [0, 0, 1, 1])
+        self.assertEqual(self.miner.admission_controller.stats()["fast_pathed"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
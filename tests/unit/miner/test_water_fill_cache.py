@@ -0,0 +1,134 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from sturdy.water_fill_cache import WaterFillCache, scale_allocations
+
+MINIMUMS = [10**18, 0, 2 * 10**18]
+TOTAL_ASSETS = 100 * 10**18
+
+
+class TestWaterFillCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.block = 0
+        self.cache = WaterFillCache(get_block=lambda: self.block, bucket=0.001, max_size=2)
+        self.computed = []
+
+    def compute(self, total_assets: int = TOTAL_ASSETS):  # noqa: ANN201
+        def compute() -> list[int]:
+            self.computed.append(total_assets)
+            extra = total_assets - sum(MINIMUMS)
+            return [MINIMUMS[0] + extra // 4, MINIMUMS[1] + extra // 2, MINIMUMS[2] + extra - extra // 4 - extra // 2]
+
+        return compute
+
+    def test_reused_within_a_block(self) -> None:
+        allocations = self.cache.get("pools", MINIMUMS, TOTAL_ASSETS, self.compute())
+        self.assertEqual(self.cache.get("pools", MINIMUMS, TOTAL_ASSETS, self.compute()), allocations)
+        self.assertEqual(self.computed, [TOTAL_ASSETS])
+        self.assertEqual(self.cache.hits, 1)
+
+        # other pools
+        self.cache.get("other pools", MINIMUMS, TOTAL_ASSETS, self.compute())
+        self.assertEqual(self.computed, [TOTAL_ASSETS, TOTAL_ASSETS])
+
+        # a new block
+        self.block += 1
+        self.cache.get("pools", MINIMUMS, TOTAL_ASSETS, self.compute())
+        self.assertEqual(len(self.computed), 3)
+
+    def test_scaled_within_a_bucket(self) -> None:
+        self.cache.get("pools", MINIMUMS, TOTAL_ASSETS, self.compute())
+
+        total_assets = TOTAL_ASSETS + TOTAL_ASSETS // 10**4
+        allocations = self.cache.get("pools", MINIMUMS, total_assets, self.compute(total_assets))
+        self.assertEqual(self.computed, [TOTAL_ASSETS])
+        self.assertEqual(sum(allocations), total_assets)
+        for allocation, expected in zip(allocations, self.compute(total_assets)(), strict=True):
+            self.assertAlmostEqual(allocation / expected, 1)
+
+        # too far off
+        total_assets = TOTAL_ASSETS * 101 // 100
+        self.cache.get("pools", MINIMUMS, total_assets, self.compute(total_assets))
+        self.assertEqual(self.computed[-1], total_assets)
+
+    def test_minimums_exceed_total_assets(self) -> None:
+        self.cache.get("pools", MINIMUMS, sum(MINIMUMS), lambda: MINIMUMS)
+        self.cache.get("pools", MINIMUMS, sum(MINIMUMS), lambda: MINIMUMS)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_max_size(self) -> None:
+        for pools in ["a", "b", "a", "c"]:
+            self.cache.get(pools, MINIMUMS, TOTAL_ASSETS, self.compute())
+        self.assertEqual(len(self.cache), 2)
+        # "b" was the least recently used
+        self.cache.get("a", MINIMUMS, TOTAL_ASSETS, self.compute())
+        self.cache.get("b", MINIMUMS, TOTAL_ASSETS, self.compute())
+        self.assertEqual(len(self.computed), 4)
+
+    def test_compute_locks_are_dropped_once_unused(self) -> None:
+        def fail() -> list[int]:
+            raise ValueError("no allocations")
+
+        self.cache.get("pools", MINIMUMS, TOTAL_ASSETS, self.compute())
+        # nothing allocated on top of the minimums, so not cached
+        self.cache.get("other pools", MINIMUMS, TOTAL_ASSETS, lambda: MINIMUMS)
+        with self.assertRaises(ValueError):  # noqa: PT027
+            self.cache.get("more pools", MINIMUMS, TOTAL_ASSETS, fail)
+        self.assertEqual((len(self.cache), len(self.cache._compute_locks)), (1, 0))
+
+    def test_concurrent_requests_for_uncached_allocations(self) -> None:
+        # nothing is allocated on top of the minimums, so every request works it out - but never two at once
+        lock = threading.Lock()
+        computing = 0
+        max_computing = 0
+
+        def compute() -> list[int]:
+            nonlocal computing, max_computing
+            with lock:
+                computing += 1
+                max_computing = max(max_computing, computing)
+            time.sleep(0.05)
+            with lock:
+                computing -= 1
+            return MINIMUMS
+
+        def get(delay: float) -> list[int]:
+            time.sleep(delay)
+            return self.cache.get("pools", MINIMUMS, TOTAL_ASSETS, compute)
+
+        # requests keep arriving while the first ones are still being worked out
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(get, [0.0, 0.01, 0.06, 0.07, 0.11, 0.12]))
+        self.assertEqual(results, [MINIMUMS] * 6)
+        self.assertEqual(max_computing, 1)
+        self.assertEqual(len(self.cache._compute_locks), 0)
+
+    def test_concurrent_requests_compute_once(self) -> None:
+        lock = threading.Lock()
+        calls = []
+        allocations = self.compute()()
+
+        def compute() -> list[int]:
+            time.sleep(0.1)
+            with lock:
+                calls.append(TOTAL_ASSETS)
+            return allocations
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: self.cache.get("pools", MINIMUMS, TOTAL_ASSETS, compute), range(4)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [allocations] * 4)
+
+
+class TestScaleAllocations(unittest.TestCase):
+    def test_keeps_minimums_and_total(self) -> None:
+        scaled = scale_allocations([5, 10, 7], [5, 3, 0], 100)
+        self.assertEqual(scaled, [5, 3 + 46, 0 + 46])
+        # what's left from rounding down goes to the pool given the most
+        self.assertEqual(scale_allocations([5, 10, 7], [5, 3, 0], 101), [5, 3 + 47, 0 + 46])
+
+
+if __name__ == "__main__":
+    unittest.main()
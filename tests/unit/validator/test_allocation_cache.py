@@ -0,0 +1,96 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from sturdy.base.validator import BaseValidatorNeuron
+from sturdy.validator.allocation_cache import AllocationCache, request_key
+
+
+class TestAllocationCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.block = 100
+        self.calls = 0
+
+    async def compute(self) -> dict:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return {"allocations": {"1": self.calls}}
+
+    async def test_request_key(self) -> None:
+        self.assertEqual(
+            request_key({"user_address": "0x1", "assets_and_pools": {"total_assets": 1, "pools": {}}}),
+            request_key({"assets_and_pools": {"pools": {}, "total_assets": 1}, "user_address": "0x1"}),
+        )
+        self.assertNotEqual(
+            request_key({"assets_and_pools": {"total_assets": 1}}), request_key({"assets_and_pools": {"total_assets": 2}})
+        )
+
+    async def test_identical_requests_share_results(self) -> None:
+        cache = AllocationCache(get_block=lambda: self.block, ttl_blocks=2)
+
+        # in flight
+        results = await asyncio.gather(*[cache.get("a", self.compute) for _ in range(5)])
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(cache.coalesced, 4)
+
+        # cached for ttl_blocks
+        self.block += 1
+        self.assertIs(await cache.get("a", self.compute), results[0])
+        self.assertEqual(cache.hits, 1)
+        await cache.get("b", self.compute)
+        self.assertEqual(self.calls, 2)
+
+        self.block += 1
+        self.assertEqual(await cache.get("a", self.compute), {"allocations": {"1": 3}})
+
+    async def test_only_in_flight_requests_share_results_without_ttl(self) -> None:
+        cache = AllocationCache(get_block=lambda: self.block, ttl_blocks=0)
+        await asyncio.gather(cache.get("a", self.compute), cache.get("a", self.compute))
+        await cache.get("a", self.compute)
+        self.assertEqual(self.calls, 2)
+
+    async def test_max_size(self) -> None:
+        cache = AllocationCache(get_block=lambda: self.block, max_size=2)
+        for key in ["a", "b", "a", "c"]:
+            await cache.get(key, self.compute)
+        # "b" was the least recently used
+        await cache.get("a", self.compute)
+        await cache.get("b", self.compute)
+        self.assertEqual(self.calls, 4)
+
+    async def test_failures_are_shared_but_not_cached(self) -> None:
+        cache = AllocationCache(get_block=lambda: self.block)
+
+        async def fail() -> None:
+            await asyncio.sleep(0.05)
+            raise RuntimeError("miners unreachable")
+
+        results = await asyncio.gather(cache.get("a", fail), cache.get("a", fail), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        await cache.get("a", self.compute)
+        self.assertEqual(self.calls, 1)
+
+    async def test_cancelled_requests_dont_cancel_others(self) -> None:
+        cache = AllocationCache(get_block=lambda: self.block)
+        first = asyncio.create_task(cache.get("a", self.compute))
+        second = asyncio.create_task(cache.get("a", self.compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, {"allocations": {"1": 1}})
+        self.assertTrue(first.cancelled())
+
+    async def test_block_is_read_from_the_scheduler(self) -> None:
+        validator = SimpleNamespace(block=100, last_block=99)
+        cache = AllocationCache(get_block=lambda: validator.last_block, ttl_blocks=1)
+        await cache.get("a", self.compute)
+
+        # the cache doesn't go to the chain, it only sees a new block once the scheduler has polled for it
+        validator.block = 101
+        self.assertEqual((await cache.get("a", self.compute))["allocations"]["1"], 1)
+        self.assertEqual(BaseValidatorNeuron.poll_block(validator), 101)  # type: ignore[]
+        self.assertEqual((await cache.get("a", self.compute))["allocations"]["1"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
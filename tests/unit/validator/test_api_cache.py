@@ -0,0 +1,167 @@
+import tempfile
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sturdy.validator import sql
+from sturdy.validator.api_cache import ApiKeyCache, SlidingWindowRateLimiter
+from tests.helpers import create_test_db
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSlidingWindowRateLimiter(unittest.TestCase):
+    def test_limits_requests_in_window(self) -> None:
+        clock = FakeClock(1000.0)
+        limiter = SlidingWindowRateLimiter(window=60, clock=clock)
+
+        for _ in range(3):
+            self.assertTrue(limiter.acquire("key", limit=3))
+            limiter.release("key", success=True)
+        self.assertFalse(limiter.acquire("key", limit=3))
+
+        # requests fall out of the window
+        clock.now += 61
+        self.assertTrue(limiter.acquire("key", limit=3))
+
+    def test_pending_and_failed_requests(self) -> None:
+        limiter = SlidingWindowRateLimiter(window=60, clock=FakeClock(1000.0))
+
+        # in flight requests count towards the limit
+        self.assertTrue(limiter.acquire("key", limit=2))
+        self.assertTrue(limiter.acquire("key", limit=2))
+        self.assertFalse(limiter.acquire("key", limit=2))
+
+        # but failed requests don't once they're done
+        limiter.release("key", success=False)
+        limiter.release("key", success=False)
+        self.assertTrue(limiter.acquire("key", limit=2))
+
+    def test_unreleased_requests_expire(self) -> None:
+        clock = FakeClock(1000.0)
+        limiter = SlidingWindowRateLimiter(window=60, clock=clock)
+        self.assertTrue(limiter.acquire("key", limit=1))
+        self.assertFalse(limiter.acquire("key", limit=1))
+
+        # e.g. the api worker serving it died before releasing it
+        clock.now += 61
+        self.assertTrue(limiter.acquire("key", limit=1))
+
+    def test_seed(self) -> None:
+        limiter = SlidingWindowRateLimiter(window=60, clock=FakeClock(1000.0))
+        limiter.seed("key", [900.0, 990.0, 995.0])
+        self.assertTrue(limiter.is_tracked("key"))
+        # the request from 900 is outside of the window
+        self.assertTrue(limiter.acquire("key", limit=3))
+        self.assertFalse(limiter.acquire("key", limit=3))
+
+
+class TestApiKeyCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        get_db_connection = create_test_db(str(Path(self.tmp_dir.name) / "validator_database.db"))
+        self.num_connections = 0
+        self.locked_connections = 0
+        self.on_connection = None
+
+        @contextmanager
+        def db_connection():  # noqa: ANN202
+            self.num_connections += 1
+            self.locked_connections += self.cache._lock.locked()
+            if self.on_connection is not None:
+                self.on_connection()
+            with get_db_connection() as conn:
+                yield conn
+
+        self.db_connection = db_connection
+        self.clock = FakeClock()
+        self.cache = ApiKeyCache(ttl=60, version_check_interval=1, db_connection=db_connection, clock=self.clock)
+        self.addCleanup(lambda: self.assertEqual(self.locked_connections, 0, "the db was read while holding the lock"))
+
+        with db_connection() as conn:
+            sql.add_api_key(conn, "key", 100, 2, "test")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_get_is_cached(self) -> None:
+        info = self.cache.get("key")
+        self.assertEqual(info[sql.BALANCE], 100)
+        self.assertEqual(info[sql.RATE_LIMIT_PER_MINUTE], 2)
+
+        num_connections = self.num_connections
+        for _ in range(100):
+            self.assertEqual(self.cache.get("key"), info)
+        self.assertEqual(self.num_connections, num_connections)
+
+        self.assertIsNone(self.cache.get("missing"))
+
+    def test_get_cached(self) -> None:
+        # nothing is returned until the key has been loaded from the db, and the version has been checked
+        self.assertIsNone(self.cache.get_cached("key"))
+        info = self.cache.get("key")
+        num_connections = self.num_connections
+        self.assertEqual(self.cache.get_cached("key"), info)
+        self.assertEqual(self.num_connections, num_connections)
+
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get_cached("key"))
+        self.assertEqual(self.cache.get("key"), info)
+        self.assertIsNone(self.cache.get_cached("missing"))
+
+    def test_not_cached_if_invalidated_while_loading(self) -> None:
+        self.cache.get("missing")
+
+        # e.g. the version changed while the key was being read
+        self.on_connection = self.cache.invalidate
+        self.assertEqual(self.cache.get("key")[sql.BALANCE], 100)
+        self.on_connection = None
+        self.assertIsNone(self.cache.get_cached("key"))
+
+    def test_invalidated_by_cli_changes(self) -> None:
+        self.assertEqual(self.cache.get("key")[sql.BALANCE], 100)
+
+        with self.db_connection() as conn:
+            sql.update_api_key_balance(conn, "key", 5)
+
+        # still cached until the version is checked again
+        self.assertEqual(self.cache.get("key")[sql.BALANCE], 100)
+        self.clock.now += 1
+        self.assertEqual(self.cache.get("key")[sql.BALANCE], 5)
+
+        with self.db_connection() as conn:
+            sql.delete_api_key(conn, "key")
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_update_balance_and_expiry(self) -> None:
+        self.cache.get("key")
+        self.cache.update_balance("key", 99)
+        self.assertEqual(self.cache.get("key")[sql.BALANCE], 99)
+
+        # balances are reloaded from the database once they expire
+        self.clock.now += 61
+        self.assertEqual(self.cache.get("key")[sql.BALANCE], 100)
+
+    def test_rate_limit_seeded_from_logs(self) -> None:
+        now = datetime.now()  # noqa: DTZ005
+        with self.db_connection() as conn:
+            conn.executemany(
+                f"INSERT INTO {sql.LOGS_TABLE} VALUES (?, ?, ?, ?, ?)",
+                [("key", "/allocate", 1, 100, now - timedelta(seconds=5)), ("key", "/allocate", 1, 99, now)],
+            )
+            conn.commit()
+
+        info = self.cache.get("key")
+        self.assertFalse(self.cache.acquire(info))
+
+
+if __name__ == "__main__":
+    unittest.main()
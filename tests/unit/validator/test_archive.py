@@ -0,0 +1,107 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+from sturdy.validator import sql
+from sturdy.validator.archive import Archive
+from tests.helpers import create_test_db
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.get_db_connection = create_test_db(str(Path(self.tmp_dir.name) / "validator_database.db"))
+        self.archive = Archive(
+            str(Path(self.tmp_dir.name) / "archive"), retention_days=7, db_connection=self.get_db_connection
+        )
+        self.now = datetime(2024, 9, 30, 12)  # noqa: DTZ001
+
+        # three allocations a day, by three miners, for the last 10 days
+        self.created_at = [self.now - timedelta(days=10) + timedelta(hours=8 * idx) for idx in range(30)]
+        allocations = {str(uid): {"apy": uid, "allocations": {"0x1": uid}} for uid in range(3)}
+        with self.get_db_connection() as conn:
+            sql.add_api_key(conn, "key", 100, 60, "test")
+            for idx, created_at in enumerate(self.created_at):
+                sql.insert_allocations(
+                    conn, f"request_{idx}", {"total_assets": 1, "pools": {}}, allocations, created_at, compress=idx % 2 == 0
+                )
+                sql.log_requests(conn, [("key", "/allocate", 1, 100 - idx, created_at)])
+            conn.commit()
+            self.all_allocations = sql.get_filtered_allocations(conn, None, None, None, None)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_archive(self) -> None:
+        num_archived = self.archive.archive(self.now)
+        # everything from before midnight 7 days ago
+        self.assertEqual(num_archived, {sql.ALLOCATIONS_TABLE: 3 * 8, sql.LOGS_TABLE: 8})
+        self.assertEqual(len(self.archive.days(sql.ALLOCATIONS_TABLE)), 3)
+
+        with self.get_db_connection() as conn:
+            self.assertEqual(len(sql.get_filtered_allocations(conn, None, None, None, None)), 3 * 22)
+            self.assertEqual(len(sql.get_all_logs(conn)), 22)
+
+            # queries reach into the archive transparently
+            allocations = sql.get_filtered_allocations(conn, None, None, None, None, archive=self.archive)
+            self.assertEqual(allocations, self.all_allocations)
+
+            from_ts = int((self.now - timedelta(days=9)).timestamp() * 1000)
+            to_ts = int((self.now - timedelta(days=5)).timestamp() * 1000)
+            allocations = sql.get_filtered_allocations(conn, None, "1", from_ts, to_ts, archive=self.archive)
+            expected = [
+                allocation
+                for allocation, created_at in zip(
+                    self.all_allocations, [c for c in self.created_at for _ in range(3)], strict=True
+                )
+                if allocation[sql.MINER_UID] == "1"
+                and self.now - timedelta(days=9) <= created_at <= self.now - timedelta(days=5)
+            ]
+            self.assertEqual(allocations, expected)
+
+            # pages run across the archive and the db
+            rows, after = [], None
+            while True:
+                page, after = sql.get_filtered_allocations_page(
+                    conn, None, None, None, None, limit=7, after=after, archive=self.archive
+                )
+                rows += page
+                if after is None:
+                    break
+            self.assertEqual(rows, self.all_allocations)
+
+            streamed = list(sql.iter_filtered_allocations(conn, None, None, None, None, archive=self.archive))
+            self.assertEqual(streamed, self.all_allocations)
+
+    def test_cutoff_is_in_the_db_clock(self) -> None:
+        with mock.patch.object(sql, "now", return_value=self.now):
+            num_archived = self.archive.archive()
+        self.assertEqual(num_archived, {sql.ALLOCATIONS_TABLE: 3 * 8, sql.LOGS_TABLE: 8})
+
+    def test_archive_is_idempotent(self) -> None:
+        self.archive.archive(self.now)
+        self.assertEqual(self.archive.archive(self.now), {sql.ALLOCATIONS_TABLE: 0, sql.LOGS_TABLE: 0})
+
+        # rows which were archived, but not deleted from the db before archiving was interrupted, aren't duplicated
+        with self.get_db_connection() as conn:
+            rows = list(self.archive.iter_rows(sql.ALLOCATIONS_TABLE, {}, None, None))
+            conn.executemany(
+                f"INSERT INTO {sql.ALLOCATIONS_TABLE} (rowid, request_uid, miner_uid, allocation, created_at) "
+                "VALUES (:row_id, :request_uid, :miner_uid, :allocation, :created_at)",
+                rows[:5],
+            )
+            conn.commit()
+        self.assertEqual(self.archive.archive(self.now)[sql.ALLOCATIONS_TABLE], 5)
+        self.assertEqual(list(self.archive.iter_rows(sql.ALLOCATIONS_TABLE, {}, None, None)), rows)
+
+        # and more can be archived as time goes on
+        self.assertEqual(self.archive.archive(self.now + timedelta(days=2))[sql.ALLOCATIONS_TABLE], 3 * 6)
+        with self.get_db_connection() as conn:
+            allocations = sql.get_filtered_allocations(conn, None, None, None, None, archive=self.archive)
+        self.assertEqual(allocations, self.all_allocations)
+
+
+if __name__ == "__main__":
+    unittest.main()
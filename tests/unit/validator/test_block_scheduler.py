@@ -0,0 +1,92 @@
+import unittest
+
+from sturdy.utils.scheduler import BlockScheduler
+
+
+class FakeChain:
+    """Returns each block in `blocks` `polls_per_block` times before moving on to the next one."""
+
+    def __init__(self, blocks, polls_per_block=3) -> None:
+        self.polls = [block for block in blocks for _ in range(polls_per_block)]
+        self.num_polls = 0
+        self.sleeps = []
+
+    def get_block(self) -> int:
+        block = self.polls[min(self.num_polls, len(self.polls) - 1)]
+        self.num_polls += 1
+        return block
+
+    def exhausted(self) -> bool:
+        return self.num_polls >= len(self.polls)
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+
+
+class TestBlockScheduler(unittest.TestCase):
+    def test_jobs_run_on_their_block_intervals(self) -> None:
+        chain = FakeChain(range(100, 111))
+        scheduler = BlockScheduler(
+            get_block=chain.get_block,
+            should_exit=chain.exhausted,
+            sleep=chain.sleep,
+        )
+
+        runs = {"every_block": [], "every_two": [], "every_five": []}
+        scheduler.add_job("every_block", 1, lambda: runs["every_block"].append(chain.polls[chain.num_polls - 1]))
+        scheduler.add_job("every_two", 2, lambda: runs["every_two"].append(chain.polls[chain.num_polls - 1]))
+        scheduler.add_job(
+            "every_five", 5, lambda: runs["every_five"].append(chain.polls[chain.num_polls - 1]), start_block=100
+        )
+
+        scheduler.run(start_block=100)
+
+        self.assertEqual(runs["every_block"], list(range(101, 111)))
+        self.assertEqual(runs["every_two"], [101, 103, 105, 107, 109])
+        self.assertEqual(runs["every_five"], [105, 110])
+
+    def test_polling_backs_off(self) -> None:
+        chain = FakeChain([1, 2], polls_per_block=6)
+        scheduler = BlockScheduler(
+            get_block=chain.get_block,
+            should_exit=chain.exhausted,
+            min_poll_interval=1.0,
+            max_poll_interval=4.0,
+            sleep=chain.sleep,
+        )
+
+        block = scheduler.wait_for_new_block(last_block=1)
+        self.assertEqual(block, 2)
+        # polls with exponential backoff while the block is unchanged - capped at max_poll_interval
+        self.assertEqual(chain.sleeps, [1.0, 2.0, 4.0, 4.0, 4.0, 4.0])
+
+    def test_failing_job_does_not_stop_others(self) -> None:
+        chain = FakeChain([1, 2, 3], polls_per_block=1)
+        scheduler = BlockScheduler(
+            get_block=chain.get_block,
+            should_exit=chain.exhausted,
+            sleep=chain.sleep,
+        )
+
+        def fail() -> None:
+            raise RuntimeError("boom")
+
+        ran = []
+        scheduler.add_job("fail", 1, fail)
+        scheduler.add_job("ok", 1, lambda: ran.append(True))
+
+        scheduler.run()
+
+        self.assertEqual(len(ran), 2)
+
+    def test_invalid_interval(self) -> None:
+        scheduler = BlockScheduler(get_block=lambda: 0, should_exit=lambda: True)
+        self.assertRaises(ValueError, scheduler.add_job, "bad", 0, lambda: None)  # noqa: PT027
+
+    def test_exit_while_waiting(self) -> None:
+        scheduler = BlockScheduler(get_block=lambda: 0, should_exit=lambda: True)
+        self.assertIsNone(scheduler.wait_for_new_block(last_block=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
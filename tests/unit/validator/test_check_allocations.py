@@ -0,0 +1,92 @@
+import unittest
+
+import bittensor as bt
+import numpy as np
+
+from sturdy.pool_index import PoolIndex
+from sturdy.pools import (
+    ALLOCATION_CHECK,
+    check_allocations,
+    check_allocations_batch,
+    generate_assets_and_pools,
+    get_minimum_allocation,
+)
+
+
+class TestCheckAllocationsBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        bt.logging.off()
+        cls.assets_and_pools = generate_assets_and_pools(np.random.RandomState(69))
+        cls.pool_index = PoolIndex(cls.assets_and_pools["pools"])
+        cls.minimums = [get_minimum_allocation(pool) for pool in cls.assets_and_pools["pools"].values()]
+
+    def valid_allocations(self) -> dict[str, int]:
+        total_assets = self.assets_and_pools["total_assets"]
+        remaining = total_assets - sum(self.minimums)
+        allocations = dict(zip(self.pool_index.uids, self.minimums, strict=True))
+        allocations[self.pool_index.uids[0]] += remaining
+        return allocations
+
+    def test_reasons(self) -> None:
+        total_assets = self.assets_and_pools["total_assets"]
+        first, second = self.pool_index.uids[:2]
+        valid = self.valid_allocations()
+        cases = {
+            ALLOCATION_CHECK.VALID: valid,
+            ALLOCATION_CHECK.NEGATIVE: {**valid, second: -1},
+            ALLOCATION_CHECK.OVER_ALLOCATED: {**valid, first: valid[first] + 1},
+            ALLOCATION_CHECK.UNDER_ALLOCATED: {**valid, first: valid[first] - total_assets // 10},
+            ALLOCATION_CHECK.BELOW_MINIMUM: {
+                **valid,
+                first: valid[first] + valid[second] - self.minimums[1] + 1,
+                second: self.minimums[1] - 1,
+            },
+        }
+        arrays = [self.pool_index.to_array(allocations) for allocations in cases.values()] + [None]
+
+        valid_mask, reasons = check_allocations_batch(self.assets_and_pools, arrays)
+        self.assertEqual(reasons.tolist(), [*cases, ALLOCATION_CHECK.MALFORMED])
+        self.assertEqual(valid_mask.tolist(), [True] + [False] * len(cases))
+
+        # the batch agrees with checking the miners one at a time
+        for allocations, is_valid in zip(cases.values(), valid_mask, strict=False):
+            self.assertEqual(check_allocations(self.assets_and_pools, allocations), is_valid)
+
+    def test_invalid_total_assets(self) -> None:
+        valid_mask, reasons = check_allocations_batch(
+            {**self.assets_and_pools, "total_assets": float(self.assets_and_pools["total_assets"])},
+            [self.pool_index.to_array(self.valid_allocations())],
+        )
+        self.assertFalse(valid_mask.any())
+        self.assertEqual(reasons.tolist(), [ALLOCATION_CHECK.INVALID_REQUEST])
+
+    def test_exact_amounts(self) -> None:
+        # one wei over is over allocated - amounts aren't rounded through floats
+        allocations = self.valid_allocations()
+        allocations[self.pool_index.uids[-1]] += 1
+        valid_mask, reasons = check_allocations_batch(self.assets_and_pools, [self.pool_index.to_array(allocations)])
+        self.assertEqual(reasons.tolist(), [ALLOCATION_CHECK.OVER_ALLOCATED])
+        self.assertFalse(check_allocations(self.assets_and_pools, allocations))
+
+    def test_float_over_allocation(self) -> None:
+        # fractions of a wei which add up to more than the total are over allocated, not rounded away
+        assets_and_pools = {**self.assets_and_pools, "total_assets": 1000}
+        allocations = np.zeros(len(self.pool_index), dtype=object)
+        allocations[:2] = [500.45, 500.45]
+        valid_mask, reasons = check_allocations_batch(assets_and_pools, [allocations])
+        self.assertFalse(valid_mask.any())
+        self.assertEqual(reasons.tolist(), [ALLOCATION_CHECK.OVER_ALLOCATED])
+
+        # and allocations given as floats never get that far
+        with self.assertRaises(ValueError):  # noqa: PT027
+            self.pool_index.to_array(dict(zip(self.pool_index.uids, allocations, strict=True)))
+
+    def test_no_miners(self) -> None:
+        valid_mask, reasons = check_allocations_batch(self.assets_and_pools, [])
+        self.assertEqual(valid_mask.shape, (0,))
+        self.assertEqual(reasons.shape, (0,))
+
+
+if __name__ == "__main__":
+    unittest.main()
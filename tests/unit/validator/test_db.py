@@ -0,0 +1,122 @@
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from sturdy.validator import sql
+from sturdy.validator.db import AsyncDatabase, ConnectionPool
+from tests.helpers import create_test_db
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp_dir.name) / "validator_database.db")
+        create_test_db(self.path)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_connections_are_reused(self) -> None:
+        pool = ConnectionPool(self.path, size=2)
+        with pool.connection() as conn:
+            first = conn
+            sql.add_api_key(conn, "key", 100, 60, "test")
+        with pool.connection() as conn:
+            self.assertIs(conn, first)
+            # and can be used from other threads
+            thread = threading.Thread(target=sql.get_api_key_info, args=(conn, "key"))
+            thread.start()
+            thread.join()
+        self.assertEqual(pool.num_idle, 1)
+
+        # extra connections are opened when every connection is in use, but only `size` are kept
+        with pool.connection(), pool.connection(), pool.connection() as conn:
+            self.assertEqual(sql.get_api_key_info(conn, "key")[sql.BALANCE], 100)
+        self.assertEqual(pool.num_idle, 2)
+
+        pool.close()
+        self.assertEqual(pool.num_idle, 0)
+
+    def test_open_connections_are_bounded(self) -> None:
+        pool = ConnectionPool(self.path, size=1, max_connections=2, timeout=5)
+        borrowed = []
+
+        def borrow() -> None:
+            with pool.connection() as conn:
+                borrowed.append(conn)
+
+        with pool.connection(), pool.connection() as second:
+            # a third caller waits for one of the two connections to be returned
+            thread = threading.Thread(target=borrow)
+            thread.start()
+            thread.join(0.1)
+            self.assertTrue(thread.is_alive())
+        thread.join(5)
+        # the one connection kept around is handed on
+        self.assertEqual(borrowed, [second])
+
+        # and gives up once it has waited for `timeout`
+        pool.timeout = 0.01
+        with pool.connection(), pool.connection():
+            self.assertRaises(sqlite3.OperationalError, pool.connection().__enter__)  # noqa: PT027
+        pool.close()
+
+    def test_uncommitted_changes_are_rolled_back(self) -> None:
+        pool = ConnectionPool(self.path, size=1)
+        with pool.connection() as conn:
+            conn.execute(f"INSERT INTO {sql.API_KEYS_TABLE} VALUES (?, ?, ?, ?, ?)", ("key", "test", 1, 1, None))
+        with pool.connection() as conn:
+            self.assertFalse(conn.in_transaction)
+            self.assertIsNone(sql.get_api_key_info(conn, "key"))
+
+
+class TestAsyncDatabase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp_dir.name) / "validator_database.db")
+        create_test_db(self.path)
+
+    async def asyncTearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    async def test_queries_run_off_the_event_loop(self) -> None:
+        db = AsyncDatabase(self.path, pool_size=2)
+
+        def add_key(conn, key: str) -> int:
+            sql.add_api_key(conn, key, 100, 60, "test")
+            return threading.get_ident()
+
+        thread_ids = await asyncio.gather(*[db.run_query(add_key, f"key_{idx}") for idx in range(10)])
+        self.assertNotIn(threading.get_ident(), thread_ids)
+        self.assertLessEqual(len(set(thread_ids)), 2)
+
+        info = await db.run_query(sql.get_api_key_info, "key_3")
+        self.assertEqual(info[sql.BALANCE], 100)
+        db.close()
+
+    async def test_pending_queries_are_bounded(self) -> None:
+        db = AsyncDatabase(self.path, pool_size=1, max_pending_queries=2)
+        release = threading.Event()
+        started = []
+
+        def block(idx: int) -> None:
+            started.append(idx)
+            release.wait()
+
+        tasks = [asyncio.create_task(db.run(block, idx)) for idx in range(5)]
+        await asyncio.sleep(0.1)
+        # only one query can run at a time, and one more is queued behind it - the rest wait on the event loop
+        self.assertEqual(started, [0])
+        self.assertEqual(db._executor._work_queue.qsize(), 1)
+
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(sorted(started), list(range(5)))
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
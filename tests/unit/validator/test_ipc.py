@@ -0,0 +1,125 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from neurons import validator
+from sturdy.validator import sql
+from sturdy.validator.api_cache import ApiKeyCache
+from sturdy.validator.db import AsyncDatabase
+from sturdy.validator.ipc import InProcessCore, IpcClient, IpcError, IpcServer
+from tests.helpers import create_test_db
+
+
+async def echo(params: dict) -> dict:
+    await asyncio.sleep(params.get("delay", 0))
+    return params
+
+
+async def fail(params: dict) -> None:  # noqa: ARG001
+    raise ValueError("no allocations")
+
+
+HANDLERS = {"echo": echo, "fail": fail}
+
+
+class TestIpc(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = str(Path(self.tmp_dir.name) / "core.sock")
+        self.server = IpcServer(self.socket_path, HANDLERS)
+        await self.server.start()
+        self.client = IpcClient(self.socket_path, timeout=5)
+
+    async def asyncTearDown(self) -> None:
+        await self.client.close()
+        await self.server.stop()
+        self.tmp_dir.cleanup()
+
+    async def test_calls(self) -> None:
+        params = {"total_assets": 10**21, "pools": {"0x1": {"borrow_amount": 10**18}}}
+        self.assertEqual(await self.client.call("echo", params), params)
+
+        # calls are handled concurrently over the one connection, and answered as they finish
+        results = await asyncio.gather(
+            self.client.call("echo", {"delay": 0.2, "idx": 0}),
+            self.client.call("echo", {"delay": 0, "idx": 1}),
+        )
+        self.assertEqual([result["idx"] for result in results], [0, 1])
+
+        with self.assertRaises(IpcError) as ctx:  # noqa: PT027
+            await self.client.call("fail")
+        self.assertIn("no allocations", str(ctx.exception))
+        with self.assertRaises(IpcError):  # noqa: PT027
+            await self.client.call("unknown")
+
+        # failed calls don't affect the connection
+        self.assertEqual(await self.client.call("echo", {"idx": 2}), {"idx": 2})
+
+    async def test_in_process_core(self) -> None:
+        core = InProcessCore(HANDLERS)
+        self.assertEqual(await core.call("echo", {"idx": 0}), {"idx": 0})
+        with self.assertRaises(IpcError):  # noqa: PT027
+            await core.call("unknown")
+
+    async def test_timeout(self) -> None:
+        self.client.timeout = 0.1
+        with self.assertRaises(TimeoutError):  # noqa: PT027
+            await self.client.call("echo", {"delay": 1})
+        # the late answer is dropped
+        await asyncio.sleep(1)
+        self.assertEqual(await self.client.call("echo", {"idx": 0}), {"idx": 0})
+
+    async def test_reconnects(self) -> None:
+        self.assertEqual(await self.client.call("echo", {"idx": 0}), {"idx": 0})
+
+        pending = asyncio.create_task(self.client.call("echo", {"delay": 1}))
+        await asyncio.sleep(0.1)
+        await self.server.stop()
+        with self.assertRaises(ConnectionError):  # noqa: PT027
+            await pending
+        with self.assertRaises(ConnectionError):  # noqa: PT027
+            await self.client.call("echo", {"idx": 1})
+
+        await self.server.start()
+        self.assertEqual(await self.client.call("echo", {"idx": 2}), {"idx": 2})
+
+
+class TestCoreRateLimits(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        db_path = str(Path(self.tmp_dir.name) / "validator_database.db")
+        with create_test_db(db_path)() as conn:
+            sql.add_api_key(conn, "key", 100, 2, "test")
+        self.db = AsyncDatabase(db_path)
+        patcher = mock.patch.multiple(validator, db=self.db, api_key_cache=ApiKeyCache(db_connection=self.db.connection))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        socket_path = str(Path(self.tmp_dir.name) / "core.sock")
+        self.server = IpcServer(socket_path, validator.CORE_HANDLERS)
+        await self.server.start()
+        self.workers = [IpcClient(socket_path, timeout=5) for _ in range(2)]
+
+    async def asyncTearDown(self) -> None:
+        for worker in self.workers:
+            await worker.close()
+        await self.server.stop()
+        self.db.close()
+        self.tmp_dir.cleanup()
+
+    async def test_rate_limit_applies_across_workers(self) -> None:
+        for worker in self.workers:
+            self.assertTrue(await worker.call("acquire_request", {"api_key": "key"}))
+        # the key's limit of 2 requests is used up between the workers
+        for worker in self.workers:
+            self.assertFalse(await worker.call("acquire_request", {"api_key": "key"}))
+
+        await self.workers[0].call("release_request", {"api_key": "key", "success": False})
+        self.assertTrue(await self.workers[1].call("acquire_request", {"api_key": "key"}))
+        self.assertFalse(await self.workers[0].call("acquire_request", {"api_key": "missing"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
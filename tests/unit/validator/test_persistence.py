@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+from sturdy.validator import sql
+from sturdy.validator.persistence import WriteBehindQueue
+from tests.helpers import create_test_db
+
+
+class TestWriteBehindQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.get_db_connection = create_test_db(str(Path(self.tmp_dir.name) / "validator_database.db"))
+        with self.get_db_connection() as conn:
+            sql.add_api_key(conn, "key", 100, 60, "test")
+
+    async def asyncTearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    async def test_requests_are_batched_and_flushed_on_stop(self) -> None:
+        write_behind = WriteBehindQueue(flush_interval=60, db_connection=self.get_db_connection)
+        for balance in range(99, 94, -1):
+            await write_behind.log_request("key", "/allocate", 1, balance)
+        allocations = {"0": {"apy": 1, "allocations": {"0x0": 1}}}
+        await write_behind.log_allocations("request", {"total_assets": 1, "pools": {}}, allocations)
+
+        # nothing is written until the queue is flushed
+        self.assertEqual(write_behind.pending, 6)
+        with self.get_db_connection() as conn:
+            self.assertEqual(sql.get_all_logs_for_key(conn, "key"), [])
+
+        await write_behind.stop()
+        self.assertEqual(write_behind.pending, 0)
+
+        with self.get_db_connection() as conn:
+            # credits are debited before requests are served, not written behind
+            self.assertEqual(sql.get_api_key_info(conn, "key")[sql.BALANCE], 100)
+            logs = [dict(log) for log in sql.get_all_logs_for_key(conn, "key")]
+            self.assertEqual([log[sql.BALANCE] for log in logs], [99, 98, 97, 96, 95])
+            self.assertEqual(len(sql.get_filtered_allocations(conn, "request", None, None, None)), 1)
+
+    async def test_requests_and_allocations_share_a_clock(self) -> None:
+        # far enough from UTC that mixing up the clocks would be caught
+        with mock.patch.dict(os.environ, {"TZ": "Pacific/Kiritimati"}):
+            time.tzset()
+            self.addCleanup(time.tzset)
+            write_behind = WriteBehindQueue(flush_interval=60, db_connection=self.get_db_connection)
+            await write_behind.log_request("key", "/allocate", 1, 99)
+            allocations = {"0": {"apy": 1, "allocations": {"0x0": 1}}}
+            await write_behind.log_allocations("request", {"total_assets": 1, "pools": {}}, allocations)
+            await write_behind.stop()
+
+        with self.get_db_connection() as conn:
+            (log,) = sql.get_all_logs_for_key(conn, "key")
+            (allocation,) = sql.get_filtered_allocations(conn, "request", None, None, None)
+        logged_at = datetime.fromisoformat(log[sql.CREATED_AT])
+        allocated_at = datetime.fromisoformat(allocation[sql.CREATED_AT])
+        self.assertLess(abs(allocated_at - logged_at), timedelta(minutes=1))
+
+    async def test_failed_batches_are_retried(self) -> None:
+        fail = True
+
+        @contextmanager
+        def flaky_db_connection():  # noqa: ANN202
+            if fail:
+                raise sqlite3.OperationalError("database is locked")
+            with self.get_db_connection() as conn:
+                yield conn
+
+        write_behind = WriteBehindQueue(flush_interval=60, max_batch_size=2, db_connection=flaky_db_connection)
+        for balance in range(99, 96, -1):
+            await write_behind.log_request("key", "/allocate", 1, balance)
+
+        self.assertFalse(await write_behind.flush())
+        self.assertEqual(write_behind.pending, 3)
+
+        fail = False
+        self.assertTrue(await write_behind.flush())
+        self.assertEqual(write_behind.pending, 1)
+        await write_behind.stop()
+
+        with self.get_db_connection() as conn:
+            self.assertEqual(len(sql.get_all_logs_for_key(conn, "key")), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
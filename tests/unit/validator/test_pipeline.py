@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from sturdy.base.validator import BaseValidatorNeuron
+from sturdy.validator.forward import query_and_score_miners
+from sturdy.validator.pipeline import RoundPipeline
+
+
+class TestRoundPipeline(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.validator = SimpleNamespace(config=SimpleNamespace(neuron=SimpleNamespace(num_concurrent_forwards=1)))
+        self.applied = []
+        self.max_in_flight_seen = 0
+        self.in_flight = 0
+        # round 0 takes the longest to query, so later rounds finish scoring before it does
+        self.query_times = iter([0.05, 0.01, 0.0, 0.02])
+
+    async def fake_query_miners(self, _validator: object) -> SimpleNamespace:
+        self.in_flight += 1
+        self.max_in_flight_seen = max(self.max_in_flight_seen, self.in_flight)
+        await asyncio.sleep(next(self.query_times))
+        self.in_flight -= 1
+        return SimpleNamespace()
+
+    @staticmethod
+    def fake_score_responses(_ctx: object, query: int) -> tuple[int, dict]:
+        return query, {}
+
+    async def fake_apply_scores(self, _validator: object, _ctx: object, rewards: int) -> None:
+        self.applied.append(rewards)
+
+    def patch_phases(self) -> tuple:
+        return (
+            mock.patch("sturdy.validator.pipeline.query_miners", self.fake_query_miners),
+            mock.patch("sturdy.validator.pipeline.score_responses", self.fake_score_responses),
+            mock.patch("sturdy.validator.pipeline.apply_scores", self.fake_apply_scores),
+        )
+
+    async def test_scores_applied_in_round_order(self) -> None:
+        pipeline = RoundPipeline(self.validator, max_in_flight_rounds=2)
+        query_patch, score_patch, apply_patch = self.patch_phases()
+        with query_patch, score_patch, apply_patch:
+            for _ in range(4):
+                await pipeline.start_round()
+            await pipeline.wait_for_all()
+
+        self.assertEqual(self.applied, [0, 1, 2, 3])
+        self.assertEqual(self.max_in_flight_seen, 2)
+        self.assertEqual(pipeline.in_flight, 0)
+        self.assertGreater(pipeline.rounds_per_hour, 0)
+
+    async def test_failed_round_does_not_block_later_rounds(self) -> None:
+        pipeline = RoundPipeline(self.validator, max_in_flight_rounds=3)
+        calls = 0
+
+        async def flaky_query_miners(_validator: object) -> SimpleNamespace:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise RuntimeError("boom")
+            return SimpleNamespace()
+
+        query_patch, score_patch, apply_patch = self.patch_phases()
+        with query_patch, score_patch, apply_patch, mock.patch("sturdy.validator.pipeline.query_miners", flaky_query_miners):
+            for _ in range(3):
+                await pipeline.start_round()
+            await pipeline.wait_for_all()
+
+        self.assertEqual(self.applied, [1, 2])
+
+    async def test_cancelled_round_does_not_block_later_rounds(self) -> None:
+        pipeline = RoundPipeline(self.validator, max_in_flight_rounds=3)
+        query_patch, score_patch, apply_patch = self.patch_phases()
+        with query_patch, score_patch, apply_patch:
+            # round 0 is still querying miners when it's cancelled, after rounds 1 and 2 are waiting for their turn
+            self.query_times = iter([1.0, 0.0, 0.0, 0.0])
+            first = await pipeline.start_round()
+            for _ in range(2):
+                await pipeline.start_round()
+            await asyncio.sleep(0.01)
+            first.cancel()
+            # round 3 starts once a slot is freed, and doesn't wait on round 0 either
+            await asyncio.wait_for(pipeline.start_round(), timeout=1)
+            await asyncio.wait_for(pipeline.wait_for_all(), timeout=1)
+
+        self.assertEqual(self.applied, [1, 2, 3])
+        self.assertEqual(pipeline.in_flight, 0)
+
+    async def test_try_start_round_does_not_wait_for_a_slot(self) -> None:
+        pipeline = RoundPipeline(self.validator, max_in_flight_rounds=1)
+        query_patch, score_patch, apply_patch = self.patch_phases()
+        with query_patch, score_patch, apply_patch:
+            self.assertIsNotNone(await pipeline.try_start_round())
+            self.assertIsNone(await pipeline.try_start_round())
+            await pipeline.wait_for_all()
+            self.assertIsNotNone(await pipeline.try_start_round())
+            await pipeline.wait_for_all()
+
+        self.assertEqual(self.applied, [0, 1])
+
+    async def test_forward_steps_never_wait_for_a_full_pipeline(self) -> None:
+        validator = SimpleNamespace(
+            config=self.validator.config, step=0, block=0, loop=asyncio.get_running_loop(), pipeline=None
+        )
+        validator.pipeline = RoundPipeline(validator, max_in_flight_rounds=1)
+        query_patch, score_patch, apply_patch = self.patch_phases()
+        with query_patch, score_patch, apply_patch:
+            self.query_times = iter([0.2, 0.0])
+            # called from the scheduler's thread - the second step returns straight away, skipping its round
+            for _ in range(2):
+                await asyncio.wait_for(asyncio.to_thread(BaseValidatorNeuron.run_forward_step, validator), timeout=0.1)
+                await asyncio.sleep(0.01)
+            self.assertEqual((validator.step, validator.pipeline.in_flight), (1, 1))
+            await validator.pipeline.wait_for_all()
+
+        self.assertEqual(self.applied, [0])
+
+    def test_invalid_max_in_flight_rounds(self) -> None:
+        self.assertRaises(ValueError, RoundPipeline, self.validator, 0)  # noqa: PT027
+
+
+class TestQueryAndScoreMiners(unittest.IsolatedAsyncioTestCase):
+    async def test_scoring_runs_off_the_event_loop(self) -> None:
+        scored_on = []
+
+        async def fake_query_miners(*_args: object) -> SimpleNamespace:
+            return SimpleNamespace()
+
+        def fake_score_responses(_ctx: object, query: int) -> tuple[int, dict]:
+            scored_on.append(threading.get_ident())
+            return query, {"0": "allocs"}
+
+        async def fake_apply_scores(*_args: object) -> None:
+            pass
+
+        with (
+            mock.patch("sturdy.validator.forward.query_miners", fake_query_miners),
+            mock.patch("sturdy.validator.forward.score_responses", fake_score_responses),
+            mock.patch("sturdy.validator.forward.apply_scores", fake_apply_scores),
+        ):
+            allocs = await query_and_score_miners(SimpleNamespace(step=3))  # type: ignore[]
+
+        self.assertEqual(allocs, {"0": "allocs"})
+        self.assertNotEqual(scored_on, [threading.get_ident()])
+
+
+if __name__ == "__main__":
+    unittest.main()
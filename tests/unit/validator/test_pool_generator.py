@@ -1,9 +1,11 @@
 import unittest
 
 import numpy as np
+from web3 import Web3
 
 from sturdy.constants import *
 from sturdy.pools import (
+    BasePool,
     BasePoolModel,
     generate_assets_and_pools,
     generate_initial_allocations_for_pools,
@@ -63,6 +65,53 @@ class TestPoolAndAllocGeneration(unittest.TestCase):
                     <= wei_mul(MAX_UTIL_RATE, POOL_RESERVE_SIZE)
                 )
 
+    def test_generate_assets_and_pools_v2(self) -> None:
+        for seed in range(20):
+            result = generate_assets_and_pools(np.random.RandomState(seed), version=2)
+
+            pools: dict[str, BasePoolModel] = result["pools"]
+            total_borrows = sum([pool.borrow_amount for pool in pools.values()])
+
+            self.assertTrue(
+                total_borrows + MIN_TOTAL_ASSETS_OFFSET <= result["total_assets"] <= total_borrows + MAX_TOTAL_ASSETS_OFFSET
+            )
+            self.assertEqual(len(pools), NUM_POOLS)
+
+            for contract_address, pool_info in pools.items():
+                # the generated pools should be valid pools
+                BasePool(**pool_info.dict())
+                self.assertEqual(contract_address, pool_info.contract_address)
+                self.assertEqual(contract_address, Web3.to_checksum_address(contract_address))
+                self.assertTrue(MIN_BASE_RATE <= pool_info.base_rate <= MAX_BASE_RATE)
+                self.assertTrue(MIN_SLOPE <= pool_info.base_slope <= MAX_SLOPE)
+                self.assertTrue(MIN_KINK_SLOPE <= pool_info.kink_slope <= MAX_KINK_SLOPE)
+                self.assertTrue(MIN_OPTIMAL_RATE <= pool_info.optimal_util_rate <= MAX_OPTIMAL_RATE)
+                self.assertEqual(pool_info.reserve_size, POOL_RESERVE_SIZE)
+                self.assertTrue(
+                    wei_mul(MIN_UTIL_RATE, POOL_RESERVE_SIZE)
+                    <= pool_info.borrow_amount
+                    <= wei_mul(MAX_UTIL_RATE, POOL_RESERVE_SIZE)
+                )
+
+    def test_generate_assets_and_pools_versions(self) -> None:
+        # each version is reproducible on its own
+        for version in (1, 2):
+            first = generate_assets_and_pools(np.random.RandomState(69), version=version)
+            second = generate_assets_and_pools(np.random.RandomState(69), version=version)
+            self.assertEqual(first, second)
+
+        # the default generator is unchanged
+        self.assertEqual(
+            generate_assets_and_pools(np.random.RandomState(69)),
+            generate_assets_and_pools(np.random.RandomState(69), version=1),
+        )
+
+        # v2 scales to many pools
+        result = generate_assets_and_pools(np.random.RandomState(69), version=2, num_pools=2000)
+        self.assertEqual(len(result["pools"]), 2000)
+
+        self.assertRaises(ValueError, generate_assets_and_pools, np.random.RandomState(69), 3)  # noqa: PT027
+
     def test_generate_initial_allocations_for_pools(self) -> None:
         # same seed on every test run
         np.random.seed(69)
@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+from sturdy.pool_index import PoolIndex
+from sturdy.validator.reward import calculate_penalty_array, get_allocation_arrays, get_similarity_array
+
+
+class TestPoolIndex(unittest.TestCase):
+    def test_to_array(self) -> None:
+        pool_index = PoolIndex(["0xb", "0xa", "0xc"])
+        self.assertEqual(len(pool_index), 3)
+
+        # pools keep the order they're given in, and pools that aren't allocated to are 0
+        array = pool_index.to_array({"0xa": int(2e21), "0xb": int(1e21)})
+        self.assertEqual(array.tolist(), [int(1e21), int(2e21), 0])
+        # amounts in wei are kept exact
+        self.assertEqual(array.dtype, object)
+        self.assertEqual(pool_index.to_dict(array), {"0xb": int(1e21), "0xa": int(2e21), "0xc": 0})
+
+        with self.assertRaises(KeyError):  # noqa: PT027
+            pool_index.to_array({"0xd": 1})
+
+        # whole amounts are fine as floats, but fractions of a wei aren't rounded away
+        self.assertEqual(pool_index.to_array({"0xa": 2.0}).tolist(), [0, 2, 0])
+        self.assertEqual(type(pool_index.to_array({"0xa": 2.0})[1]), int)
+        with self.assertRaises(ValueError):  # noqa: PT027
+            pool_index.to_array({"0xa": 2.9})
+
+    def test_get_allocation_arrays(self) -> None:
+        pool_index = PoolIndex(["0xa", "0xb"])
+        apys_and_allocations = {
+            "1": {"apy": 1, "allocations": {"0xa": 3, "0xb": 4}},
+            "2": {"apy": 0, "allocations": None},
+            "3": {"apy": 0, "allocations": {"0xd": 5}},
+            "4": {"apy": 1, "allocations": {"0xa": 3.5, "0xb": 4}},
+        }
+        arrays = get_allocation_arrays(apys_and_allocations, pool_index)
+        self.assertEqual(arrays[0].tolist(), [3, 4])
+        self.assertEqual(arrays[1:], [None, None, None])
+
+
+class TestSimilarityArrays(unittest.TestCase):
+    def test_get_similarity_array(self) -> None:
+        total_assets = 100
+        arrays = [np.array([30, 20], dtype=object), None, np.array([40, 10], dtype=object)]
+        similarities = get_similarity_array(arrays, total_assets)
+
+        distance = np.linalg.norm(np.array([30, 20]) - np.array([40, 10])) / np.sqrt(2 * total_assets**2)
+        self.assertAlmostEqual(similarities[0, 2], distance)
+        self.assertAlmostEqual(similarities[2, 0], distance)
+        # allocations aren't compared with themselves, nor with missing allocations
+        self.assertTrue(np.isinf(np.diag(similarities)).all())
+        self.assertTrue(np.isinf(similarities[1]).all())
+        self.assertTrue(np.isinf(similarities[:, 1]).all())
+
+        self.assertEqual(get_similarity_array([None, None], total_assets).shape, (2, 2))
+
+    def test_get_similarity_array_large_amounts(self) -> None:
+        # squared amounts in wei don't fit into 64 bits
+        arrays = [np.array([int(9e20), int(1e20)], dtype=object), np.array([int(1e20), int(9e20)], dtype=object)]
+        similarities = get_similarity_array(arrays, int(1e21))
+        self.assertAlmostEqual(similarities[0, 1], 0.8)
+
+    def test_calculate_penalty_array(self) -> None:
+        similarities = np.array(
+            [
+                [np.inf, 0.05, 0.2],
+                [0.05, np.inf, 0.1],
+                [0.2, 0.1, np.inf],
+            ]
+        )
+        axon_times = np.array([1.0, 2.0, 3.0])
+        self.assertEqual(calculate_penalty_array(similarities, axon_times, 0.1).tolist(), [0, 1, 1])
+        self.assertEqual(calculate_penalty_array(similarities, np.ones(3), 0.1).tolist(), [1, 2, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import copy
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from web3.constants import ADDRESS_ZERO
+
+from sturdy.pool_registry import PoolRegistry
+from sturdy.pools import POOL_TYPES, AaveV3DefaultInterestRatePool, DaiSavingsRate, sync_pool
+
+ATOKEN_ADDRESS = "0x4d5F47FA6A74757f35C14fD3a6Ef8E3C9BC514E8"
+SDAI_ADDRESS = "0x83F20F44975D03b1b09e64809B757c47f942BEeA"
+USER_ADDRESS = "0xD8f9475A4A1A6812212FD62e80413d496038A89A"
+
+
+class TestPoolRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.block = 100
+        self.w3 = object()
+        self.syncs = []
+        self.lock = threading.Lock()
+
+        def fake_sync_pool(pool, web3_provider) -> None:
+            self.assertIs(web3_provider, self.w3)
+            with self.lock:
+                self.syncs.append((pool.contract_address, pool._initted))
+            pool._initted = True
+
+        self.sync_patch = mock.patch("sturdy.pool_registry.sync_pool", fake_sync_pool)
+        self.sync_patch.start()
+        self.registry = PoolRegistry(self.w3, get_block=lambda: self.block, max_size=2)  # type: ignore[]
+
+    def tearDown(self) -> None:
+        self.sync_patch.stop()
+
+    def test_pools_are_reused(self) -> None:
+        pool = self.registry.get_pool(POOL_TYPES.AAVE, ATOKEN_ADDRESS, USER_ADDRESS)
+        self.assertIsInstance(pool, AaveV3DefaultInterestRatePool)
+        self.assertEqual(pool.synced_block, 100)
+        # addresses and pool types are normalized
+        self.assertIs(self.registry.get_pool("AAVE", ATOKEN_ADDRESS.lower(), USER_ADDRESS.lower()), pool)
+        self.assertEqual(self.syncs, [(ATOKEN_ADDRESS, False)])
+
+        # other users get their own pools
+        self.assertIsNot(self.registry.get_pool(POOL_TYPES.AAVE, ATOKEN_ADDRESS, ADDRESS_ZERO), pool)
+        self.assertEqual(len(self.registry), 2)
+
+    def test_pools_are_resynced_every_block(self) -> None:
+        pool = self.registry.get_pool(POOL_TYPES.DAI_SAVINGS, SDAI_ADDRESS, USER_ADDRESS)
+        self.block += 1
+        synced_pool = self.registry.get_pool(POOL_TYPES.DAI_SAVINGS, SDAI_ADDRESS, USER_ADDRESS)
+
+        # the pool isn't initialized again, and the old one is left as it was
+        self.assertIsNot(synced_pool, pool)
+        self.assertEqual(self.syncs, [(SDAI_ADDRESS, False), (SDAI_ADDRESS, True)])
+        self.assertEqual(pool.synced_block, 100)
+        self.assertEqual(synced_pool.synced_block, 101)
+
+    def test_snapshots_are_cached_separately(self) -> None:
+        pool = self.registry.get_pool(POOL_TYPES.AAVE, ATOKEN_ADDRESS, USER_ADDRESS)
+        pool._atoken_contract = SimpleNamespace(address=ATOKEN_ADDRESS)
+        pool._underlying_asset_address = ADDRESS_ZERO
+        self.block += 1
+        synced_pool = self.registry.get_pool(POOL_TYPES.AAVE, ATOKEN_ADDRESS, USER_ADDRESS)
+
+        # supply rates are cached by pool, so the snapshots of different blocks mustn't be equal
+        self.assertNotEqual(synced_pool, pool)
+        self.assertNotIn(synced_pool, {pool})
+        self.assertEqual(synced_pool, synced_pool.snapshot())
+
+    def test_concurrent_requests_sync_once(self) -> None:
+        pools = []
+        threads = [
+            threading.Thread(
+                target=lambda: pools.append(self.registry.get_pool(POOL_TYPES.AAVE, ATOKEN_ADDRESS, USER_ADDRESS))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.syncs), 1)
+        self.assertTrue(all(pool is pools[0] for pool in pools))
+
+    def test_least_recently_used_pools_are_dropped(self) -> None:
+        aave_pool = self.registry.get_pool(POOL_TYPES.AAVE, ATOKEN_ADDRESS, USER_ADDRESS)
+        self.registry.get_pool(POOL_TYPES.DAI_SAVINGS, SDAI_ADDRESS, USER_ADDRESS)
+        self.registry.get_pool(POOL_TYPES.AAVE, ATOKEN_ADDRESS, USER_ADDRESS)
+        self.registry.get_pool(POOL_TYPES.AAVE, ATOKEN_ADDRESS, ADDRESS_ZERO)
+        self.assertEqual(len(self.registry), 2)
+
+        self.assertIs(self.registry.get_pool(POOL_TYPES.AAVE, ATOKEN_ADDRESS, USER_ADDRESS), aave_pool)
+        self.registry.get_pool(POOL_TYPES.DAI_SAVINGS, SDAI_ADDRESS, USER_ADDRESS)
+        self.assertEqual(len(self.syncs), 4)
+
+
+class TestChainPools(unittest.TestCase):
+    def test_sync_pool(self) -> None:
+        w3 = object()
+        aave_pool = AaveV3DefaultInterestRatePool(contract_address=ATOKEN_ADDRESS, user_address=USER_ADDRESS)
+        with mock.patch.object(AaveV3DefaultInterestRatePool, "sync") as aave_sync:
+            sync_pool(aave_pool, w3)  # type: ignore[]
+            sync_pool(aave_pool, w3, ADDRESS_ZERO)  # type: ignore[]
+        self.assertEqual(aave_sync.call_args_list, [mock.call(USER_ADDRESS, w3), mock.call(ADDRESS_ZERO, w3)])
+
+        dai_pool = DaiSavingsRate(contract_address=SDAI_ADDRESS)
+        with mock.patch.object(DaiSavingsRate, "sync") as dai_sync:
+            sync_pool(dai_pool, w3, USER_ADDRESS)  # type: ignore[]
+        dai_sync.assert_called_once_with(w3)
+
+    def test_snapshot_shares_chain_state(self) -> None:
+        pool = DaiSavingsRate(contract_address=SDAI_ADDRESS)
+        contract = object()
+        pool._sdai_contract = contract
+        pool._initted = True
+
+        snapshot = pool.snapshot()
+        self.assertIsNot(snapshot, pool)
+        self.assertIs(snapshot._sdai_contract, contract)
+        self.assertTrue(snapshot._initted)
+
+        # deep copies are still deep
+        self.assertIsNot(copy.deepcopy(pool)._sdai_contract, contract)
+
+
+if __name__ == "__main__":
+    unittest.main()
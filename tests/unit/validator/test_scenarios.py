@@ -0,0 +1,44 @@
+import unittest
+
+from sturdy.constants import NUM_POOLS
+from sturdy.validator.scenarios import ScenarioPrefetcher
+
+
+class TestScenarioPrefetcher(unittest.TestCase):
+    def test_scenarios_are_ready(self) -> None:
+        prefetcher = ScenarioPrefetcher(num_scenarios=2, seed=69)
+        try:
+            simulator = prefetcher.get()
+        finally:
+            prefetcher.stop()
+
+        self.assertEqual(len(simulator.assets_and_pools["pools"]), NUM_POOLS)
+        self.assertEqual(len(simulator.allocations), NUM_POOLS)
+        self.assertEqual(len(simulator.pool_history), 1)
+        self.assertIsNotNone(simulator.noise_schedule)
+        self.assertEqual(simulator.noise_schedule.shape, (simulator.timesteps - 1, NUM_POOLS))
+
+    def test_seed_sequence_is_reproducible(self) -> None:
+        prefetchers = [ScenarioPrefetcher(num_scenarios=2, seed=69) for _ in range(2)]
+        try:
+            scenarios = [[prefetcher.get() for _ in range(3)] for prefetcher in prefetchers]
+        finally:
+            for prefetcher in prefetchers:
+                prefetcher.stop()
+
+        for first, second in zip(*scenarios, strict=True):
+            self.assertEqual(first.seed, second.seed)
+            self.assertEqual(first.assets_and_pools, second.assets_and_pools)
+            self.assertEqual(first.timesteps, second.timesteps)
+            self.assertTrue((first.noise_schedule == second.noise_schedule).all())
+
+        # consecutive scenarios differ from one another
+        self.assertNotEqual(scenarios[0][0].seed, scenarios[0][1].seed)
+        self.assertNotEqual(scenarios[0][0].assets_and_pools, scenarios[0][1].assets_and_pools)
+
+    def test_invalid_num_scenarios(self) -> None:
+        self.assertRaises(ValueError, ScenarioPrefetcher, 0)  # noqa: PT027
+
+
+if __name__ == "__main__":
+    unittest.main()
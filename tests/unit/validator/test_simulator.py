@@ -182,6 +182,70 @@ class TestSimulator(unittest.TestCase):
         # should raise error
         self.assertRaises(RuntimeError, self.simulator.reset)
 
+    def test_clone(self) -> None:
+        simulator = Simulator(reversion_speed=0.05, seed=69)
+        simulator.initialize()
+        simulator.init_data()
+
+        clone = simulator.clone()
+        self.assertIsNot(clone, simulator)
+        self.assertEqual(clone.reversion_speed, simulator.reversion_speed)
+        self.assertEqual(clone.seed, simulator.seed)
+        # a clone starts uninitialized and does not share any state with the original
+        self.assertEqual(clone.assets_and_pools, {})
+        self.assertEqual(clone.pool_history, [])
+        self.assertRaises(RuntimeError, clone.init_data)  # noqa: PT027
+
+        # same seed -> same simulation
+        clone.initialize()
+        clone.init_data()
+        self.assertEqual(clone.assets_and_pools, simulator.assets_and_pools)
+        self.assertIsNot(clone.assets_and_pools, simulator.assets_and_pools)
+
+    def test_given_pools_are_not_changed(self) -> None:
+        simulator = Simulator(reversion_speed=0.05, seed=69)
+        simulator.initialize()
+        simulator.init_data()
+        init_assets_and_pools = simulator.assets_and_pools
+        expected_pools = copy.deepcopy(init_assets_and_pools["pools"])
+
+        # simulations share the given pools rather than deepcopying them - so they must leave them as they were
+        for _ in range(2):
+            simulator.reset()
+            simulator.init_data(init_assets_and_pools=init_assets_and_pools)
+            simulator.update_reserves_with_allocs()
+            simulator.run()
+            self.assertEqual(init_assets_and_pools["pools"], expected_pools)
+            self.assertNotEqual(simulator.assets_and_pools["pools"], expected_pools)
+            self.assertNotEqual(simulator.pool_history[-1], simulator.pool_history[0])
+
+    def test_predraw_noise(self) -> None:
+        simulator = Simulator(reversion_speed=0.05, seed=69)
+        simulator.initialize()
+        simulator.init_data()
+        init_assets_and_pools = copy.deepcopy(simulator.assets_and_pools)
+        init_allocations = copy.deepcopy(simulator.allocations)
+
+        predrawn = simulator.clone()
+        predrawn.initialize()
+        predrawn.init_data()
+        predrawn.predraw_noise()
+        self.assertEqual(predrawn.noise_schedule.shape, (predrawn.timesteps - 1, NUM_POOLS))
+
+        # pre-drawing the noise should not change the outcome of the simulation as it is run when scoring miners
+        for sim in (simulator, predrawn):
+            sim.reset()
+            sim.init_data(copy.deepcopy(init_assets_and_pools), copy.deepcopy(init_allocations))
+            sim.run()
+
+        self.assertEqual(len(simulator.pool_history), len(predrawn.pool_history))
+        for expected, actual in zip(simulator.pool_history, predrawn.pool_history, strict=True):
+            self.assertEqual(expected, actual)
+
+        # re-initializing drops the pre-drawn noise
+        predrawn.initialize()
+        self.assertIsNone(predrawn.noise_schedule)
+
     def test_sim_run(self):
         self.simulator.initialize(timesteps=50)
         self.simulator.init_data()
@@ -0,0 +1,221 @@
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sturdy.validator import sql
+from tests.helpers import MIGRATIONS_DIR, create_test_db
+
+
+class TestSql(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.get_db_connection = create_test_db(str(Path(self.tmp_dir.name) / "validator_database.db"))
+        with self.get_db_connection() as conn:
+            sql.add_api_key(conn, "key", 100, 3, "test")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_connection_pragmas(self) -> None:
+        with self.get_db_connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+            self.assertEqual(conn.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+            self.assertGreater(conn.execute("PRAGMA busy_timeout").fetchone()[0], 0)
+
+    def test_rate_limit_exceeded(self) -> None:
+        now = datetime.now()  # noqa: DTZ005
+        with self.get_db_connection() as conn:
+            info = sql.get_api_key_info(conn, "key")
+            logs = [("key", "/allocate", 1, 100, now - timedelta(minutes=5))]
+            logs += [("key", "/allocate", 1, 100, now) for _ in range(2)]
+            conn.executemany(f"INSERT INTO {sql.LOGS_TABLE} VALUES (?, ?, ?, ?, ?)", logs)
+            self.assertFalse(sql.rate_limit_exceeded(conn, info))
+
+            conn.execute(f"INSERT INTO {sql.LOGS_TABLE} VALUES (?, ?, ?, ?, ?)", ("key", "/allocate", 1, 100, now))
+            self.assertTrue(sql.rate_limit_exceeded(conn, info))
+
+    def test_debit_api_key(self) -> None:
+        with self.get_db_connection() as conn:
+            sql.update_api_key_balance(conn, "key", 3)
+            self.assertEqual(sql.debit_api_key(conn, "key", 1)[sql.BALANCE], 2)
+            # a key's balance has to be more than the cost, like it's checked before a request is served
+            self.assertIsNone(sql.debit_api_key(conn, "key", 2))
+            self.assertIsNone(sql.debit_api_key(conn, "missing", 1))
+
+            sql.refund_api_key(conn, "key", 1)
+            self.assertEqual(sql.get_api_key_info(conn, "key")[sql.BALANCE], 3)
+
+            # keys without a balance are never out of credits
+            sql.update_api_key_balance(conn, "key", None)
+            self.assertIsNone(sql.debit_api_key(conn, "key", 1000)[sql.BALANCE])
+
+        # debits are committed straight away
+        with self.get_db_connection() as conn:
+            self.assertIsNone(sql.get_api_key_info(conn, "key")[sql.BALANCE])
+
+    def test_queries_use_indexes(self) -> None:
+        queries = [
+            (f"SELECT COUNT(*) FROM {sql.LOGS_TABLE} WHERE key = ? AND created_at >= ?", ("key", "")),
+            (f"SELECT * FROM {sql.ALLOCATIONS_TABLE} WHERE miner_uid = ? AND created_at >= ?", ("0", "")),
+            (f"SELECT * FROM {sql.ALLOCATIONS_TABLE} WHERE created_at >= ?", ("",)),
+            (f"SELECT * FROM {sql.ALLOCATION_REQUESTS_TABLE} WHERE created_at >= ?", ("",)),
+        ]
+        with self.get_db_connection() as conn:
+            for query, params in queries:
+                plan = " ".join(row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+                self.assertIn("USING", plan, query)
+                self.assertNotIn("SCAN", plan, query)
+
+    def test_paginate_allocations(self) -> None:
+        now = datetime.now()  # noqa: DTZ005
+        with self.get_db_connection() as conn:
+            # rows with the same created_at are still paged through in a stable order
+            requests = [(f"request_{idx}", "{}", now) for idx in range(3)]
+            conn.executemany(f"INSERT INTO {sql.ALLOCATION_REQUESTS_TABLE} VALUES (?, ?, ?, NULL)", requests)
+            allocations = [(f"request_{idx // 3}", str(idx % 3), "{}", now + timedelta(seconds=idx // 2)) for idx in range(9)]
+            conn.executemany(f"INSERT INTO {sql.ALLOCATIONS_TABLE} VALUES (?, ?, ?, ?)", allocations)
+
+            rows, after = [], None
+            while True:
+                page, after = sql.get_filtered_allocations_page(conn, None, None, None, None, limit=4, after=after)
+                self.assertLessEqual(len(page), 4)
+                rows += page
+                if after is None:
+                    break
+                after = sql.decode_cursor(sql.encode_cursor(after))
+
+            self.assertEqual([(row[sql.REQUEST_UID], row[sql.MINER_UID]) for row in rows], [a[:2] for a in allocations])
+            self.assertNotIn(sql.ROW_ID, rows[0])
+
+            streamed = list(sql.iter_filtered_allocations(conn, None, "1", None, None, batch_size=2))
+            self.assertEqual(streamed, [row for row in rows if row[sql.MINER_UID] == "1"])
+
+            page, after = sql.get_request_info_page(conn, None, None, None, limit=2)
+            self.assertEqual([row[sql.REQUEST_UID] for row in page], ["request_0", "request_1"])
+            page, after = sql.get_request_info_page(conn, None, None, None, limit=2, after=after)
+            self.assertEqual([row[sql.REQUEST_UID] for row in page], ["request_2"])
+            self.assertIsNone(after)
+
+            # an exact last page has no next page
+            page, after = sql.get_filtered_allocations_page(conn, "request_0", None, None, None, limit=3)
+            self.assertEqual(len(page), 3)
+            self.assertIsNone(after)
+
+    def test_invalid_cursor(self) -> None:
+        for cursor in ["garbage", sql.encode_cursor(("now", 1))[:-2], "WzFd"]:
+            self.assertRaises(ValueError, sql.decode_cursor, cursor)  # noqa: PT027
+
+    def test_pool_sets_are_deduplicated(self) -> None:
+        assets_and_pools = {"total_assets": 1, "pools": {"0x1": {"base_rate": 1}, "0x2": {"base_rate": 2}}}
+        reordered = {"pools": {"0x2": {"base_rate": 2}, "0x1": {"base_rate": 1}}, "total_assets": 1}
+        allocations = {"0": {"apy": 1, "allocations": {"0x1": 1, "0x2": 0}}}
+        with self.get_db_connection() as conn:
+            sql.log_allocations(conn, "request_0", assets_and_pools, allocations)
+            sql.log_allocations(conn, "request_1", reordered, allocations, compress=True)
+            sql.log_allocations(conn, "request_2", {"total_assets": 2, "pools": {}}, allocations)
+
+            self.assertEqual(conn.execute(f"SELECT COUNT(*) FROM {sql.POOL_SETS_TABLE}").fetchone()[0], 2)
+            compressed = conn.execute(f"SELECT {sql.ALLOCATION} FROM {sql.ALLOCATIONS_TABLE} WHERE request_uid = 'request_1'")
+            self.assertIsInstance(compressed.fetchone()[0], bytes)
+
+            # both are reassembled transparently
+            info = sql.get_request_info(conn, None, None, None)
+            self.assertEqual([json.loads(row[sql.ASSETS_AND_POOLS]) for row in info[:2]], [assets_and_pools] * 2)
+            rows = sql.get_filtered_allocations(conn, None, None, None, None)
+            self.assertEqual([json.loads(row[sql.ALLOCATION]) for row in rows], [allocations["0"]] * 3)
+            streamed = list(sql.iter_filtered_allocations(conn, "request_1", None, None, None))
+            self.assertEqual(streamed, rows[1:2])
+
+    def test_dedupe_pool_sets(self) -> None:
+        now = datetime.now()  # noqa: DTZ005
+        with self.get_db_connection() as conn:
+            # requests logged before pool sets were deduplicated
+            requests = [(f"request_{idx}", f'{{"total_assets": {idx % 2}, "pools": {{}}}}', now) for idx in range(5)]
+            conn.executemany(f"INSERT INTO {sql.ALLOCATION_REQUESTS_TABLE} VALUES (?, ?, ?, NULL)", requests)
+            sql.log_allocations(conn, "request_5", {"total_assets": 1, "pools": {}}, {})
+            before = sql.get_request_info(conn, None, None, None)
+
+            self.assertEqual(sql.dedupe_pool_sets(conn, batch_size=2), 5)
+            self.assertEqual(sql.dedupe_pool_sets(conn), 0)
+
+            self.assertEqual(conn.execute(f"SELECT COUNT(*) FROM {sql.POOL_SETS_TABLE}").fetchone()[0], 2)
+            inline = conn.execute(f"SELECT COUNT(*) FROM {sql.ALLOCATION_REQUESTS_TABLE} WHERE assets_and_pools IS NOT NULL")
+            self.assertEqual(inline.fetchone()[0], 0)
+            after = sql.get_request_info(conn, None, None, None)
+            self.assertEqual(
+                [json.loads(row[sql.ASSETS_AND_POOLS]) for row in after],
+                [json.loads(row[sql.ASSETS_AND_POOLS]) for row in before],
+            )
+
+    def test_analytics(self) -> None:
+        start = datetime(2024, 9, 1, 12, 30)  # noqa: DTZ001
+        with self.get_db_connection() as conn:
+            sql.add_api_key(conn, "unused", 100, 3, "test")
+            requests = [("key", "/allocate", 1, 99 - idx, start + timedelta(minutes=20 * idx)) for idx in range(6)]
+            requests += [("key", "/request_info", 0.5, 93.5, start), ("missing", "/allocate", 1, None, start)]
+            sql.log_requests(conn, requests)
+            sql.log_allocations(
+                conn, "request_0", {}, {"0": {"apy": 10, "allocations": {}}, "1": {"apy": 20, "allocations": {}}}
+            )
+            sql.log_allocations(conn, "request_1", {}, {"0": {"apy": 30, "allocations": {}}}, compress=True)
+            conn.commit()
+
+            key_totals = sql.get_key_totals(conn)
+            self.assertEqual([row[sql.KEY] for row in key_totals], ["key", "unused"])
+            self.assertEqual(key_totals[0][sql.TOTAL_REQUESTS], 7)
+            self.assertEqual(key_totals[0][sql.TOTAL_CREDITS_USED], 6.5)
+            self.assertEqual(key_totals[0][sql.LAST_REQUEST_AT], str(start + timedelta(minutes=100)))
+            self.assertEqual(key_totals[1][sql.TOTAL_REQUESTS], 0)
+            # hourly totals are counted from the start of the hour
+            self.assertEqual(sql.get_key_totals(conn, start + timedelta(minutes=40))[0][sql.TOTAL_REQUESTS], 4)
+
+            endpoints = sql.get_endpoint_breakdown(conn)
+            self.assertEqual(
+                [(row[sql.ENDPOINT], row[sql.TOTAL_REQUESTS]) for row in endpoints], [("/allocate", 6), ("/request_info", 1)]
+            )
+
+            rates = sql.get_request_rates(conn, "hour")
+            self.assertEqual(
+                [(row[sql.BUCKET], row[sql.TOTAL_REQUESTS]) for row in rates],
+                [("2024-09-01 12:00", 3), ("2024-09-01 13:00", 3), ("2024-09-01 14:00", 1)],
+            )
+            rates = sql.get_request_rates(conn, "minute", start + timedelta(minutes=90))
+            self.assertEqual([(row[sql.BUCKET], row[sql.TOTAL_REQUESTS]) for row in rates], [("2024-09-01 14:10", 1)])
+            self.assertRaises(ValueError, sql.get_request_rates, conn, "week")  # noqa: PT027
+
+            miners = sql.get_miner_allocation_stats(conn)
+            self.assertEqual(
+                [(row[sql.MINER_UID], row[sql.NUM_ALLOCATIONS], row[sql.MEAN_APY], row[sql.MAX_APY]) for row in miners],
+                [("0", 2, 20, 30), ("1", 1, 20, 20)],
+            )
+
+    def test_rollups_migration(self) -> None:
+        now = datetime.now()  # noqa: DTZ005
+        with self.get_db_connection() as conn:
+            sql.log_requests(conn, [("key", "/allocate", 1, 100 - idx, now - timedelta(hours=idx)) for idx in range(5)])
+            for idx in range(5):
+                allocations = {str(uid): {"apy": uid * idx, "allocations": {}} for uid in range(3)}
+                sql.insert_allocations(conn, f"request_{idx}", {}, allocations, now - timedelta(minutes=30 * idx))
+            conn.commit()
+
+            tables = [sql.LOGS_HOURLY_TABLE, sql.ALLOCATIONS_HOURLY_TABLE]
+            rollups = {
+                table: [tuple(row) for row in conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3")] for table in tables
+            }
+
+            # the totals backfilled by the migration match the ones kept up to date as rows are written
+            migration = (MIGRATIONS_DIR / "20240901160000_rollups.sql").read_text()
+            up, down = migration.split("-- migrate:down")
+            conn.executescript(down)
+            conn.executescript(up)
+            for table in tables:
+                self.assertEqual(
+                    [tuple(row) for row in conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3")], rollups[table]
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from sturdy.pools import DaiSavingsRate, generate_assets_and_pools
+from sturdy.supply_rate_curve import SupplyRateCurve
+
+SDAI_ADDRESS = "0x83F20F44975D03b1b09e64809B757c47f942BEeA"
+
+
+class TestSupplyRateCurve(unittest.TestCase):
+    def test_linear(self) -> None:
+        calls = []
+
+        def supply_rate(amount: int) -> int:
+            calls.append(amount)
+            return int(0.05e18) - amount * 3
+
+        curve = SupplyRateCurve(supply_rate, int(1e21))
+        # the midpoint already matches the interpolation
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(curve.error, 0)
+        for amount in [0, 12345, int(3e20), int(1e21)]:
+            self.assertEqual(curve(amount), supply_rate(amount))
+
+    def test_within_error_of_synthetic_pools(self) -> None:
+        rng = np.random.RandomState(69)
+        assets_and_pools = generate_assets_and_pools(rng)
+        total_assets = assets_and_pools["total_assets"]
+        for pool in assets_and_pools["pools"].values():
+            curve = pool.supply_rate_curve(total_assets, max_error=int(1e14), max_samples=129)
+            self.assertLessEqual(curve.error, int(1e14))
+            # the error is only measured at midpoints - in between, it can be somewhat more (e.g. next to a kink)
+            for amount in range(0, total_assets + 1, total_assets // 1000):
+                self.assertLessEqual(abs(curve(amount) - curve.exact(amount)), 2 * curve.error)
+
+    def test_max_samples(self) -> None:
+        curve = SupplyRateCurve(lambda amount: amount**2, 1000, max_error=0, max_samples=5)
+        self.assertEqual(len(curve), 5)
+        # the error it couldn't be refined past is reported
+        self.assertGreater(curve.error, 0)
+        self.assertEqual(curve.amounts, [0, 250, 500, 750, 1000])
+
+    def test_outside_of_sampled_range(self) -> None:
+        curve = SupplyRateCurve(lambda amount: amount**2, 1000)
+        self.assertEqual(curve(2000), 2000**2)
+        self.assertEqual(SupplyRateCurve(lambda amount: amount + 1, 0)(0), 1)
+
+    def test_dai_savings_rate(self) -> None:
+        pool = DaiSavingsRate(contract_address=SDAI_ADDRESS)
+        with mock.patch.object(DaiSavingsRate, "supply_rate", return_value=int(0.05e18)) as supply_rate:
+            curve = pool.supply_rate_curve(int(1e21))
+        self.assertEqual(len(curve), 3)
+        self.assertEqual(curve(int(4e20)), int(0.05e18))
+        supply_rate.assert_called_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from sturdy.pools import AaveV3DefaultInterestRatePool, DaiSavingsRate
+from sturdy.validator.reward import calculate_apy, get_supply_rates
+
+ATOKEN_ADDRESS = "0x4d5F47FA6A74757f35C14fD3a6Ef8E3C9BC514E8"
+SDAI_ADDRESS = "0x83F20F44975D03b1b09e64809B757c47f942BEeA"
+USER_ADDRESS = "0xD8f9475A4A1A6812212FD62e80413d496038A89A"
+
+
+class TestSupplyRates(unittest.TestCase):
+    def setUp(self) -> None:
+        self.calls = []
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        def lookup(rate: int) -> int:
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            time.sleep(0.05)
+            with self.lock:
+                self.in_flight -= 1
+            return rate
+
+        def aave_supply_rate(pool, amount: int) -> int:  # noqa: ARG001
+            with self.lock:
+                self.calls.append(("aave", amount))
+            if amount == 13:
+                raise RuntimeError("eth_call failed")
+            return lookup(int(0.05e18) - amount)
+
+        def dai_supply_rate(pool) -> int:  # noqa: ARG001
+            with self.lock:
+                self.calls.append(("dai", None))
+            return lookup(int(0.04e18))
+
+        patches = [
+            mock.patch.object(AaveV3DefaultInterestRatePool, "supply_rate", aave_supply_rate),
+            mock.patch.object(DaiSavingsRate, "supply_rate", dai_supply_rate),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.assets_and_pools = {
+            "total_assets": 100,
+            "pools": {
+                ATOKEN_ADDRESS: AaveV3DefaultInterestRatePool(contract_address=ATOKEN_ADDRESS, user_address=USER_ADDRESS),
+                SDAI_ADDRESS: DaiSavingsRate(contract_address=SDAI_ADDRESS),
+            },
+        }
+
+    def test_distinct_lookups_are_made_concurrently(self) -> None:
+        allocations = [np.array([amount, 100 - amount], dtype=object) for amount in [40, 60, 40, 70, 60]]
+        supply_rates = get_supply_rates(self.assets_and_pools, allocations)
+
+        # one lookup per distinct amount - the dai savings rate doesn't depend on the amount
+        self.assertEqual(sorted(self.calls, key=str), [("aave", 40), ("aave", 60), ("aave", 70), ("dai", None)])
+        self.assertGreater(self.max_in_flight, 1)
+
+        # same apys as looking the supply rates up one after the other
+        for allocs in allocations:
+            self.assertEqual(
+                calculate_apy(allocs, self.assets_and_pools, supply_rates),
+                calculate_apy(allocs, self.assets_and_pools),
+            )
+
+    def test_failed_lookups_only_affect_the_allocations_needing_them(self) -> None:
+        allocations = [np.array([13, 87], dtype=object), np.array([40, 60], dtype=object)]
+        supply_rates = get_supply_rates(self.assets_and_pools, allocations)
+
+        with self.assertRaises(RuntimeError):  # noqa: PT027
+            calculate_apy(allocations[0], self.assets_and_pools, supply_rates)
+        self.assertEqual(
+            calculate_apy(allocations[1], self.assets_and_pools, supply_rates),
+            calculate_apy(allocations[1], self.assets_and_pools),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()